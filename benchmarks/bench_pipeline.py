@@ -0,0 +1,193 @@
+"""
+Time every stage of the checking pipeline on seeded synthetic tracklists and
+optionally compare the results with a saved baseline.
+
+    python benchmarks/bench_pipeline.py [--sizes 100 1000 ...] [--output results.json]
+                                        [--baseline baseline.json] [--tolerance 0.25]
+                                        [--noise-floor 0.001]
+
+Each stage is timed on its own, with its input prepared beforehand. Before
+timing, the single-pass rule evaluation and the NumPy backend are checked
+against the original get_* functions so a fast but wrong change fails here.
+Exits with status 1 when a stage is slower than the baseline by more than
+the tolerance.
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracklist_combiner import (load_tracklist, merge_consecutive_rows, get_track_counts, get_exceeding_artists,
+                                get_exceeding_albums, get_consecutive_artist_tracks, get_consecutive_album_tracks,
+                                format_tracklist, format_reason_for_restriction, format_macro_info,
+                                load_compact_tracklist, evaluate_rules, evaluate_compact_rules, TimeIndex)
+from tracklist_generator import generate_tracklist
+from catalog import TrackCatalog
+from vectorized_rules import HAVE_NUMPY, evaluate_batch
+from writers import ReportWriter
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000, 1000000]
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def repeats_for(size):
+    # Small inputs are noisy, big ones are slow
+    if size <= 1000:
+        return 20
+    if size <= 100000:
+        return 5
+    return 1
+
+def check_parity(text):
+    """
+    Raise AssertionError if the rule engines disagree with the get_* functions.
+    """
+    merged_rows = merge_consecutive_rows(load_tracklist(text))
+    artist_tracks, album_tracks = get_track_counts(merged_rows)
+    expected = {
+        'exceeding_artists': get_exceeding_artists(artist_tracks),
+        'exceeding_albums': get_exceeding_albums(album_tracks),
+        'consecutive_artist_tracks': get_consecutive_artist_tracks(merged_rows),
+        'consecutive_album_tracks': get_consecutive_album_tracks(merged_rows),
+    }
+    analyses = {'evaluate_rules': evaluate_rules(merged_rows),
+                'evaluate_compact_rules': evaluate_compact_rules(load_compact_tracklist(text.splitlines())),
+                'catalog': evaluate_compact_rules(load_compact_tracklist(text.splitlines(),
+                                                                         catalog=TrackCatalog(':memory:')))}
+    backends = ['python', 'numpy'] if HAVE_NUMPY else ['python']
+    for backend in backends:
+        analyses[f"{backend} backend"] = evaluate_batch([load_compact_tracklist(text.splitlines())], backend)[0]
+    for name, analysis in analyses.items():
+        for attribute, verdict in expected.items():
+            assert getattr(analysis, attribute) == verdict, f"{name} disagrees on {attribute}"
+        assert analysis.merged_count == len(merged_rows), f"{name} merged {analysis.merged_count} rows"
+
+def bench_size(size, seed):
+    """
+    Return [{'stage', 'rows', 'merged_rows', 'seconds'}, ...] for one tracklist size.
+    """
+    text = generate_tracklist(size, seed)
+    check_parity(text)
+    repeat = repeats_for(size)
+
+    rows = load_tracklist(text)
+    merged_rows = merge_consecutive_rows(rows)
+    artist_tracks, album_tracks = get_track_counts(merged_rows)
+    verdicts = (get_exceeding_artists(artist_tracks), get_exceeding_albums(album_tracks),
+                get_consecutive_artist_tracks(merged_rows), get_consecutive_album_tracks(merged_rows))
+    exceeding_artists, exceeding_albums, consecutive_artist_tracks, consecutive_album_tracks = verdicts
+    # A warm in-memory catalog, as after the first check of a show
+    catalog = TrackCatalog(':memory:')
+    load_compact_tracklist(text.splitlines(), catalog=catalog)
+    analysis = evaluate_rules(merged_rows, keep_rows=False)
+    compact = load_compact_tracklist(text.splitlines())
+    time_index = TimeIndex(compact.start, compact.end)
+    # Evenly spread times across the show, for the lookups a reviewer makes
+    show_end = compact.end[-1] if len(compact) else 0
+    lookup_times = [show_end * i // 1000 for i in range(1000)]
+
+    stages = [
+        ('load_tracklist', lambda: load_tracklist(text)),
+        ('merge_consecutive_rows', lambda: merge_consecutive_rows(rows)),
+        ('get_track_counts', lambda: get_track_counts(merged_rows)),
+        ('get_consecutive_artist_tracks', lambda: get_consecutive_artist_tracks(merged_rows)),
+        ('get_consecutive_album_tracks', lambda: get_consecutive_album_tracks(merged_rows)),
+        ('format_tracklist', lambda: format_tracklist(merged_rows)),
+        ('format_reason_for_restriction', lambda: format_reason_for_restriction(
+            exceeding_artists, exceeding_albums, consecutive_artist_tracks, consecutive_album_tracks)),
+        ('format_macro_info', lambda: format_macro_info(
+            exceeding_artists, consecutive_artist_tracks, exceeding_albums, consecutive_album_tracks)),
+        # The path the GUI and the CLI actually take
+        ('load_compact_tracklist', lambda: load_compact_tracklist(text.splitlines())),
+        ('load_compact_tracklist_catalog', lambda: load_compact_tracklist(text.splitlines(), catalog=catalog)),
+        ('evaluate_rules', lambda: evaluate_rules(merged_rows, keep_rows=False)),
+        # The reason, macro and CSV reports from one walk, as written by the CLI
+        ('write_reports', lambda: ReportWriter(reason=io.StringIO(), macro=io.StringIO(),
+                                               csv=io.StringIO()).write(analysis)),
+        ('build_time_index', lambda: TimeIndex(compact.start, compact.end)),
+        ('time_index_lookups_1000', lambda: [time_index.at(seconds) for seconds in lookup_times]),
+    ]
+    results = []
+    for stage, function in stages:
+        seconds = best_time(function, repeat)
+        results.append({'stage': stage, 'rows': size, 'merged_rows': len(merged_rows), 'seconds': seconds})
+        print(f"{stage:<32} {size:>9} {len(merged_rows):>9} {seconds * 1000:>11.3f} ms", flush=True)
+    return results
+
+def compare(results, baseline, tolerance, noise_floor):
+    """
+    Print each stage's time against the baseline and return the regressions.
+    Stages now taking less than noise_floor seconds are never flagged.
+    """
+    previous = {(result['stage'], result['rows']): result['seconds'] for result in baseline['results']}
+    regressions = []
+    print(f"\n{'stage':<32} {'rows':>9} {'baseline':>11} {'now':>11} {'change':>8}")
+    for result in results:
+        before = previous.get((result['stage'], result['rows']))
+        if before is None:
+            continue
+        ratio = result['seconds'] / before if before else 1.0
+        flag = ''
+        if ratio > 1 + tolerance and result['seconds'] >= noise_floor:
+            regressions.append(result)
+            flag = '  REGRESSION'
+        print(f"{result['stage']:<32} {result['rows']:>9} {before * 1000:>8.3f} ms {result['seconds'] * 1000:>8.3f} ms "
+              f"{(ratio - 1) * 100:>+7.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='fingerprint rows per generated tracklist (default: 100 to 1000000)')
+    parser.add_argument('--seed', type=int, default=0, help='generator seed (default: 0)')
+    parser.add_argument('-o', '--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='compare with results saved by an earlier --output run')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown against the baseline as a fraction (default: 0.25)')
+    parser.add_argument('--noise-floor', type=float, default=0.001,
+                        help='ignore slowdowns of stages taking less than this many seconds (default: 0.001)')
+    args = parser.parse_args()
+
+    print(f"{'stage':<32} {'rows':>9} {'merged':>9} {'time':>14}")
+    results = []
+    for size in args.sizes:
+        try:
+            results.extend(bench_size(size, args.seed))
+        except AssertionError as e:
+            sys.exit(f"Parity check failed at {size} rows: {e}")
+
+    if args.output:
+        report = {
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.noise_floor)
+        if regressions:
+            print(f"\n{len(regressions)} stage(s) slower than the baseline by more than {args.tolerance:.0%}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""
+Compare TracklistTable with tabulate's fancy_grid on synthetic tracklists.
+Checks that both give identical output before timing them.
+
+    python benchmarks/bench_render.py [ROWS ...]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tracklist_combiner import TracklistTable, format_tracklist_tabulate
+
+def make_rows(count, seed=0):
+    rng = random.Random(seed)
+    artists = [f"Artist {i} and the Long Band Name" for i in range(500)]
+    albums = [f"Album {i}: Greatest Hits, Vol. {i % 7}" for i in range(800)]
+    rows = []
+    start = 0
+    for i in range(count):
+        end = start + rng.randint(90, 400)
+        rows.append({'Start': str(start), 'End': str(end), 'Artists': rng.choice(artists),
+                     'Track Title': f"Track {rng.randint(0, 5000)} (Remastered)", 'Id': str(rng.randint(1, 9999999)),
+                     'Albums': rng.choice(albums)})
+        start = end
+    return rows
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(sizes):
+    print(f"{'rows':>8} {'tabulate':>10} {'TracklistTable':>15} {'speedup':>8}")
+    for size in sizes:
+        rows = make_rows(size)
+        repeat = 3 if size <= 10000 else 1
+        tabulate_time, expected = best_time(lambda: format_tracklist_tabulate(rows), repeat)
+        table_time, rendered = best_time(lambda: TracklistTable(rows).render(), repeat)
+        if rendered != expected:
+            sys.exit(f"Output differs from tabulate at {size} rows")
+        print(f"{size:>8} {tabulate_time:>9.3f}s {table_time:>14.3f}s {tabulate_time / table_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
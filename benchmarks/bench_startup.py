@@ -0,0 +1,89 @@
+"""
+Measure cold-start costs in fresh interpreters: import time of the checking
+core and the batch CLI (and which heavy modules they pull in), and the time
+from process start to the first paint of the RockWidget window.
+
+    python benchmarks/bench_startup.py [--runs N] [--offscreen]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['tabulate', 'numpy', 'PySide6', 'textwrap', 'wcwidth']
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+# Mirrors main.py, stopping at the window's first paint event
+PAINT_PROBE = """
+import json, sys, time
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, QEvent, QTimer
+from rockwidget import RockWidget
+
+class FirstPaint(QObject):
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint:
+            # Time since the interpreter started, from the monotonic clock
+            print(json.dumps({'seconds': time.perf_counter() - START,
+                              'core_loaded': 'tracklist_combiner' in sys.modules}))
+            QTimer.singleShot(0, app.quit)
+            watched.removeEventFilter(self)
+        return False
+
+app = QApplication(sys.argv)
+window = RockWidget()
+paint_filter = FirstPaint()
+window.installEventFilter(paint_filter)
+window.show()
+QTimer.singleShot(0, window.preload)
+app.exec()
+"""
+
+def run_probe(code, env=None):
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def bench_import(module, runs):
+    results = [run_probe(IMPORT_PROBE.format(module=module, heavy=HEAVY_MODULES)) for _ in range(runs)]
+    median = statistics.median(result['seconds'] for result in results)
+    print(f"import {module:<20} {median * 1000:8.1f} ms   heavy modules loaded: "
+          f"{', '.join(results[0]['loaded']) or 'none'}")
+
+def bench_first_paint(runs, offscreen):
+    env = dict(os.environ)
+    if offscreen:
+        env['QT_QPA_PLATFORM'] = 'offscreen'
+    # START is taken as early as possible in the probe process
+    code = "import time\nSTART = time.perf_counter()\n" + PAINT_PROBE
+    try:
+        results = [run_probe(code, env) for _ in range(runs)]
+    except (subprocess.CalledProcessError, ValueError, IndexError) as e:
+        print(f"first paint: could not start the GUI ({e})")
+        return
+    median = statistics.median(result['seconds'] for result in results)
+    print(f"window to first paint      {median * 1000:8.1f} ms   checking core preloaded (worker thread): "
+          f"{'yes' if results[0]['core_loaded'] else 'no'}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per measurement (default: 5)')
+    parser.add_argument('--offscreen', action='store_true', help='use the offscreen Qt platform (no display)')
+    args = parser.parse_args()
+
+    for module in ('tracklist_combiner', 'cli', 'rockwidget'):
+        bench_import(module, args.runs)
+    bench_first_paint(args.runs, args.offscreen)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Load-test the local checking service with seeded synthetic tracklists.
+
+    python benchmarks/load_test.py [--url http://127.0.0.1:8765] [--requests 2000]
+                                   [--concurrency 200] [--rows 500] [--shows 50]
+                                   [--endpoint verdict]
+
+Without --url a service is started on a free loopback port for the run
+(with a throwaway verdict cache and catalog, so every check is evaluated)
+and stopped afterwards. Prints throughput, client-side latency percentiles,
+the responses by status and the service's own /stats.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from service import percentiles
+from tracklist_generator import generate_tracklist
+
+async def request(reader, writer, host, method, path, body=b''):
+    """
+    Send one HTTP/1.1 request on an open connection and return (status, body).
+    """
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n\r\n"
+                 .encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if not line.strip():
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+async def client(host, port, path, bodies, counter, total, latencies, statuses):
+    """
+    Send requests on one keep-alive connection until total have been sent.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while counter[0] < total:
+            index = counter[0]
+            counter[0] += 1
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, host, 'POST', path, bodies[index % len(bodies)])
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            if status == 503:
+                # Back off as the service asks, without holding up the other clients
+                await asyncio.sleep(0.05)
+    finally:
+        writer.close()
+
+async def run_load(host, port, args):
+    bodies = [generate_tracklist(args.rows, seed).encode('utf-8') for seed in range(args.shows)]
+    latencies = []
+    statuses = {}
+    counter = [0]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, f"/{args.endpoint}", bodies, counter, args.requests, latencies,
+                                  statuses)
+                           for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, stats = await request(reader, writer, host, 'GET', '/stats')
+    writer.close()
+
+    print(f"{args.requests} requests of {args.rows} rows with {args.concurrency} connections in {elapsed:.2f}s: "
+          f"{args.requests / elapsed:.1f} requests/s, {statuses.get(200, 0) / elapsed:.1f} checks/s")
+    print("client latency (ms): " + ", ".join(f"{point} {value}" for point, value in percentiles(latencies).items()))
+    print("responses: " + ", ".join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    print("service stats: " + json.dumps(json.loads(stats), indent=2))
+
+def start_service(args, directory):
+    """
+    Start a service on a free loopback port and return (process, port).
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    command = [sys.executable, '-m', 'tracklist_combiner', 'serve', '--port', '0',
+               '--cache', os.path.join(directory, 'verdicts.sqlite3'),
+               '--catalog', os.path.join(directory, 'catalog.sqlite3')]
+    if args.jobs:
+        command += ['--jobs', str(args.jobs)]
+    process = subprocess.Popen(command, cwd=root, stderr=subprocess.PIPE, text=True)
+    line = process.stderr.readline()
+    match = re.search(r':(\d+) ', line)
+    if match is None:
+        process.kill()
+        sys.exit(f"The service did not start: {line}{process.stderr.read()}")
+    return process, int(match.group(1))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='service to test (default: start one for the run)')
+    parser.add_argument('--requests', type=int, default=2000, help='checks to send (default: 2000)')
+    parser.add_argument('--concurrency', type=int, default=200, help='open connections (default: 200)')
+    parser.add_argument('--rows', type=int, default=500, help='fingerprint rows per tracklist (default: 500)')
+    parser.add_argument('--shows', type=int, default=50, help='distinct tracklists to cycle through (default: 50)')
+    parser.add_argument('--endpoint', choices=['tracklist', 'reason', 'macro', 'verdict'], default='verdict',
+                        help='endpoint to load (default: verdict)')
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='worker processes of a started service (default: one per CPU)')
+    args = parser.parse_args()
+
+    if args.url:
+        url = urlsplit(args.url)
+        asyncio.run(run_load(url.hostname, url.port or 80, args))
+        return 0
+    with tempfile.TemporaryDirectory() as directory:
+        process, port = start_service(args, directory)
+        try:
+            asyncio.run(run_load('127.0.0.1', port, args))
+        finally:
+            process.terminate()
+            process.wait()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
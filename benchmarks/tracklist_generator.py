@@ -0,0 +1,100 @@
+"""
+Seeded generator of realistic synthetic tracklists for benchmarks.
+
+Artists are picked with a Zipf-distributed popularity and each artist has a
+few albums of a few tracks. Every track is reported as repeated 30-second
+fingerprint windows, some stretches go unmatched (like the 270 -> 390 jump in
+the sample tracklist) and DJs sometimes play several tracks by the same
+artist or from the same album in a row.
+"""
+import itertools
+import random
+
+HEADER = "Start\tEnd\tArtists\tTrack Title\tId\tAlbums"
+WINDOW = 30
+
+class Catalog:
+    """
+    A seeded pool of artists, albums and tracks with Zipf popularity.
+    """
+    def __init__(self, seed=0, artists=2000, zipf_exponent=1.1):
+        self.rng = random.Random(seed)
+        self.artists = [f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)} {i}" for i in range(artists)]
+        self.cumulative_weights = list(itertools.accumulate(1 / rank ** zipf_exponent
+                                                            for rank in range(1, artists + 1)))
+        self.albums = {}
+
+    def artist_albums(self, artist_index):
+        """
+        Return [(album title, [(track id, track title), ...]), ...] for an artist, created on first use.
+        """
+        albums = self.albums.get(artist_index)
+        if albums is None:
+            rng = random.Random(artist_index * 7919 + 17)
+            albums = []
+            for album_index in range(rng.randint(1, 4)):
+                title = f"{rng.choice(ALBUM_WORDS)} {rng.choice(ALBUM_WORDS)}, Vol. {album_index + 1}"
+                tracks = [(artist_index * 1000 + album_index * 50 + track_index,
+                           f"{rng.choice(TRACK_WORDS)} {rng.choice(TRACK_WORDS)} {track_index + 1}")
+                          for track_index in range(rng.randint(3, 14))]
+                albums.append((title, tracks))
+            self.albums[artist_index] = albums
+        return albums
+
+    def pick_artist(self, rng):
+        return rng.choices(range(len(self.artists)), cum_weights=self.cumulative_weights)[0]
+
+_default_catalog = None
+
+def default_catalog():
+    global _default_catalog
+    if _default_catalog is None:
+        _default_catalog = Catalog()
+    return _default_catalog
+
+def iter_tracklist_lines(rows, seed=0, catalog=None, gap_probability=0.08, run_probability=0.15):
+    """
+    Yield the header and then exactly rows tab-separated fingerprint rows.
+    """
+    rng = random.Random(seed)
+    # Shows share one catalog by default, so a track Id always means the same track
+    catalog = catalog if catalog is not None else default_catalog()
+    yield HEADER
+    produced = 0
+    start = 0
+    artist_index = None
+    album = None
+    while produced < rows:
+        if artist_index is None or rng.random() > run_probability:
+            artist_index = catalog.pick_artist(rng)
+            album = None
+        albums = catalog.artist_albums(artist_index)
+        if album is None or rng.random() > run_probability:
+            album = rng.choice(albums)
+        track_id, track_title = rng.choice(album[1])
+        artist = catalog.artists[artist_index]
+        windows = max(1, int(rng.gauss(210, 60)) // WINDOW)
+        for _ in range(windows):
+            if produced >= rows:
+                break
+            yield f"{start}\t{start + WINDOW}\t{artist}\t{track_title}\t{track_id}\t{album[0]}"
+            produced += 1
+            start += WINDOW
+        if rng.random() < gap_probability:
+            # A stretch the fingerprinter could not match
+            start += WINDOW * rng.randint(1, 8)
+
+def generate_tracklist(rows, seed=0, **options):
+    """
+    Return a whole synthetic tracklist as pasted text.
+    """
+    return "\n".join(iter_tracklist_lines(rows, seed, **options))
+
+FIRST_NAMES = ["Hank", "Mack", "Patsy", "Loretta", "Johnny", "Dolly", "Merle", "Tammy", "Buck", "Kitty",
+               "Bill", "June", "Ray", "Wanda", "Roy", "Skeeter", "Marty", "Jean", "Don", "Connie"]
+LAST_NAMES = ["Thompson", "Fields", "Locklin", "Cline", "Lynn", "Cash", "Parton", "Haggard", "Wynette",
+              "Owens", "Wells", "Monroe", "Carter", "Price", "Jackson", "Acuff", "Davis", "Robbins"]
+ALBUM_WORDS = ["Queen", "Hearts", "Six", "Pack", "Go", "Cult", "Hits", "Novelty", "Classics", "Honky",
+               "Tonk", "Midnight", "Highway", "Blue", "Moon", "Golden", "Country", "Memories", "Live"]
+TRACK_WORDS = ["Bowling", "Ball", "Blues", "Tired", "Bummin", "Around", "Hangover", "Tavern", "Lonesome",
+               "Whiskey", "River", "Heartache", "Train", "Jukebox", "Saturday", "Night", "Crazy", "Arms"]
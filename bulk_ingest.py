@@ -0,0 +1,129 @@
+"""
+Bulk ingest of exports where many shows are concatenated into one TSV file,
+each starting with its own header line.
+"""
+import io
+import mmap
+from collections import deque
+from instrumentation import run_profiled
+
+# Every show starts with a header line beginning with this column
+SHOW_HEADER = b'Start\t'
+# Chunks of shows in flight per worker; bounds memory however long the export is
+CHUNKS_PER_JOB = 4
+
+def find_show_ranges(data):
+    """
+    Yield (show index, start, end) byte ranges of the shows in an export.
+    Each range starts at a header line and ends where the next one starts.
+    Text before the first header becomes a show of its own, so it is
+    reported as a tracklist without a header instead of being dropped.
+    """
+    start = 3 if data[:3] == b'\xef\xbb\xbf' else 0
+    index = 0
+    if data[start:start + len(SHOW_HEADER)] != SHOW_HEADER:
+        found = data.find(b'\n' + SHOW_HEADER, start)
+        end = found + 1 if found >= 0 else len(data)
+        if data[start:end].strip():
+            yield index, start, end
+            index += 1
+        start = end
+    while start < len(data):
+        found = data.find(b'\n' + SHOW_HEADER, start)
+        end = found + 1 if found >= 0 else len(data)
+        yield index, start, end
+        index += 1
+        start = end
+
+# Exports mapped by this worker process, by path
+_mapped_exports = {}
+
+def map_export(path):
+    """
+    Return a read-only memory map of an export, shared by everything in this
+    process that reads it.
+    """
+    data = _mapped_exports.get(path)
+    if data is None:
+        with open(path, 'rb') as f:
+            # mmap cannot map an empty file
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if f.seek(0, 2) else b''
+        _mapped_exports[path] = data
+    return data
+
+def open_show(path, start, end):
+    """
+    Return one show of an export as a text file. Only that show's bytes are
+    decoded; the rest of the export stays in the page cache.
+    """
+    return io.StringIO(map_export(path)[start:end].decode('utf-8'), newline=None)
+
+def check_shows(path, ranges, **options):
+    """
+    Check a chunk of (show index, start, end) ranges of an export with the
+    CLI pipeline and return their verdicts in order.
+    """
+    from functools import partial
+    from cli import check_sources
+    sources = [({'file': path, 'show': index, 'offset': start, 'rows': 0}, partial(open_show, path, start, end))
+               for index, start, end in ranges]
+    return check_sources(sources, **options)
+
+def iter_chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def check_export(path, jobs=1, chunksize=32, profile=None, **options):
+    """
+    Check every show in an export and return an iterator over the verdicts
+    in input order. The file is memory-mapped and show boundaries are found
+    as the verdicts are consumed; worker processes get byte ranges, not
+    text, and map the file themselves. At most CHUNKS_PER_JOB chunks per
+    worker are in flight, so memory is bounded by the chunk size rather than
+    the size of the export. With a Profile, the stages of every chunk are
+    added to it. Options are passed on to check_sources.
+    """
+    chunks = iter_chunks(find_show_ranges(map_export(path)), chunksize)
+    profiled = profile is not None
+    if jobs == 1:
+        results = (check_chunk(path, chunk, profiled, options) for chunk in chunks)
+    else:
+        results = iter_pooled_results(path, chunks, jobs, profiled, options)
+    return (verdict for result in results for verdict in add_profile(profile, result))
+
+def check_chunk(path, chunk, profiled, options):
+    if profiled:
+        return run_profiled(check_shows, path, chunk, **options)
+    return check_shows(path, chunk, **options)
+
+def add_profile(profile, result):
+    """
+    Return the verdicts of a chunk, merging its profile if one is recorded.
+    """
+    if profile is None:
+        return result
+    verdicts, data = result
+    profile.merge(data)
+    return verdicts
+
+def iter_pooled_results(path, chunks, jobs, profiled, options):
+    from multiprocessing import Pool
+    pool = Pool(jobs)
+    try:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(check_chunk, (path, chunk, profiled, options)))
+            if len(pending) >= jobs * CHUNKS_PER_JOB:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,141 @@
+"""
+Local catalog of fingerprint track Ids, filled from every checked tracklist,
+so a track keeps the same artist, title and album whatever strings it
+arrives with.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'tracklist_checker', 'catalog.sqlite3')
+# Tracks each TrackCatalog keeps in memory in front of the database
+CATALOG_MEMORY_SIZE = 100000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    artist TEXT NOT NULL,
+    title TEXT NOT NULL,
+    album TEXT NOT NULL
+);
+"""
+
+class TrackCatalog:
+    """
+    Maps integer track Ids to canonical (artist, title, album). The first
+    strings seen for an Id become its canonical metadata. lookup_many() and
+    add_many() take a whole show's Ids in one query, with recently used
+    tracks answered from memory.
+
+    Like the verdict cache, the database runs in WAL mode with a busy
+    timeout and each process opens its own connection, so batch workers can
+    share one file. path=':memory:' keeps the catalog in this process only.
+    """
+    def __init__(self, path=DEFAULT_CATALOG_PATH, memory_size=CATALOG_MEMORY_SIZE):
+        self.path = path
+        self.memory_size = memory_size
+        self._tracks = OrderedDict()
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Connections must not cross a fork, so worker processes reconnect
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path) if self.path != ':memory:' else None
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            if self.path != ':memory:':
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def __len__(self):
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM tracks").fetchone()[0]
+
+    def _remember(self, track_id, metadata):
+        self._tracks[track_id] = metadata
+        self._tracks.move_to_end(track_id)
+        if len(self._tracks) > self.memory_size:
+            self._tracks.popitem(last=False)
+
+    def lookup_many(self, track_ids):
+        """
+        Return {track Id: (artist, title, album)} for the catalogued Ids among track_ids.
+        """
+        import json
+        found = {}
+        missing = []
+        with self._lock:
+            for track_id in track_ids:
+                metadata = self._tracks.get(track_id)
+                if metadata is None:
+                    missing.append(track_id)
+                else:
+                    self._tracks.move_to_end(track_id)
+                    found[track_id] = metadata
+            if missing:
+                # One query for the whole show, with the Ids passed as a single JSON parameter
+                rows = self._connect().execute(
+                    "SELECT id, artist, title, album FROM tracks WHERE id IN (SELECT value FROM json_each(?))",
+                    (json.dumps(missing),))
+                for track_id, artist, title, album in rows:
+                    found[track_id] = (artist, title, album)
+                    self._remember(track_id, (artist, title, album))
+        return found
+
+    def add_many(self, tracks):
+        """
+        Catalogue {track Id: (artist, title, album)} for Ids not seen before
+        and return the canonical metadata of all of them, which may come from
+        another process that added an Id first.
+        """
+        if not tracks:
+            return {}
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany("INSERT OR IGNORE INTO tracks (id, artist, title, album) VALUES (?, ?, ?, ?)",
+                                       [(track_id, *metadata) for track_id, metadata in tracks.items()])
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            for track_id in tracks:
+                self._tracks.pop(track_id, None)
+        return self.lookup_many(list(tracks))
+
+    def resolve(self, tracks):
+        """
+        Return canonical metadata for {track Id: (artist, title, album)} as
+        seen in one show, cataloguing the Ids that are new.
+        """
+        found = self.lookup_many(list(tracks))
+        if len(found) < len(tracks):
+            found.update(self.add_many({track_id: metadata for track_id, metadata in tracks.items()
+                                        if track_id not in found}))
+        return found
+
+_shared_catalogs = {}
+
+def get_catalog(path=DEFAULT_CATALOG_PATH):
+    """
+    Return the TrackCatalog this process uses for a file.
+    """
+    catalog = _shared_catalogs.get(path)
+    if catalog is None:
+        catalog = _shared_catalogs[path] = TrackCatalog(path)
+    return catalog
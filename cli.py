@@ -0,0 +1,595 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+from functools import partial
+from catalog import DEFAULT_CATALOG_PATH, get_catalog
+from instrumentation import Profile, count, run_profiled, stage
+from tracklist_combiner import InternTable, NonNumericIdError, load_compact_tracklist
+from rules import DEFAULT_RULES, load_rules
+from vectorized_rules import evaluate_batch
+from verdict_cache import DEFAULT_CACHE_PATH, analysis_record, analysis_to_verdict, content_key, get_verdict_cache,\
+                          text_digest
+
+# Verdict fields that start each row of the CSV report of check and ingest
+CHECK_CSV_FIELDS = ('file',)
+INGEST_CSV_FIELDS = ('file', 'show')
+
+def find_tracklist_files(paths, pattern):
+    """
+    Collect the tracklist files under the given files and directories, sorted.
+    """
+    from fnmatch import fnmatch
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+            continue
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            for filename in filenames:
+                if not filename.startswith('.') and fnmatch(filename, pattern):
+                    files.append(os.path.join(dirpath, filename))
+    return sorted(files)
+
+def check_files(paths, **options):
+    """
+    Run the checking pipeline over a chunk of exported tracklist files; see
+    check_sources for the options.
+    """
+    return check_sources([({'file': path, 'rows': 0}, partial(open, path, encoding='utf-8-sig')) for path in paths],
+                         **options)
+
+def check_sources(sources, backend='auto', rules=None, normalize=False, aliases=None, cache_path=None,
+                  catalog_path=None, texts=False, template=None, csv_fields=None):
+    """
+    Check a chunk of shows given as (verdict, open_source) pairs, where
+    open_source() returns a text file of one tracklist. Each show is
+    streamed line by line into a CompactTracklist and the whole chunk is
+    evaluated as one batch; the results are added to the verdicts, which
+    are returned in order. Errors are reported in the verdict instead of
+    being raised. With normalize, artist credits and albums are counted by
+    canonical name, using the alias file if given. With a cache_path, shows
+    already in the verdict cache are not evaluated again; their verdicts are
+    marked 'cached'. With a catalog_path, rows are merged by track Id and
+    take their metadata from the track catalog. With texts, verdicts also
+    get the 'reason' and 'macro' texts, written with the ReportTemplate if
+    given. With csv_fields, verdicts also get 'csv_rows', the CSV report
+    rows of the show starting with those verdict fields, for RunSummary to
+    write.
+    """
+    normalizer = None
+    if normalize:
+        from normalize import get_normalizer
+        # One normalizer per worker process, so its cache lasts across chunks
+        normalizer = get_normalizer(aliases)
+    cache = get_verdict_cache(cache_path) if cache_path else None
+    catalog = get_catalog(catalog_path) if catalog_path else None
+    key_rules = rules if rules is not None else DEFAULT_RULES
+    # Shows in the chunk share their strings; the table goes with the chunk
+    table = InternTable()
+    verdicts = []
+    parsed = []
+    compacts = []
+    for verdict, open_source in sources:
+        verdicts.append(verdict)
+        count('shows')
+        try:
+            with open_source() as f:
+                if cache is None:
+                    compact = load_show(f, catalog, key_rules.merge, open_source, table)
+                    parsed.append((verdict, None, None))
+                    compacts.append(compact)
+                    verdict['rows'] = compact.raw_count
+                    continue
+                # The exact text's key is hashed as the lines stream into the loader
+                digest = text_digest(key_rules, normalizer, catalog)
+                compact = load_show(hashed_lines(f, digest), catalog, key_rules.merge, open_source, table)
+            verdict['rows'] = compact.raw_count
+            with stage('cache_lookup'):
+                exact_key = digest.hexdigest()
+                linked = cache.lookup_text(exact_key)
+                record = cache.get(linked[0]) if linked is not None else None
+                if record is None:
+                    key = content_key(compact, key_rules, normalizer, catalog)
+                    record = cache.get(key)
+                    if record is not None:
+                        cache.link(exact_key, key, compact.raw_count)
+            if record is not None:
+                count('cache_hits')
+                verdict.update(cached=True, **record['verdict'])
+                continue
+            count('cache_misses')
+            parsed.append((verdict, key, exact_key))
+            compacts.append(compact)
+        except Exception as e:
+            count('errors')
+            verdict['error'] = str(e)
+    if compacts:
+        with stage('rules'):
+            analyses = evaluate_batch(compacts, backend, rules, normalizer)
+        with stage('verdicts'):
+            for (verdict, key, exact_key), analysis in zip(parsed, analyses):
+                verdict.update(analysis_to_verdict(analysis))
+                if cache is not None:
+                    cache.put(key, analysis_record(analysis), text_key=exact_key, raw_count=verdict['rows'])
+    if texts or csv_fields is not None:
+        with stage('reports'):
+            for verdict in verdicts:
+                if 'error' not in verdict:
+                    add_reports(verdict, key_rules, template, texts, csv_fields)
+    return verdicts
+
+def add_reports(verdict, rules, template=None, texts=True, csv_fields=None):
+    """
+    Add the 'reason' and 'macro' texts and, with csv_fields, the 'csv_rows'
+    of a stored verdict, all from one walk over its violations.
+    """
+    from writers import ReportWriter, stored_verdicts
+    reason = io.StringIO() if texts else None
+    macro = io.StringIO() if texts else None
+    csv_rows = io.StringIO() if csv_fields is not None else None
+    extra_fields = {field: verdict.get(field) for field in csv_fields} if csv_fields is not None else None
+    ReportWriter(template, reason, macro, csv=csv_rows).write_verdicts(rules, stored_verdicts(rules, verdict),
+                                                                       extra_fields=extra_fields)
+    if texts:
+        verdict['reason'] = reason.getvalue()
+        verdict['macro'] = macro.getvalue()
+    if csv_rows is not None:
+        verdict['csv_rows'] = csv_rows.getvalue()
+
+def load_show(lines, catalog, merge=None, reopen=None, table=None):
+    """
+    Load one show into a CompactTracklist, interning its strings in table.
+    A show whose Ids cannot be catalogued is read again with reopen() and
+    merged by its strings.
+    """
+    with stage('load') as timing:
+        try:
+            compact = load_compact_tracklist(lines, table, catalog=catalog, merge=merge)
+        except NonNumericIdError:
+            if reopen is None:
+                raise
+            count('uncatalogued_shows')
+            # Finish reading the lines anyway, for callers that hash them as they go
+            for _ in lines:
+                pass
+            with reopen() as f:
+                compact = load_compact_tracklist(f, table, merge=merge)
+        timing.produced(compact.nbytes)
+    count('raw_rows', compact.raw_count)
+    count('merged_rows', len(compact))
+    return compact
+
+def hashed_lines(lines, digest):
+    """
+    Yield lines, adding each to a hashlib digest as it goes.
+    """
+    for line in lines:
+        digest.update(line.encode('utf-8'))
+        yield line
+
+def read_checked_files(output_path):
+    """
+    Return the files already recorded in an existing JSONL output file.
+    A line cut short by a crash is ignored so that file gets checked again.
+    """
+    checked = set()
+    if not os.path.exists(output_path):
+        return checked
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                checked.add(json.loads(line)['file'])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return checked
+
+def open_output(output_path, resume):
+    """
+    Open the verdict output for writing, appending when resuming.
+    """
+    if output_path in (None, '-'):
+        return sys.stdout
+    if not resume:
+        return open(output_path, 'w', encoding='utf-8')
+    out = open(output_path, 'a+', encoding='utf-8')
+    # Make sure a partially written last line does not swallow the next verdict
+    if out.tell() > 0:
+        out.seek(out.tell() - 1)
+        if out.read(1) != '\n':
+            out.write('\n')
+    return out
+
+def open_csv(csv_path, resume):
+    """
+    Open the CSV report for writing, appending when resuming, or return
+    None without one.
+    """
+    if csv_path is None:
+        return None
+    return open(csv_path, 'a' if resume else 'w', encoding='utf-8', newline='')
+
+def load_check_options(args):
+    """
+    Turn the shared checking arguments into keyword arguments for
+    check_sources, or print the problem and return None.
+    """
+    try:
+        rules = load_rules(args.rules) if args.rules else None
+    except (OSError, ValueError) as e:
+        print(f"Could not load rules from {args.rules}: {e}", file=sys.stderr)
+        return None
+    normalize = args.normalize or args.aliases is not None
+    if normalize:
+        from normalize import get_normalizer
+        try:
+            get_normalizer(args.aliases)
+        except (OSError, ValueError) as e:
+            print(f"Could not load aliases from {args.aliases}: {e}", file=sys.stderr)
+            return None
+        if args.backend == 'numpy':
+            print("The numpy backend cannot be used with --normalize or --aliases.", file=sys.stderr)
+            return None
+    cache_path = None if args.no_cache else args.cache
+    catalog_path = None if args.no_catalog else args.catalog
+    import sqlite3
+    try:
+        if cache_path is not None:
+            get_verdict_cache(cache_path).stats()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Could not open the verdict cache {cache_path}: {e}", file=sys.stderr)
+        return None
+    try:
+        if catalog_path is not None:
+            len(get_catalog(catalog_path))
+    except (OSError, sqlite3.Error) as e:
+        print(f"Could not open the track catalog {catalog_path}: {e}", file=sys.stderr)
+        return None
+    return {'backend': args.backend, 'rules': rules, 'normalize': normalize, 'aliases': args.aliases,
+            'cache_path': cache_path, 'catalog_path': catalog_path}
+
+def load_report_options(args, csv_fields):
+    """
+    Return the report arguments of check and ingest as keyword arguments for
+    check_sources, or print the problem and return None. csv_fields are the
+    verdict fields that start each CSV row.
+    """
+    template = None
+    if args.template:
+        from writers import load_template
+        try:
+            template = load_template(args.template)
+        except (OSError, ValueError) as e:
+            print(f"Could not load the template {args.template}: {e}", file=sys.stderr)
+            return None
+    return {'texts': args.text, 'template': template, 'csv_fields': csv_fields if args.csv else None}
+
+class RunSummary:
+    """
+    Counts written verdicts for the summary line printed after a run, and
+    writes the CSV rows the workers made for each show if a CSV report is
+    asked for.
+    """
+    def __init__(self, jobs, csv_out=None, csv_fields=CHECK_CSV_FIELDS):
+        self.jobs = jobs
+        self.shows = self.restricted = self.errors = self.rows = self.cached = self.skipped = 0
+        self.start_time = time.perf_counter()
+        self.csv_out = csv_out
+        # A resumed run appends to the report it started
+        if csv_out is not None and csv_out.tell() == 0:
+            from writers import ReportWriter
+            ReportWriter(csv=csv_out).write_csv_header(csv_fields)
+
+    def write(self, out, verdict):
+        if verdict.pop('cached', False):
+            self.cached += 1
+        csv_rows = verdict.pop('csv_rows', None)
+        out.write(json.dumps(verdict, ensure_ascii=False) + '\n')
+        out.flush()
+        if self.csv_out is not None and csv_rows:
+            self.csv_out.write(csv_rows)
+        self.shows += 1
+        self.rows += verdict.get('rows', 0)
+        if 'error' in verdict:
+            self.errors += 1
+        elif verdict['restricted']:
+            self.restricted += 1
+
+    def report(self):
+        elapsed = time.perf_counter() - self.start_time
+        rate = self.shows / elapsed if elapsed > 0 else 0.0
+        row_rate = self.rows / elapsed if elapsed > 0 else 0.0
+        print(f"Checked {self.shows} shows ({self.rows} rows) in {elapsed:.2f}s with {self.jobs} jobs: "
+              f"{rate:.1f} shows/s, {row_rate:.0f} rows/s. "
+              f"{self.restricted} restricted, {self.errors} errors, {self.skipped} skipped (already checked), "
+              f"{self.cached} from the verdict cache.",
+              file=sys.stderr)
+        return 1 if self.errors else 0
+
+def run_check(args):
+    options = load_check_options(args)
+    report_options = load_report_options(args, CHECK_CSV_FIELDS) if options is not None else None
+    if report_options is None:
+        return 2
+    options.update(report_options)
+
+    files = find_tracklist_files(args.paths, args.pattern)
+    if args.output not in (None, '-'):
+        output_abspath = os.path.abspath(args.output)
+        files = [path for path in files if os.path.abspath(path) != output_abspath]
+
+    skipped = 0
+    if args.resume and args.output not in (None, '-'):
+        checked = read_checked_files(args.output)
+        remaining = [path for path in files if path not in checked]
+        skipped = len(files) - len(remaining)
+        files = remaining
+
+    out = open_output(args.output, args.resume)
+    csv_out = open_csv(args.csv, args.resume)
+    jobs = args.jobs or os.cpu_count() or 1
+    summary = RunSummary(jobs, csv_out)
+    summary.skipped = skipped
+    chunks = [files[i:i + args.chunksize] for i in range(0, len(files), args.chunksize)]
+    worker = partial(check_files, **options)
+    profile = Profile() if args.profile or args.metrics else None
+    if profile is not None:
+        # Each chunk's profile comes back from its worker with the verdicts
+        worker = partial(run_profiled, worker)
+    try:
+        if jobs == 1:
+            results = map(worker, chunks)
+            pool = None
+        else:
+            pool = Pool(jobs)
+            results = pool.imap_unordered(worker, chunks)
+        for chunk in results:
+            if profile is not None:
+                chunk, data = chunk
+                profile.merge(data)
+            for verdict in chunk:
+                summary.write(out, verdict)
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if csv_out is not None:
+            csv_out.close()
+    return report_profile(args, profile, summary.report())
+
+def report_profile(args, profile, status):
+    """
+    Print and dump the profile of a run as asked by --profile and --metrics.
+    """
+    if profile is None:
+        return status
+    if args.profile:
+        print(profile.report(), file=sys.stderr)
+    if args.metrics:
+        try:
+            with open(args.metrics, 'w', encoding='utf-8') as f:
+                if args.metrics.endswith('.json'):
+                    json.dump(profile.to_dict(), f, indent=2)
+                else:
+                    f.write(profile.prometheus())
+        except OSError as e:
+            print(f"Could not write metrics to {args.metrics}: {e}", file=sys.stderr)
+            return 2
+    return status
+
+def run_ingest(args):
+    from bulk_ingest import check_export
+    options = load_check_options(args)
+    report_options = load_report_options(args, INGEST_CSV_FIELDS) if options is not None else None
+    if report_options is None:
+        return 2
+    options.update(report_options)
+    jobs = args.jobs or os.cpu_count() or 1
+    profile = Profile() if args.profile or args.metrics else None
+    try:
+        shows = check_export(args.export, jobs, args.chunksize, profile, **options)
+    except OSError as e:
+        print(f"Could not read {args.export}: {e}", file=sys.stderr)
+        return 2
+    out = open_output(args.output, False)
+    csv_out = open_csv(args.csv, False)
+    summary = RunSummary(jobs, csv_out, INGEST_CSV_FIELDS)
+    try:
+        for verdict in shows:
+            summary.write(out, verdict)
+    finally:
+        shows.close()
+        if out is not sys.stdout:
+            out.close()
+        if csv_out is not None:
+            csv_out.close()
+    return report_profile(args, profile, summary.report())
+
+def run_profile(args):
+    from instrumentation import capture, recording
+    from verdict_cache import check_tracklist
+    options = load_check_options(args)
+    if options is None:
+        return 2
+    try:
+        with open(args.file, encoding='utf-8-sig') as f:
+            tracklist_data = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Could not read {args.file}: {e}", file=sys.stderr)
+        return 2
+    normalizer = None
+    if options['normalize']:
+        from normalize import get_normalizer
+        normalizer = get_normalizer(options['aliases'])
+    cache = get_verdict_cache(options['cache_path']) if options['cache_path'] else None
+    catalog = get_catalog(options['catalog_path']) if options['catalog_path'] else None
+    try:
+        with capture() if args.capture else recording() as profile:
+            check_tracklist(tracklist_data, args.view, options['rules'], normalizer, cache, catalog=catalog)
+    except ValueError as e:
+        print(f"Could not check {args.file}: {e}", file=sys.stderr)
+        return 1
+    if args.format == 'json':
+        print(json.dumps(profile.to_dict(), indent=2))
+    elif args.format == 'prometheus':
+        print(profile.prometheus(), end='')
+    else:
+        print(profile.report())
+    return 0
+
+def run_at(args):
+    from tracklist_combiner import TracklistTable, analyze_tracklist, seconds_to_time, time_to_seconds
+    options = load_check_options(args)
+    if options is None:
+        return 2
+    try:
+        start = time_to_seconds(args.time)
+        stop = time_to_seconds(args.to) if args.to else None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    try:
+        with open(args.file, encoding='utf-8-sig') as f:
+            tracklist_data = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Could not read {args.file}: {e}", file=sys.stderr)
+        return 2
+    normalizer = None
+    if options['normalize']:
+        from normalize import get_normalizer
+        normalizer = get_normalizer(options['aliases'])
+    catalog = get_catalog(options['catalog_path']) if options['catalog_path'] else None
+    try:
+        analysis = analyze_tracklist(tracklist_data, options['rules'], normalizer=normalizer, catalog=catalog)
+    except ValueError as e:
+        print(f"Could not check {args.file}: {e}", file=sys.stderr)
+        return 1
+    rows = analysis.rows_at(start) if stop is None else analysis.rows_between(start, stop)
+    if not rows:
+        following = analysis.time_index.next_start(start)
+        print(f"Nothing was playing at {seconds_to_time(start)}" +
+              (f"; the next track starts at {seconds_to_time(int(analysis.row(following)['Start']))}."
+               if following is not None else "."), file=sys.stderr)
+        return 1
+    merged_rows = [analysis.row(row) for row in rows]
+    print(TracklistTable(merged_rows).render())
+    for row, merged_row in zip(rows, merged_rows):
+        for rule, key in analysis.index.violations(row):
+            print(f"{seconds_to_time(int(merged_row['Start']))} {merged_row['Track Title']}: {rule.reason} ({key})")
+    return 0
+
+def run_serve(args):
+    import asyncio
+    from service import serve
+    options = load_check_options(args)
+    if options is None:
+        return 2
+    try:
+        asyncio.run(serve(options, args.host, args.port, args.jobs or os.cpu_count() or 1, args.batch_size,
+                          args.batch_delay / 1000, args.max_pending))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    except OSError as e:
+        print(f"Could not listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 2
+    return 0
+
+def add_check_options(parser):
+    parser.add_argument('-j', '--jobs', type=int, default=0,
+                        help='number of worker processes (default: one per CPU)')
+    parser.add_argument('-o', '--output', default='-',
+                        help='JSONL file to write verdicts to (default: stdout)')
+    parser.add_argument('--backend', choices=['auto', 'numpy', 'python'], default='auto',
+                        help='rule backend; auto uses NumPy when it is installed (default: auto)')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time, rows and allocations of each checking stage when done')
+    parser.add_argument('--metrics',
+                        help='write the stage profile to this file as Prometheus text, or JSON if it ends in .json')
+    parser.add_argument('--text', action='store_true',
+                        help='add the reason for restriction and macro info texts to each verdict')
+    parser.add_argument('--csv', help='also write one CSV row per track behind a restriction to this file')
+    parser.add_argument('--template', help='TOML or JSON report template for --text and --csv wording '
+                                           '(default: the English wording of the app)')
+    add_pipeline_options(parser)
+
+def add_pipeline_options(parser):
+    parser.add_argument('--rules', help='TOML or JSON rule spec to check against, with its merge settings '
+                             '(default: built-in limits)')
+    parser.add_argument('--normalize', action='store_true',
+                        help='count artist credits and albums by canonical name (case, featured artists, editions)')
+    parser.add_argument('--aliases', help='JSON alias table for --normalize (implies --normalize)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                        help='verdict cache file shared with the GUI (default: ~/.cache/tracklist_checker/)')
+    parser.add_argument('--no-cache', action='store_true', help='check every show without the verdict cache')
+    parser.add_argument('--catalog', default=DEFAULT_CATALOG_PATH,
+                        help='track catalog that merges rows by Id and gives each Id one set of metadata '
+                             '(default: ~/.cache/tracklist_checker/)')
+    parser.add_argument('--no-catalog', action='store_true',
+                        help='merge rows by their artist, title, Id and album strings instead')
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m tracklist_combiner',
+                                     description='Check exported tracklists without the GUI.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    check = subparsers.add_parser('check', help='check every tracklist file in a directory')
+    check.add_argument('paths', nargs='+', help='tracklist files or directories to check')
+    add_check_options(check)
+    check.add_argument('--resume', action='store_true',
+                       help='skip files already recorded in --output and append to it')
+    check.add_argument('--pattern', default='*',
+                       help='filename pattern to match inside directories (default: *)')
+    check.add_argument('--chunksize', type=int, default=32,
+                       help='files handed to a worker and checked as one batch (default: 32)')
+    check.set_defaults(func=run_check)
+
+    ingest = subparsers.add_parser('ingest', help='check every show in one export of concatenated tracklists')
+    ingest.add_argument('export', help='TSV export where each show starts with its own header line')
+    add_check_options(ingest)
+    ingest.add_argument('--chunksize', type=int, default=32,
+                        help='shows handed to a worker and checked as one batch (default: 32)')
+    ingest.set_defaults(func=run_ingest)
+
+    profile = subparsers.add_parser('profile', help='show where the time goes when checking one tracklist')
+    profile.add_argument('file', help='tracklist file to check')
+    profile.add_argument('--view', choices=['tracklist', 'reason', 'macro'], default='tracklist',
+                         help='output to render, like the buttons of the app (default: tracklist)')
+    profile.add_argument('--capture', action='store_true',
+                         help='also run the check under cProfile and tracemalloc (much slower)')
+    profile.add_argument('--format', choices=['text', 'json', 'prometheus'], default='text',
+                         help='report format (default: text)')
+    add_pipeline_options(profile)
+    profile.set_defaults(func=run_profile, backend='python')
+
+    from service_defaults import BATCH_DELAY, BATCH_SIZE, DEFAULT_HOST, DEFAULT_PORT, MAX_PENDING
+    at = subparsers.add_parser('at', help='show what was playing at a time of one tracklist')
+    at.add_argument('file', help='tracklist file')
+    at.add_argument('time', help='time into the show, as hh:mm:ss, mm:ss or seconds')
+    at.add_argument('--to', help='show every track playing from time up to this time instead')
+    add_pipeline_options(at)
+    at.set_defaults(func=run_at, backend='python')
+
+    serve = subparsers.add_parser('serve', help='answer checks from other tools over local HTTP')
+    serve.add_argument('--host', default=DEFAULT_HOST, help=f'address to listen on (default: {DEFAULT_HOST})')
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'port to listen on (default: {DEFAULT_PORT})')
+    serve.add_argument('-j', '--jobs', type=int, default=0,
+                       help='number of worker processes (default: one per CPU)')
+    serve.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                       help=f'most checks sent to a worker at once (default: {BATCH_SIZE})')
+    serve.add_argument('--batch-delay', type=float, default=BATCH_DELAY * 1000,
+                       help=f'milliseconds to wait for a batch to fill (default: {BATCH_DELAY * 1000:g})')
+    serve.add_argument('--max-pending', type=int, default=MAX_PENDING,
+                       help=f'checks waiting for a worker before new ones get 503 (default: {MAX_PENDING})')
+    add_pipeline_options(serve)
+    serve.set_defaults(func=run_serve, backend='python')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
@@ -0,0 +1,97 @@
+from rules import DEFAULT_RULES
+from tracklist_combiner import MERGE_KEYS, build_analysis, merge_row, trim_row
+
+class IncrementalChecker:
+    """
+    Check a live tracklist one fingerprint row at a time. Merge state, the
+    per-artist and per-album counters and the current consecutive runs are
+    kept between rows, so each row costs O(1) work per rule.
+
+    feed() returns the verdict-change events caused by the row, and passes
+    each one to callback if given. An event is a dictionary with the rule
+    name, the artist or album key, its new count, whether the key broke the
+    rule for the first time ('new') and the index of the merged row.
+    """
+    def __init__(self, rules=None, callback=None):
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self.callback = callback
+        self.merged_rows = []
+        self.row_count = 0
+        self._steps = []
+        self._finishers = []
+        for rule in self.rules.rules:
+            step, finish = rule.compile()
+            self._steps.append((rule.name, step))
+            self._finishers.append((rule.name, finish))
+        # Last count reported for each (rule name, key)
+        self._reported = {}
+
+    def feed(self, row):
+        """
+        Add one row (a dictionary like the ones from iter_tracklist) and
+        return the list of verdict-change events it caused.
+        """
+        self.row_count += 1
+        merge = self.rules.merge
+        if self.merged_rows:
+            current_row = self.merged_rows[-1]
+            if all(row.get(key) == current_row.get(key) for key in MERGE_KEYS):
+                if merge.is_default:
+                    current_row['End'] = str(int(row.get('End', 0)))
+                    return []
+                if merge_row(current_row, row, merge):
+                    return []
+            if not merge.is_default:
+                trim_row(current_row, row, merge)
+
+        current_row = row.copy()
+        current_row['Start'] = str(int(current_row.get('Start', 0)))
+        current_row['End'] = str(int(current_row.get('End', 0)))
+        self.merged_rows.append(current_row)
+        # Rules see the track as its row position, which snapshot() turns back into its title
+        record = (current_row['Artists'], current_row['Albums'], len(self.merged_rows) - 1,
+                  current_row['Start'], current_row['End'])
+
+        events = []
+        for name, step in self._steps:
+            change = step(record)
+            if change is None:
+                continue
+            key, count = change
+            reported = self._reported.get((name, key))
+            if reported != count:
+                self._reported[(name, key)] = count
+                events.append({'rule': name, 'key': key, 'count': count, 'new': reported is None,
+                               'row': len(self.merged_rows) - 1})
+        if self.callback is not None:
+            for event in events:
+                self.callback(event)
+        return events
+
+    def feed_many(self, rows):
+        """
+        Add several rows and return all the events they caused, in order.
+        """
+        events = []
+        for row in rows:
+            events.extend(self.feed(row))
+        return events
+
+    @property
+    def is_restricted(self):
+        return bool(self._reported)
+
+    def snapshot(self):
+        """
+        Return a TracklistAnalysis of the rows fed so far. It is a copy, so
+        feeding more rows does not change it, and its attributes are the
+        structures format_reason_for_restriction and format_macro_info take.
+        """
+        merged_rows = [row.copy() for row in self.merged_rows]
+        # Row positions are copied too, since the open runs keep growing
+        verdicts = {name: {key: {'count': data['count'], 'tracks': list(data['tracks'])}
+                           for key, data in finish().items()}
+                    for name, finish in self._finishers}
+        return build_analysis(len(merged_rows), verdicts, self.rules,
+                              lambda rows: [merged_rows[row]['Track Title'] for row in rows],
+                              lambda rows: [merged_rows[row]['Id'] for row in rows], merged_rows=merged_rows)
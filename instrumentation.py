@@ -0,0 +1,254 @@
+"""
+Per-stage timings and counters for checks, so a slow check can be traced to
+parsing, the catalog, the rules, rendering or the verdict cache.
+
+Nothing is recorded unless a Profile is active for the current thread or
+task (see recording()); until then stage() and count() only look up a
+context variable.
+"""
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Prefix of the Prometheus metric names
+METRIC_PREFIX = 'tracklist_checker'
+# Functions and allocation sites listed by a capture
+CAPTURE_TOP = 25
+
+_active = ContextVar('tracklist_profile', default=None)
+
+class _NoStage:
+    """
+    Stands in for a stage while nothing is being recorded.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def produced(self, nbytes):
+        pass
+
+_NO_STAGE = _NoStage()
+
+class _Stage:
+    __slots__ = ('profile', 'name', 'start', 'nbytes', 'traced')
+
+    def __init__(self, profile, name):
+        self.profile = profile
+        self.name = name
+        self.nbytes = 0
+        self.traced = None
+
+    def __enter__(self):
+        # Stages opened inside another one are named after it, like 'load/catalog'
+        open_stages = self.profile.open_stages
+        if open_stages:
+            self.name = f"{open_stages[-1]}/{self.name}"
+        open_stages.append(self.name)
+        # Listed from when they start, so a stage comes before the stages inside it
+        self.profile.stages.setdefault(self.name, [0, 0.0, 0])
+        if tracemalloc.is_tracing():
+            self.traced = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        if self.traced is not None:
+            self.nbytes = max(0, tracemalloc.get_traced_memory()[0] - self.traced)
+        self.profile.open_stages.pop()
+        self.profile.add_stage(self.name, seconds, self.nbytes)
+        return False
+
+    def produced(self, nbytes):
+        """
+        Add an estimate of the memory the stage allocated for its result.
+        Ignored while tracemalloc measures the stage.
+        """
+        if self.traced is None:
+            self.nbytes += nbytes
+
+class Profile:
+    """
+    Wall time, calls and allocated bytes per stage, plus event counters such
+    as raw and merged rows and verdict cache hits. Profiles from worker
+    processes are combined with merge(to_dict()).
+    """
+    def __init__(self):
+        # stage name: [calls, seconds, bytes]
+        self.stages = {}
+        self.counters = {}
+        self.open_stages = []
+        self.captured = None
+
+    def add_stage(self, name, seconds, nbytes=0):
+        totals = self.stages.get(name)
+        if totals is None:
+            totals = self.stages[name] = [0, 0.0, 0]
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] += nbytes
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self):
+        data = {'stages': {name: {'calls': calls, 'seconds': seconds, 'bytes': nbytes}
+                           for name, (calls, seconds, nbytes) in self.stages.items()},
+                'counters': dict(self.counters)}
+        if self.captured is not None:
+            data['captured'] = self.captured
+        return data
+
+    def merge(self, data):
+        for name, totals in data['stages'].items():
+            own = self.stages.get(name)
+            if own is None:
+                own = self.stages[name] = [0, 0.0, 0]
+            own[0] += totals['calls']
+            own[1] += totals['seconds']
+            own[2] += totals['bytes']
+        for name, n in data['counters'].items():
+            self.count(name, n)
+
+    def summary(self):
+        """
+        One line for a status bar.
+        """
+        parts = []
+        if 'raw_rows' in self.counters:
+            parts.append(f"{self.counters['raw_rows']:,} rows → {self.counters.get('merged_rows', 0):,} tracks")
+        total = 0.0
+        for name, (calls, seconds, nbytes) in self.stages.items():
+            if '/' not in name:
+                parts.append(f"{name} {seconds * 1000:.1f} ms")
+                total += seconds
+        parts.append(f"total {total * 1000:.1f} ms")
+        if self.counters.get('cache_hits'):
+            parts.append("verdict cache hit")
+        elif self.counters.get('cache_misses'):
+            parts.append("verdict cache miss")
+        if self.counters.get('analysis_memo_hits'):
+            parts.append("reused analysis")
+        return " · ".join(parts)
+
+    def report(self):
+        """
+        A table of the stages and the counters, for a terminal.
+        """
+        lines = [f"{'stage':<28} {'calls':>8} {'total ms':>12} {'mean ms':>10} {'allocated':>12}"]
+        for name, (calls, seconds, nbytes) in self.stages.items():
+            indent = '  ' * name.count('/')
+            lines.append(f"{indent + name.rsplit('/', 1)[-1]:<28} {calls:>8} {seconds * 1000:>12.3f} "
+                         f"{seconds * 1000 / calls:>10.3f} {format_bytes(nbytes):>12}")
+        if self.counters:
+            lines.append("")
+            lines.extend(f"{name:<28} {n:>8}" for name, n in sorted(self.counters.items()))
+        if self.captured is not None:
+            lines.extend(["", self.captured])
+        return "\n".join(lines)
+
+    def prometheus(self, prefix=METRIC_PREFIX):
+        """
+        The profile in the Prometheus text exposition format.
+        """
+        lines = []
+        for metric, position, help_text in (('stage_calls_total', 0, 'Times each checking stage ran.'),
+                                            ('stage_seconds_total', 1, 'Wall time spent in each checking stage.'),
+                                            ('stage_allocated_bytes_total', 2,
+                                             'Estimated bytes allocated by each checking stage.')):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} counter")
+            for name, totals in self.stages.items():
+                lines.append(f'{prefix}_{metric}{{stage="{name}"}} {totals[position]}')
+        for name, n in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {n}")
+        return "\n".join(lines) + "\n"
+
+def format_bytes(nbytes):
+    for unit in ('B', 'KB', 'MB'):
+        if nbytes < 1024:
+            return f"{nbytes:.0f} {unit}" if unit == 'B' else f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f} GB"
+
+def active():
+    """
+    Return the Profile being recorded, or None.
+    """
+    return _active.get()
+
+def stage(name):
+    """
+    Time a stage of the active profile: `with stage('load') as timing:`.
+    """
+    profile = _active.get()
+    if profile is None:
+        return _NO_STAGE
+    return _Stage(profile, name)
+
+def count(name, n=1):
+    profile = _active.get()
+    if profile is not None:
+        profile.count(name, n)
+
+@contextmanager
+def recording(profile=None):
+    """
+    Record stages and counters into a Profile (a new one by default) for
+    the duration of the block.
+    """
+    profile = profile if profile is not None else Profile()
+    token = _active.set(profile)
+    try:
+        yield profile
+    finally:
+        _active.reset(token)
+
+def run_profiled(function, *args, **kwargs):
+    """
+    Call function while recording and return (result, profile.to_dict()),
+    e.g. in a worker process whose profile the parent merges.
+    """
+    with recording() as profile:
+        result = function(*args, **kwargs)
+    return result, profile.to_dict()
+
+@contextmanager
+def capture(top=CAPTURE_TOP):
+    """
+    Record a single check like recording(), but also run it under cProfile
+    and tracemalloc. Stage allocations are then measured instead of
+    estimated, and profile.captured holds the busiest functions and the
+    allocation sites still holding memory. Much slower than a plain check.
+    """
+    import cProfile
+    import io
+    import pstats
+    profile = Profile()
+    profiler = cProfile.Profile()
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        with recording(profile):
+            profiler.enable()
+            try:
+                yield profile
+            finally:
+                profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+    functions = io.StringIO()
+    pstats.Stats(profiler, stream=functions).sort_stats('cumulative').print_stats(top)
+    allocations = [f"Peak traced memory: {format_bytes(peak)}", f"Top {top} allocation sites still holding memory:"]
+    allocations.extend(f"  {statistic}" for statistic in snapshot.statistics('lineno')[:top])
+    profile.captured = functions.getvalue().strip() + "\n\n" + "\n".join(allocations)
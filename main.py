@@ -1,10 +1,13 @@
 import sys
 from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QTimer
 from rockwidget import RockWidget
 
 app = QApplication(sys.argv)
 
 window = RockWidget()
 window.show()
+# Load the checking core once the event loop has shown the window
+QTimer.singleShot(0, window.preload)
 
 app.exec() 
\ No newline at end of file
@@ -0,0 +1,243 @@
+"""
+Artist and album name normalization, so credit variants like "Hank Thompson",
+"HANK THOMPSON" and "Hank Thompson feat. Merle Travis" count together.
+"""
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+# Distinct raw artist or album strings remembered by each Normalizer
+NORMALIZER_CACHE_SIZE = 65536
+# Alias table the app uses when it exists
+DEFAULT_ALIASES_PATH = os.path.join(os.path.expanduser('~'), '.tracklist_aliases.json')
+
+# Separators between the artists of one credit. Only explicit feature and
+# versus markers are split on: "&", "," and the like are in too many names
+# ("Mumford & Sons", "Tyler, The Creator"), so an alias table has to list
+# them under "credit_separators" to split on them. The abbreviations need
+# their period, since "Feat" and "vs" are also words in names ("Little Feat").
+CREDIT_SEPARATORS = r'\s+(?:feat\.|ft\.|featuring|vs\.)\s+'
+FEATURE_CREDITS = re.compile(CREDIT_SEPARATORS, re.IGNORECASE)
+# "Artist (feat. Other)" is split like "Artist feat. Other"
+BRACKETED_FEATURE = re.compile(r'\s*[(\[]\s*((?:feat\.|ft\.|featuring)\s+[^)\]]*)[)\]]', re.IGNORECASE)
+EDITION_WORDS = (r'(?:deluxe|remaster(?:ed)?|expanded|anniversary|edition|bonus|reissue|special|collector\'?s'
+                 r'|legacy|mono|stereo|version)')
+# "(Deluxe Edition)", "[Remastered 2011]" or " - 25th Anniversary Edition" at the end of an album
+EDITION_SUFFIX = re.compile(r'\s*(?:[(\[][^)\]]*\b' + EDITION_WORDS + r'\b[^)\]]*[)\]]'
+                            r'|\s-\s[^-]*\b' + EDITION_WORDS + r'\b[^-]*)$')
+
+def canonical_name(text):
+    """
+    Return the comparison form of a name: NFKC-normalized, case-folded and
+    with runs of whitespace collapsed.
+    """
+    return ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+
+def canonical_album(text):
+    """
+    Return the comparison form of an album title without edition suffixes.
+    """
+    name = canonical_name(text)
+    while True:
+        stripped = EDITION_SUFFIX.sub('', name)
+        if stripped == name or not stripped:
+            return name
+        name = stripped
+
+def split_credits(text, separators=FEATURE_CREDITS):
+    """
+    Split an artist credit into the names of the credited artists, in order.
+    separators is a pattern from credit_pattern(); by default only feature
+    and versus markers split a credit.
+    """
+    text = BRACKETED_FEATURE.sub(r' \1', unicodedata.normalize('NFKC', text))
+    return [name.strip() for name in separators.split(text) if name.strip()]
+
+def credit_pattern(extra_separators=()):
+    """
+    Return the pattern split_credits() splits on, with extra separators
+    such as "&", "," or "x". Word separators need whitespace on both sides;
+    other separators need whitespace after them, so "R&B" stays whole.
+    """
+    pattern = CREDIT_SEPARATORS
+    for separator in extra_separators:
+        if separator[:1].isalnum():
+            pattern += rf'|\s+{re.escape(separator)}\s+'
+        else:
+            pattern += rf'|\s*{re.escape(separator)}\s+'
+    return re.compile(pattern, re.IGNORECASE)
+
+class Normalizer:
+    """
+    Map raw artist credits and album titles to canonical integer IDs.
+    artist_ids() returns a tuple with one ID per credited artist and
+    album_id() a single ID; both sit behind an LRU cache of cache_size raw
+    strings, since the same few thousand names repeat across many shows.
+    artist_names() and album_name() give the spellings a string stands for,
+    so verdicts show the names as they appear in the show being checked.
+    names[id] is the spelling first seen for each ID by this Normalizer.
+
+    Aliases map a variant to the name it should count as, e.g.
+    "Hank Thompson & His Brazos Valley Boys" to "Hank Thompson". An artist
+    alias may map to a list of names, and an alias for a whole credit stops
+    it from being split ("Earth, Wind & Fire"). Credits are only split on
+    feature markers unless credit_separators adds more, like "&" or ",".
+    """
+    def __init__(self, aliases_path=None, cache_size=NORMALIZER_CACHE_SIZE):
+        self.names = []
+        self._ids = {}
+        self.aliases = {'artists': {}, 'albums': {}}
+        self.credit_separators = []
+        self._separators = FEATURE_CREDITS
+        self._fingerprint = None
+        self.artist_entries = lru_cache(maxsize=cache_size)(self._artist_entries)
+        self.artist_ids = lru_cache(maxsize=cache_size)(self._artist_ids)
+        self.album_entry = lru_cache(maxsize=cache_size)(self._album_entry)
+        if aliases_path is not None:
+            self.load_aliases(aliases_path)
+
+    def _key_id(self, kind, canonical, name):
+        key_id = self._ids.get((kind, canonical))
+        if key_id is None:
+            key_id = self._ids[(kind, canonical)] = len(self.names)
+            self.names.append(name)
+        return key_id
+
+    def _artist_entries(self, credit):
+        """
+        Return ((ID, spelling in this credit), ...) for each credited artist.
+        """
+        aliases = self.aliases['artists']
+        target = aliases.get(canonical_name(credit))
+        names = split_credits(credit, self._separators) if target is None else target
+        entries = []
+        for name in names:
+            # An alias target is used as it is, without being split again
+            target = aliases.get(canonical_name(name))
+            for aliased in ([name] if target is None else target):
+                key_id = self._key_id('artist', canonical_name(aliased), aliased)
+                if all(key_id != entry[0] for entry in entries):
+                    entries.append((key_id, aliased))
+        if not entries:
+            entries.append((self._key_id('artist', '', credit), credit))
+        return tuple(entries)
+
+    def _artist_ids(self, credit):
+        return tuple(key_id for key_id, name in self.artist_entries(credit))
+
+    def artist_names(self, credit):
+        return tuple(name for key_id, name in self.artist_entries(credit))
+
+    def _album_entry(self, title):
+        """
+        Return (ID, spelling) for an album title.
+        """
+        aliases = self.aliases['albums']
+        target = aliases.get(canonical_name(title))
+        if target is None:
+            target = aliases.get(canonical_album(title))
+        if target is not None:
+            return self._key_id('album', canonical_album(target), target), target
+        return self._key_id('album', canonical_album(title), title), title
+
+    def album_id(self, title):
+        return self.album_entry(title)[0]
+
+    def album_name(self, title):
+        return self.album_entry(title)[1]
+
+    def add_alias(self, kind, variant, target):
+        """
+        Make variant count as target. kind is 'artists' or 'albums'; artist
+        targets may be a list of names.
+        """
+        if kind not in self.aliases:
+            raise ValueError(f"Unknown alias kind {kind!r}, expected 'artists' or 'albums'.")
+        if isinstance(target, str):
+            target = [target] if kind == 'artists' else target
+        elif kind == 'albums' or not (isinstance(target, list) and all(isinstance(name, str) for name in target)):
+            raise ValueError(f"The alias for {variant!r} must be a name"
+                             f"{' or a list of names' if kind == 'artists' else ''}.")
+        self.aliases[kind][canonical_name(variant)] = target
+        self.clear_cache()
+
+    def set_credit_separators(self, separators):
+        """
+        Also split credits on these separators, e.g. ["&", ","].
+        """
+        if not (isinstance(separators, list) and all(isinstance(separator, str) and separator.strip()
+                                                     for separator in separators)):
+            raise ValueError("credit_separators must be a list of separators like \"&\" or \",\".")
+        self.credit_separators = [separator.strip() for separator in separators]
+        self._separators = credit_pattern(self.credit_separators)
+        self.clear_cache()
+
+    def clear_cache(self):
+        self.artist_entries.cache_clear()
+        self.artist_ids.cache_clear()
+        self.album_entry.cache_clear()
+        self._fingerprint = None
+
+    def load_aliases(self, path):
+        """
+        Add the aliases from a JSON file like {"artists": {variant: name},
+        "albums": {variant: name}, "credit_separators": ["&", ","]}.
+        """
+        import json
+        with open(path, encoding='utf-8') as f:
+            table = json.load(f)
+        if not isinstance(table, dict):
+            raise ValueError(f"{path} must contain an object with 'artists' and 'albums' tables.")
+        for kind in ('artists', 'albums'):
+            for variant, target in table.get(kind, {}).items():
+                self.add_alias(kind, variant, target)
+        if 'credit_separators' in table:
+            self.set_credit_separators(table['credit_separators'])
+
+    def save_aliases(self, path):
+        import json
+        table = dict(self.aliases)
+        if self.credit_separators:
+            table['credit_separators'] = self.credit_separators
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(table, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    @property
+    def fingerprint(self):
+        """
+        Identifies the alias table and the credit separators, e.g. for cache keys.
+        """
+        if self._fingerprint is None:
+            import hashlib
+            import json
+            # The pattern is part of it, so verdicts split the old way are not reused
+            table = json.dumps({'aliases': self.aliases, 'separators': self._separators.pattern}, sort_keys=True)
+            self._fingerprint = hashlib.sha256(table.encode('utf-8')).hexdigest()[:16]
+        return self._fingerprint
+
+@lru_cache(maxsize=None)
+def get_normalizer(aliases_path=None):
+    """
+    Return the Normalizer shared by this process for an alias file (or none).
+    """
+    return Normalizer(aliases_path)
+
+# (Normalizer, modification time of its alias file) per path, for current_normalizer
+_current_normalizers = {}
+
+def current_normalizer(aliases_path=DEFAULT_ALIASES_PATH):
+    """
+    Return a Normalizer for an alias file that may be edited, or not exist,
+    while the process runs. A new Normalizer is made whenever the file's
+    modification time changes; without the file no aliases are used.
+    """
+    try:
+        modified = os.stat(aliases_path).st_mtime_ns
+    except FileNotFoundError:
+        modified = None
+    normalizer, loaded = _current_normalizers.get(aliases_path, (None, None))
+    if normalizer is None or loaded != modified:
+        normalizer = Normalizer(aliases_path if modified is not None else None)
+        _current_normalizers[aliases_path] = (normalizer, modified)
+    return normalizer
@@ -1,11 +1,18 @@
 from PySide6.QtWidgets import QPushButton, QWidget, QVBoxLayout, QLineEdit, QHBoxLayout,\
-                                QVBoxLayout, QLabel, QTextEdit, QApplication, QMessageBox
-from PySide6.QtGui import QFont
-from PySide6.QtCore import Qt
-from tracklist_combiner import load_tracklist, merge_consecutive_rows, get_track_counts, \
-                                get_exceeding_artists, get_exceeding_albums, get_consecutive_artist_tracks,\
-                                    get_consecutive_album_tracks, format_tracklist, format_reason_for_restriction, \
-                                        format_macro_info, check_all_for_repeated_tracks
+                                QVBoxLayout, QLabel, QTextEdit, QApplication, QMessageBox, QProgressBar, QCheckBox
+from PySide6.QtGui import QColor, QFont, QTextCursor, QTextFormat
+from PySide6.QtCore import Qt, QEvent, QSettings, QThreadPool, QTimer
+from workers import AnalysisJob, JumpJob, PreloadJob
+
+# Milliseconds to wait for further clicks before starting a check
+DEBOUNCE_MS = 150
+# Inputs with at least this many lines show a progress bar while they are checked
+PROGRESS_MIN_LINES = 2000
+# Background of the tracklist rows found by "Go to" or a double-click on a restriction
+HIGHLIGHT_COLOR = '#FFE9A8'
+# Where the app keeps its settings, and the setting for counting name variants together
+SETTINGS_NAME = ('Show tracklist checker', 'Show tracklist checker')
+NORMALIZE_SETTING = 'normalize_names'
 
 class RockWidget(QWidget):
     def __init__(self):
@@ -49,6 +56,11 @@ class RockWidget(QWidget):
                 border-radius: 5px;
                 padding: 4px;
             }
+            QCheckBox {
+                font-family: "DM Sans", sans-serif;
+                font-size: 14px;
+                color: white;
+            }
             QLabel {
                 font-family: "DM Sans", sans-serif;
                 font-size: 16px;
@@ -58,6 +70,19 @@ class RockWidget(QWidget):
             }
         """)
         
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.current_job = None
+        self.job_count = 0
+        self.pending_view = None
+        # View in the text holder, so a double-click knows what it points at
+        self.shown_view = None
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.setInterval(DEBOUNCE_MS)
+        self.debounce_timer.timeout.connect(self.start_job)
+        self.settings = QSettings(*SETTINGS_NAME)
+
         self.setupUI()
     
     def setupUI(self):
@@ -66,6 +91,10 @@ class RockWidget(QWidget):
         
         self.line_edit = QLineEdit()
         self.line_edit.setPlaceholderText("Enter tracklist here")
+        # The default limit of 32767 characters cuts off long shows
+        self.line_edit.setMaxLength(2147483647)
+        # A result for text that has since changed is no longer wanted
+        self.line_edit.textChanged.connect(self.cancel_job)
         
         enter_button = QPushButton("↵")
         enter_button.setFixedWidth(100)
@@ -86,6 +115,18 @@ class RockWidget(QWidget):
         self.text_holder_label.setPlainText(format)
         self.text_holder_label.setFont(QFont("Courier"))
         self.text_holder_label.setStyleSheet("font-size: 14px;")
+        # Double-clicking a restriction in the reason or macro view shows its tracks in the tracklist
+        self.text_holder_label.viewport().installEventFilter(self)
+
+        # Progress Bar for large tracklists
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setFixedHeight(8)
+        self.progress_bar.hide()
+
+        # Status Bar with the timings of the last check
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("font-size: 12px; font-weight: normal; color: #9AA0B4; margin-bottom: 0px;")
         
         # Copy Button
         copy_text_holder_label = self.createButton("Copy", self.copy_text)
@@ -93,6 +134,19 @@ class RockWidget(QWidget):
         copy_text_holder_label.setFixedHeight(50)
         copy_text_holder_label.setStyleSheet("font-size: 18px;")
 
+        # Jump to the row playing at a time of the show
+        self.goto_edit = QLineEdit()
+        self.goto_edit.setPlaceholderText("Go to hh:mm:ss")
+        self.goto_edit.setFixedWidth(160)
+        self.goto_edit.returnPressed.connect(self.go_to_time)
+
+        # Count "Hank Thompson", "HANK THOMPSON" and "Hank Thompson feat. ..." as one artist
+        self.normalize_box = QCheckBox("Count name variants together")
+        self.normalize_box.setToolTip("Ignore case, Unicode forms and edition suffixes, count each featured artist, "
+                                      "and use the alias table in ~/.tracklist_aliases.json if there is one.")
+        self.normalize_box.setChecked(self.settings.value(NORMALIZE_SETTING, True, type=bool))
+        self.normalize_box.toggled.connect(self.normalize_toggled)
+
         # Layout
         h_layout = QHBoxLayout()
         h_layout.addWidget(label)
@@ -106,8 +160,15 @@ class RockWidget(QWidget):
         v_layout.addWidget(button2, alignment=Qt.AlignHCenter)
         v_layout.addWidget(button3, alignment=Qt.AlignHCenter)
         v_layout.addWidget(buttonn, alignment=Qt.AlignHCenter)
+        v_layout.addWidget(self.progress_bar)
         v_layout.addWidget(self.text_holder_label)
-        v_layout.addWidget(copy_text_holder_label, alignment=Qt.AlignHCenter)
+        bottom_layout = QHBoxLayout()
+        bottom_layout.addWidget(copy_text_holder_label)
+        bottom_layout.addWidget(self.goto_edit)
+        bottom_layout.addWidget(self.normalize_box)
+        bottom_layout.setAlignment(Qt.AlignCenter | Qt.AlignVCenter)
+        v_layout.addLayout(bottom_layout)
+        v_layout.addWidget(self.status_label)
         
         self.setLayout(v_layout)
     
@@ -130,90 +191,149 @@ class RockWidget(QWidget):
         self.text_holder_label.setPlainText(self.line_edit.text())
 
     def button1_clicked(self):
-        try:
-            tracklist_data = self.line_edit.text()
-            rows = load_tracklist(tracklist_data)
-            merged_rows = merge_consecutive_rows(rows)
-            formatted_tracklist = format_tracklist(merged_rows)
-            self.text_holder_label.setPlainText(formatted_tracklist)
-            self.sender().clearFocus()
-        except Exception as e:
-            self.display_error_message(str(e))
+        self.request_view('tracklist')
+        self.sender().clearFocus()
 
     def button2_clicked(self):
-        try:
-            tracklist_data = self.line_edit.text()
-            rows = load_tracklist(tracklist_data)
-            merged_rows = merge_consecutive_rows(rows)
-            artist_tracks, album_tracks = get_track_counts(merged_rows)
-            exceeding_artists = get_exceeding_artists(artist_tracks)
-            exceeding_albums = get_exceeding_albums(album_tracks)
-            consecutive_artist_tracks = get_consecutive_artist_tracks(merged_rows)
-            consecutive_album_tracks = get_consecutive_album_tracks(merged_rows)
-
-            result_text = format_reason_for_restriction(exceeding_artists, exceeding_albums, consecutive_artist_tracks, consecutive_album_tracks)
-
-            if result_text:
-                self.text_holder_label.setPlainText(result_text)
-            else:
-                self.text_holder_label.setPlainText("No restrictions found.")
-
-            # Check for repeated tracks
-
-            repeated_tracks = check_all_for_repeated_tracks(exceeding_artists, exceeding_albums, consecutive_artist_tracks, consecutive_album_tracks)
-
-            if repeated_tracks:
-                error_message = "The following track(s) are causing more than one restriction:\n"
-                for key, tracks in repeated_tracks.items():
-                    unique_tracks = set(tracks)
-                    error_message += f"\n({'Album' if key in consecutive_album_tracks else 'Artist'}) {key}:\n"
-                    for track in unique_tracks:
-                        error_message += f"\t  - {track}\n"
-                error_message += f"\nPlease review manually."
-                self.display_error_message(error_message)
-
-            self.sender().clearFocus()
-        except Exception as e:
-            self.display_error_message(str(e))
+        self.request_view('reason')
+        self.sender().clearFocus()
 
     def button3_clicked(self):
-        try:
-            tracklist_data = self.line_edit.text()
-            rows = load_tracklist(tracklist_data)
-            merged_rows = merge_consecutive_rows(rows)
-            artist_tracks, album_tracks = get_track_counts(merged_rows)
-            exceeding_artists = get_exceeding_artists(artist_tracks)
-            exceeding_albums = get_exceeding_albums(album_tracks)
-            consecutive_artist_tracks = get_consecutive_artist_tracks(merged_rows)
-            consecutive_album_tracks = get_consecutive_album_tracks(merged_rows)
-
-            result_text = format_macro_info(exceeding_artists, consecutive_artist_tracks, exceeding_albums, consecutive_album_tracks)
-
-            if result_text:
-                self.text_holder_label.setPlainText(result_text)
-            else:
-                self.text_holder_label.setPlainText("The show is not being restricted.")
-                
-            # Check for repeated tracks
-
-            repeated_tracks = check_all_for_repeated_tracks(exceeding_artists, exceeding_albums, consecutive_artist_tracks, consecutive_album_tracks)
-
-            if repeated_tracks:
-                error_message = "The following track(s) are causing more than one restriction:\n"
-                for key, tracks in repeated_tracks.items():
-                    unique_tracks = set(tracks)
-                    error_message += f"\n({'Album' if key in consecutive_album_tracks else 'Artist'}) {key}:\n"
-                    for track in unique_tracks:
-                        error_message += f"\t  - {track}\n"
-                error_message += f"\nPlease review manually."
-                self.display_error_message(error_message)
-
-            self.sender().clearFocus()
-        except Exception as e:
-            self.display_error_message(str(e))
+        self.request_view('macro')
+        self.sender().clearFocus()
+
+    def preload(self):
+        # Load the checking core on the worker thread; jobs queue behind it
+        self.thread_pool.start(PreloadJob())
+
+    def normalize_toggled(self, checked):
+        self.settings.setValue(NORMALIZE_SETTING, checked)
+        # Check the shown view again with the new setting
+        if self.shown_view is not None:
+            self.request_view(self.shown_view)
+
+    def request_view(self, view):
+        # Repeated clicks within DEBOUNCE_MS only start the last requested view
+        self.pending_view = view
+        self.debounce_timer.start()
+
+    def start_job(self):
+        self.cancel_job()
+        self.job_count += 1
+        job = AnalysisJob(self.job_count, self.pending_view, self.line_edit.text(),
+                          normalize=self.normalize_box.isChecked())
+        job.signals.progress.connect(self.job_progress)
+        job.signals.finished.connect(self.job_finished)
+        job.signals.failed.connect(self.job_failed)
+        self.current_job = job
+        if job.total_lines >= PROGRESS_MIN_LINES:
+            self.progress_bar.setRange(0, job.total_lines)
+            self.progress_bar.setValue(0)
+            self.progress_bar.show()
+        self.thread_pool.start(job)
+
+    def go_to_time(self):
+        if self.goto_edit.text().strip():
+            self.start_jump(('time', self.goto_edit.text()))
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.MouseButtonDblClick and self.shown_view in ('reason', 'macro'):
+            cursor = self.text_holder_label.cursorForPosition(event.position().toPoint())
+            self.start_jump((self.shown_view, cursor.blockNumber()))
+        return super().eventFilter(watched, event)
+
+    def start_jump(self, target):
+        self.debounce_timer.stop()
+        self.cancel_job()
+        self.job_count += 1
+        job = JumpJob(self.job_count, target, self.line_edit.text(), normalize=self.normalize_box.isChecked())
+        job.signals.progress.connect(self.job_progress)
+        job.signals.jumped.connect(self.job_jumped)
+        job.signals.failed.connect(self.job_failed)
+        self.current_job = job
+        if job.total_lines >= PROGRESS_MIN_LINES:
+            self.progress_bar.setRange(0, job.total_lines)
+            self.progress_bar.setValue(0)
+            self.progress_bar.show()
+        self.thread_pool.start(job)
+
+    def cancel_job(self):
+        if self.current_job is not None:
+            self.current_job.cancel()
+            self.current_job = None
+        self.progress_bar.hide()
+
+    def is_current_job(self, job_id):
+        return self.current_job is not None and self.current_job.job_id == job_id
+
+    def job_progress(self, job_id, lines_read, total_lines):
+        if self.is_current_job(job_id):
+            self.progress_bar.setValue(min(lines_read, total_lines))
+
+    def job_finished(self, job_id, view, text, analysis):
+        if not self.is_current_job(job_id):
+            return
+        if self.current_job.profile is not None:
+            self.status_label.setText(self.current_job.profile.summary())
+        self.current_job = None
+        self.progress_bar.hide()
+        self.text_holder_label.setExtraSelections([])
+        self.text_holder_label.setPlainText(text)
+        self.shown_view = view
+        if view != 'tracklist':
+            self.check_repeated_tracks(analysis)
+
+    def job_jumped(self, job_id, text, spans, description):
+        if not self.is_current_job(job_id):
+            return
+        self.current_job = None
+        self.progress_bar.hide()
+        self.status_label.setText(description)
+        if not text:
+            return
+        self.text_holder_label.setPlainText(text)
+        self.shown_view = 'tracklist'
+        self.highlight_lines(spans)
+
+    def highlight_lines(self, spans):
+        # Mark the lines of each found row and scroll to the first one
+        document = self.text_holder_label.document()
+        selections = []
+        for first, stop in spans:
+            for line in range(first, stop):
+                selection = QTextEdit.ExtraSelection()
+                selection.format.setBackground(QColor(HIGHLIGHT_COLOR))
+                selection.format.setProperty(QTextFormat.FullWidthSelection, True)
+                selection.cursor = QTextCursor(document.findBlockByNumber(line))
+                selections.append(selection)
+        self.text_holder_label.setExtraSelections(selections)
+        if spans:
+            # From the end, so the first row comes into view near the top
+            self.text_holder_label.moveCursor(QTextCursor.End)
+            self.text_holder_label.setTextCursor(QTextCursor(document.findBlockByNumber(spans[0][0])))
+            self.text_holder_label.ensureCursorVisible()
+
+    def job_failed(self, job_id, message):
+        if not self.is_current_job(job_id):
+            return
+        self.current_job = None
+        self.progress_bar.hide()
+        self.display_error_message(message)
+
+    def check_repeated_tracks(self, analysis):
+        # Warn about tracks that cause more than one restriction, or count twice towards one
+        from tracklist_combiner import format_review_warning
+        message = format_review_warning(analysis)
+        if message:
+            self.display_error_message(message)
 
     def buttonn_clicked(self):
+        self.debounce_timer.stop()
         self.line_edit.clear()
+        self.goto_edit.clear()
+        self.status_label.clear()
+        self.shown_view = None
+        self.text_holder_label.setExtraSelections([])
         self.text_holder_label.setPlainText(format)
 
     def copy_text(self):
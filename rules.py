@@ -0,0 +1,390 @@
+import os
+
+# Positions of the values in the records a RulePlan evaluates
+ARTIST, ALBUM, TRACK, START, END = range(5)
+FIELDS = {'artist': ARTIST, 'album': ALBUM}
+RULE_TYPES = ('total', 'consecutive', 'window')
+# What happens to a track that starts before the previous one ended
+OVERLAP_MODES = ('keep', 'trim')
+
+# The restriction limits the checker has always used
+DEFAULT_RULE_SPEC = {
+    'version': 'default',
+    'rules': [
+        {'name': 'max_tracks_by_artist', 'type': 'total', 'field': 'artist', 'max_tracks': 4},
+        {'name': 'max_consecutive_by_artist', 'type': 'consecutive', 'field': 'artist', 'max_tracks': 3},
+        {'name': 'max_tracks_from_album', 'type': 'total', 'field': 'album', 'max_tracks': 3},
+        {'name': 'max_consecutive_from_album', 'type': 'consecutive', 'field': 'album', 'max_tracks': 2},
+    ],
+}
+
+# TracklistAnalysis attributes filled by the first rule of each type and field
+LEGACY_VERDICTS = {
+    'exceeding_artists': ('total', 'artist'),
+    'exceeding_albums': ('total', 'album'),
+    'consecutive_artist_tracks': ('consecutive', 'artist'),
+    'consecutive_album_tracks': ('consecutive', 'album'),
+}
+
+class Rule:
+    """
+    One restriction from a rule spec. A rule is broken when more than
+    max_tracks tracks share the same artist or album: in the whole show
+    ('total'), in a row ('consecutive') or starting within any
+    window_minutes span ('window').
+    """
+    def __init__(self, name, type, field, max_tracks, window_minutes=None, reason=None, macro=None):
+        if type not in RULE_TYPES:
+            raise ValueError(f"Rule {name!r} has unknown type {type!r}, expected one of: {', '.join(RULE_TYPES)}.")
+        if field not in FIELDS:
+            raise ValueError(f"Rule {name!r} has unknown field {field!r}, expected one of: {', '.join(FIELDS)}.")
+        # bool is an int, but true is not a number of tracks
+        if not isinstance(max_tracks, int) or isinstance(max_tracks, bool) or max_tracks < 0:
+            raise ValueError(f"Rule {name!r} needs a non-negative integer max_tracks.")
+        if type == 'window' and not (isinstance(window_minutes, (int, float)) and not isinstance(window_minutes, bool)
+                                     and window_minutes > 0):
+            raise ValueError(f"Window rule {name!r} needs a positive window_minutes.")
+        for key, text in (('reason', reason), ('macro', macro)):
+            if text is not None and not isinstance(text, str):
+                raise ValueError(f"Rule {name!r} needs text for its {key}.")
+        self.name = name
+        self.type = type
+        self.field = field
+        self.max_tracks = max_tracks
+        self.window_minutes = window_minutes
+        self.reason = reason or self.default_reason()
+        self.macro = macro or self.default_macro()
+
+    def default_reason(self):
+        subject = "By Artist" if self.field == 'artist' else "From Album"
+        if self.type == 'total':
+            return f"Max Tracks {subject}"
+        if self.type == 'consecutive':
+            return f"Max Consecutive Tracks {subject}"
+        return f"Max Tracks {subject} Within {self.window_minutes:g} Minutes"
+
+    def default_macro(self):
+        subject = "by one recording artist" if self.field == 'artist' else "from the same album"
+        if self.type == 'total':
+            return f"This exceeds the limit set for the number of total tracks {subject}."
+        if self.type == 'consecutive':
+            return f"This exceeds the limit set for the number of consecutive tracks {subject}."
+        return (f"This exceeds the limit set for the number of tracks {subject} "
+                f"within {self.window_minutes:g} minutes.")
+
+    def to_spec(self):
+        spec = {'name': self.name, 'type': self.type, 'field': self.field, 'max_tracks': self.max_tracks,
+                'reason': self.reason, 'macro': self.macro}
+        if self.type == 'window':
+            spec['window_minutes'] = self.window_minutes
+        return spec
+
+    def compile(self, multi=False):
+        """
+        Return (step, finish) closures. step(record) is called once per merged
+        row and returns (key, count) when that row leaves a key over the limit,
+        otherwise None. finish() returns {key: {'count': n, 'tracks': [...]}}
+        for the rows seen so far and may be called more than once.
+
+        With multi=True the rule's field holds a tuple of keys (e.g. every
+        artist credited on a track), each key is counted, and step returns a
+        list of (key, count) changes instead.
+        """
+        field = FIELDS[self.field]
+        if self.type == 'total':
+            return (_compile_total_multi if multi else _compile_total)(field, self.max_tracks)
+        if self.type == 'consecutive':
+            return (_compile_consecutive_multi if multi else _compile_consecutive)(field, self.max_tracks)
+        return _compile_window(field, self.max_tracks, self.window_minutes * 60, multi)
+
+class MergePolicy:
+    """
+    How fingerprint rows are merged into tracks, from the optional [merge]
+    table of a rule spec. Rows of the same track are merged while they start
+    at most gap_tolerance seconds after the track's end so far (any gap when
+    None); a track resumed after a longer gap counts as another play. With
+    overlap 'trim', a row overlapping its own track never shortens it and a
+    track that starts before the previous one ended cuts that one short, so
+    tracks never overlap. The defaults merge exactly like the app always has.
+    """
+    def __init__(self, gap_tolerance=None, overlap='keep'):
+        if gap_tolerance is not None and not (isinstance(gap_tolerance, (int, float))
+                                              and not isinstance(gap_tolerance, bool) and gap_tolerance >= 0):
+            raise ValueError("The merge gap_tolerance must be a non-negative number of seconds.")
+        if overlap not in OVERLAP_MODES:
+            raise ValueError(f"Unknown merge overlap {overlap!r}, expected one of: {', '.join(OVERLAP_MODES)}.")
+        self.gap_tolerance = gap_tolerance
+        self.overlap = overlap
+        self.trim = overlap == 'trim'
+        self.is_default = gap_tolerance is None and overlap == 'keep'
+
+    def to_spec(self):
+        spec = {'overlap': self.overlap}
+        if self.gap_tolerance is not None:
+            spec['gap_tolerance'] = self.gap_tolerance
+        return spec
+
+    def continues(self, track_end, row_start):
+        """
+        Whether a row of the same track starting at row_start is merged into
+        a track that so far ends at track_end.
+        """
+        return self.gap_tolerance is None or row_start - track_end <= self.gap_tolerance
+
+    def extended_end(self, track_end, row_end):
+        return max(track_end, row_end) if self.trim else row_end
+
+    def trimmed_end(self, track_start, track_end, row_start):
+        """
+        The end of the previous track once a new track starts at row_start.
+        """
+        if self.trim and track_end > row_start:
+            return max(track_start, row_start)
+        return track_end
+
+DEFAULT_MERGE = MergePolicy()
+
+class RulePlan:
+    """
+    A compiled rule spec. evaluate() runs every rule together in a single
+    pass over (artist, album, track, start, end) records. merge is the
+    MergePolicy the rows are merged with before the rules see them.
+    """
+    def __init__(self, rules, version=None, merge=None):
+        names = [rule.name for rule in rules]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            raise ValueError(f"Duplicate rule names: {', '.join(duplicates)}.")
+        self.rules = list(rules)
+        self.version = version
+        self.merge = merge if merge is not None else DEFAULT_MERGE
+        self._fingerprint = None
+        self.legacy_names = {}
+        for attribute, (type, field) in LEGACY_VERDICTS.items():
+            self.legacy_names[attribute] = next((rule.name for rule in self.rules
+                                                 if rule.type == type and rule.field == field), None)
+        legacy = set(self.legacy_names.values())
+        self.extra_rules = [rule for rule in self.rules if rule.name not in legacy]
+
+    @property
+    def fingerprint(self):
+        """
+        Identifies the rule set, e.g. for cache keys, even if version is not bumped.
+        """
+        if self._fingerprint is None:
+            import hashlib
+            import json
+            spec = {'version': self.version, 'rules': [rule.to_spec() for rule in self.rules]}
+            # Only a changed policy is part of the spec, so existing fingerprints stay valid
+            if not self.merge.is_default:
+                spec['merge'] = self.merge.to_spec()
+            self._fingerprint = hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+        return self._fingerprint
+
+    def evaluate(self, records, multi_fields=()):
+        """
+        Return the number of records seen and {rule name: verdict}. Rules on
+        a field listed in multi_fields get a tuple of keys per record.
+        """
+        compiled = [rule.compile(rule.field in multi_fields) for rule in self.rules]
+        steps = [step for step, finish in compiled]
+        count = 0
+        if len(steps) == 1:
+            step = steps[0]
+            for record in records:
+                count += 1
+                step(record)
+        else:
+            for record in records:
+                count += 1
+                for step in steps:
+                    step(record)
+        return count, {rule.name: finish() for rule, (step, finish) in zip(self.rules, compiled)}
+
+    def legacy_verdicts(self, verdicts):
+        """
+        Map verdicts onto the four dicts the formatters take.
+        """
+        return {attribute: verdicts.get(name, {}) if name else {}
+                for attribute, name in self.legacy_names.items()}
+
+def _compile_total(field, max_tracks):
+    tracks_by_key = {}
+
+    def step(record):
+        key = record[field]
+        tracks = tracks_by_key.get(key)
+        if tracks is None:
+            tracks = tracks_by_key[key] = [record[TRACK]]
+        else:
+            tracks.append(record[TRACK])
+        if len(tracks) > max_tracks:
+            return key, len(tracks)
+
+    def finish():
+        return {key: {'count': len(tracks), 'tracks': tracks}
+                for key, tracks in tracks_by_key.items() if len(tracks) > max_tracks}
+
+    return step, finish
+
+def _compile_consecutive(field, max_tracks):
+    verdict = {}
+    # Current key and the tracks in its run
+    state = [None, []]
+
+    def step(record):
+        key = record[field]
+        if key == state[0]:
+            state[1].append(record[TRACK])
+        else:
+            if state[0] is not None and len(state[1]) > max_tracks:
+                verdict[state[0]] = {'count': len(state[1]), 'tracks': state[1]}
+            state[0] = key
+            state[1] = [record[TRACK]]
+        if len(state[1]) > max_tracks:
+            return key, len(state[1])
+
+    def finish():
+        result = dict(verdict)
+        if state[0] is not None and len(state[1]) > max_tracks:
+            result[state[0]] = {'count': len(state[1]), 'tracks': state[1]}
+        return result
+
+    return step, finish
+
+def _compile_total_multi(field, max_tracks):
+    tracks_by_key = {}
+
+    def step(record):
+        changes = []
+        for key in record[field]:
+            tracks = tracks_by_key.get(key)
+            if tracks is None:
+                tracks = tracks_by_key[key] = [record[TRACK]]
+            else:
+                tracks.append(record[TRACK])
+            if len(tracks) > max_tracks:
+                changes.append((key, len(tracks)))
+        return changes or None
+
+    def finish():
+        return {key: {'count': len(tracks), 'tracks': tracks}
+                for key, tracks in tracks_by_key.items() if len(tracks) > max_tracks}
+
+    return step, finish
+
+def _compile_consecutive_multi(field, max_tracks):
+    verdict = {}
+    # Tracks of the run each key is currently in
+    runs = {}
+
+    def step(record):
+        keys = record[field]
+        for key in [key for key in runs if key not in keys]:
+            tracks = runs.pop(key)
+            if len(tracks) > max_tracks:
+                verdict[key] = {'count': len(tracks), 'tracks': tracks}
+        changes = []
+        for key in keys:
+            tracks = runs.get(key)
+            if tracks is None:
+                tracks = runs[key] = [record[TRACK]]
+            else:
+                tracks.append(record[TRACK])
+            if len(tracks) > max_tracks:
+                changes.append((key, len(tracks)))
+        return changes or None
+
+    def finish():
+        result = dict(verdict)
+        for key, tracks in runs.items():
+            if len(tracks) > max_tracks:
+                result[key] = {'count': len(tracks), 'tracks': tracks}
+        return result
+
+    return step, finish
+
+def _compile_window(field, max_tracks, window_seconds, multi=False):
+    # Per key: start times, tracks, and the index of the oldest play still in the window.
+    # Each play enters and leaves its window once, so the whole pass is linear.
+    plays = {}
+    worst = {}
+
+    def add(key, start, track):
+        entry = plays.get(key)
+        if entry is None:
+            entry = plays[key] = [[], [], 0]
+        starts, tracks, left = entry
+        starts.append(start)
+        tracks.append(track)
+        while start - starts[left] >= window_seconds:
+            left += 1
+        entry[2] = left
+        count = len(starts) - left
+        if count > max_tracks and count > worst.get(key, (0,))[0]:
+            worst[key] = (count, left)
+            return key, count
+
+    if multi:
+        def step(record):
+            start = int(record[START])
+            changes = [add(key, start, record[TRACK]) for key in record[field]]
+            return [change for change in changes if change is not None] or None
+    else:
+        def step(record):
+            return add(record[field], int(record[START]), record[TRACK])
+
+    def finish():
+        return {key: {'count': count, 'tracks': plays[key][1][left:left + count]}
+                for key, (count, left) in worst.items()}
+
+    return step, finish
+
+def compile_rules(spec):
+    """
+    Compile a rule spec dictionary into a RulePlan.
+    """
+    if not isinstance(spec, dict) or not isinstance(spec.get('rules'), list):
+        raise ValueError("A rule spec needs a 'rules' list.")
+    rules = []
+    for i, rule_spec in enumerate(spec['rules']):
+        if not isinstance(rule_spec, dict):
+            raise ValueError(f"Rule {i + 1} must be a table of settings.")
+        rule_spec = dict(rule_spec)
+        name = rule_spec.pop('name', f"rule_{i + 1}")
+        try:
+            rules.append(Rule(name, **rule_spec))
+        except TypeError as e:
+            raise ValueError(f"Rule {name!r} is invalid: {e}") from None
+    merge = spec.get('merge')
+    if merge is not None:
+        if not isinstance(merge, dict):
+            raise ValueError("The merge settings must be a table.")
+        try:
+            merge = MergePolicy(**merge)
+        except TypeError as e:
+            raise ValueError(f"The merge settings are invalid: {e}") from None
+    return RulePlan(rules, version=spec.get('version'), merge=merge)
+
+def load_rules(path):
+    """
+    Load and compile a rule spec from a .toml or .json file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError("Reading TOML rule files needs Python 3.11 or the tomli package.") from None
+        with open(path, 'rb') as f:
+            spec = tomllib.load(f)
+    else:
+        import json
+        with open(path, encoding='utf-8') as f:
+            spec = json.load(f)
+    return compile_rules(spec)
+
+DEFAULT_RULES = compile_rules(DEFAULT_RULE_SPEC)
@@ -0,0 +1,347 @@
+"""
+Local HTTP service that checks tracklists for other tools, so they can get
+verdicts without the desktop app.
+
+    POST /tracklist  cleaned-up table (text/plain)
+    POST /reason     reason for restriction (text/plain)
+    POST /macro      macro info (text/plain)
+    POST /verdict    verdict, repeated tracks and tracks counted by more
+                     than one restriction (application/json)
+    GET  /stats      request counts, latency percentiles and queue state
+    GET  /health     "ok", or 503 with the failure while the workers are
+                     being replaced after one died
+
+The request body is the tracklist exactly as exported, header included.
+Analysis runs in a process pool; concurrent requests are gathered into
+small batches so each trip to a worker carries several shows, and when the
+queue in front of the pool is full new checks are answered with 503 and a
+Retry-After header instead of piling up.
+"""
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+from service_defaults import BATCH_DELAY, BATCH_SIZE, DEFAULT_HOST, DEFAULT_PORT, MAX_PENDING
+
+# Largest accepted tracklist, in bytes
+MAX_BODY = 64 * 1024 * 1024
+# Latencies kept per endpoint for the percentiles in /stats
+LATENCY_SAMPLES = 10000
+
+VIEWS = {'/tracklist': 'tracklist', '/reason': 'reason', '/macro': 'macro', '/verdict': 'verdict'}
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 411: 'Length Required',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+# Settings of a worker process, set once by init_worker
+_worker = {}
+
+def init_worker(options):
+    """
+    Prepare a pool process with the checking options of the service.
+    """
+    from catalog import get_catalog
+    from normalize import get_normalizer
+    from verdict_cache import get_verdict_cache
+    _worker['rules'] = options['rules']
+    _worker['normalizer'] = get_normalizer(options['aliases']) if options['normalize'] else None
+    _worker['cache'] = get_verdict_cache(options['cache_path']) if options['cache_path'] else None
+    _worker['catalog'] = get_catalog(options['catalog_path']) if options['catalog_path'] else None
+
+def check_requests(requests):
+    """
+    Check a batch of (view, tracklist text) in a worker process and return
+    (status, result) for each, where result is the rendered text, the
+    verdict for the 'verdict' view, or an error message.
+    """
+    from verdict_cache import CachedVerdict, analysis_to_verdict, check_tracklist
+    results = []
+    for view, tracklist_data in requests:
+        try:
+            text, analysis = check_tracklist(tracklist_data, 'reason' if view == 'verdict' else view,
+                                             _worker['rules'], _worker['normalizer'], _worker['cache'],
+                                             catalog=_worker['catalog'])
+        except ValueError as e:
+            results.append((400, str(e)))
+            continue
+        except Exception as e:
+            results.append((500, f"{type(e).__name__}: {e}"))
+            continue
+        if view == 'verdict':
+            verdict = dict(analysis.verdict if isinstance(analysis, CachedVerdict) else analysis_to_verdict(analysis))
+            verdict['repeated_tracks'] = [{'field': field, 'key': key, 'tracks': tracks}
+                                          for field, key, tracks in analysis.repeated_tracks()]
+            verdict['overlapping_tracks'] = [
+                {'row': row, 'track': title,
+                 'restrictions': [{'rule': rule_name, 'field': field, 'key': key}
+                                  for rule_name, reason, field, key in restrictions]}
+                for row, title, restrictions in analysis.overlapping_tracks()]
+            results.append((200, verdict))
+        else:
+            results.append((200, text))
+    return results
+
+def percentiles(samples, points=(50, 90, 99)):
+    """
+    Return {'p50': ms, ...} for latencies in seconds, by nearest rank.
+    """
+    if not samples:
+        return {f"p{point}": None for point in points}
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        rank = -(-point * len(ordered) // 100)
+        result[f"p{point}"] = round(ordered[min(len(ordered), max(1, rank)) - 1] * 1000, 3)
+    return result
+
+class Overloaded(Exception):
+    pass
+
+class CheckService:
+    """
+    Queues checks, sends them to the process pool in batches and keeps the
+    numbers shown by /stats. At most two batches per worker are in flight;
+    while the pool is busy checks wait in a queue of max_pending and are
+    rejected with Overloaded once it is full.
+    """
+    def __init__(self, options, jobs, batch_size=BATCH_SIZE, batch_delay=BATCH_DELAY, max_pending=MAX_PENDING):
+        self.options = options
+        self.jobs = jobs
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.queue = asyncio.Queue(max_pending)
+        self.slots = asyncio.Semaphore(jobs * 2)
+        self.pool = None
+        self.batcher = None
+        self.started = time.time()
+        self.latencies = {}
+        self.counts = {}
+        self.rejected = 0
+        self.batches = 0
+        self.batched_checks = 0
+        self.pool_restarts = 0
+        # Why the pool last broke, until a batch is checked by its replacement
+        self.pool_failure = None
+
+    def start(self):
+        self.start_pool()
+        self.batcher = asyncio.get_running_loop().create_task(self.run_batches())
+
+    def start_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+        self.pool = ProcessPoolExecutor(self.jobs, initializer=init_worker, initargs=(self.options,))
+
+    def restart_pool(self, pool, error):
+        """
+        Replace a pool whose worker died. Batches that were in flight on it
+        fail together, so only the first of them replaces it.
+        """
+        self.pool_failure = f"A checking worker stopped ({type(error).__name__}: {error}); the workers were restarted."
+        if pool is not self.pool:
+            return
+        print(self.pool_failure, file=sys.stderr, flush=True)
+        pool.shutdown(wait=False, cancel_futures=True)
+        self.pool_restarts += 1
+        self.start_pool()
+
+    async def stop(self):
+        if self.batcher is not None:
+            self.batcher.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+
+    def check(self, view, tracklist_data):
+        """
+        Queue one check and return a future of (status, result).
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((view, tracklist_data, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded()
+        return future
+
+    async def run_batches(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            if self.queue.qsize() < self.batch_size - 1 and self.batch_delay:
+                await asyncio.sleep(self.batch_delay)
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            # Waiting for a free slot here is what lets the queue fill up under load
+            await self.slots.acquire()
+            self.batches += 1
+            self.batched_checks += len(batch)
+            requests = [(view, tracklist_data) for view, tracklist_data, future in batch]
+            pool = self.pool
+            try:
+                task = loop.run_in_executor(pool, check_requests, requests)
+            except BrokenProcessPool as e:
+                self.slots.release()
+                self.restart_pool(pool, e)
+                answer_batch(batch, [(503, self.pool_failure)] * len(batch))
+                continue
+            except Exception as e:
+                self.slots.release()
+                answer_batch(batch, [(500, f"The batch could not be sent to a worker: {e}")] * len(batch))
+                continue
+            task.add_done_callback(lambda task, batch=batch, pool=pool: self.finish_batch(task, batch, pool))
+
+    def finish_batch(self, task, batch, pool):
+        self.slots.release()
+        if task.cancelled():
+            results = [(503, "The service is shutting down.")] * len(batch)
+        elif isinstance(task.exception(), BrokenProcessPool):
+            self.restart_pool(pool, task.exception())
+            results = [(503, self.pool_failure)] * len(batch)
+        elif task.exception() is not None:
+            results = [(500, f"The checking worker failed: {task.exception()}")] * len(batch)
+        else:
+            if pool is self.pool:
+                self.pool_failure = None
+            results = task.result()
+        answer_batch(batch, results)
+    def record(self, path, status, seconds):
+        if path not in VIEWS and path not in ('/stats', '/health'):
+            path = 'other'
+        key = f"{path} {status}"
+        self.counts[key] = self.counts.get(key, 0) + 1
+        samples = self.latencies.get(path)
+        if samples is None:
+            samples = self.latencies[path] = deque(maxlen=LATENCY_SAMPLES)
+        samples.append(seconds)
+
+    def stats(self):
+        return {
+            'uptime': round(time.time() - self.started, 3),
+            'jobs': self.jobs,
+            'pending': self.queue.qsize(),
+            'max_pending': self.queue.maxsize,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'mean_batch_size': round(self.batched_checks / self.batches, 2) if self.batches else None,
+            'pool_restarts': self.pool_restarts,
+            'pool_failure': self.pool_failure,
+            'responses': dict(sorted(self.counts.items())),
+            'latency_ms': {path: dict(percentiles(samples), count=len(samples))
+                           for path, samples in sorted(self.latencies.items())},
+        }
+
+    async def handle(self, method, path, body):
+        """
+        Return (status, content type, body bytes, extra headers) for a request.
+        """
+        path = path.split('?', 1)[0]
+        if path == '/health':
+            if self.pool_failure is not None:
+                return 503, 'text/plain; charset=utf-8', self.pool_failure.encode('utf-8'), {}
+            return 200, 'text/plain; charset=utf-8', b'ok', {}
+        if path == '/stats':
+            if method != 'GET':
+                return error_response(405, "Use GET for /stats.")
+            return 200, 'application/json', json.dumps(self.stats()).encode('utf-8'), {}
+        view = VIEWS.get(path)
+        if view is None:
+            return error_response(404, f"Unknown endpoint {path}; use {', '.join(VIEWS)}, /stats or /health.")
+        if method != 'POST':
+            return error_response(405, f"POST the tracklist to {path}.")
+        try:
+            tracklist_data = body.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            return error_response(400, "The tracklist must be UTF-8 text.")
+        try:
+            status, result = await self.check(view, tracklist_data)
+        except Overloaded:
+            return error_response(503, "Too many checks are waiting; try again shortly.", {'Retry-After': '1'})
+        if status != 200:
+            return error_response(status, result)
+        if view == 'verdict':
+            return 200, 'application/json', json.dumps(result, ensure_ascii=False).encode('utf-8'), {}
+        return 200, 'text/plain; charset=utf-8', result.encode('utf-8'), {}
+
+    async def serve_connection(self, reader, writer):
+        """
+        Answer HTTP/1.1 requests on one connection until the client closes
+        it or asks to.
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                start = time.perf_counter()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                method, path, *version = request_line.decode('latin-1').split()
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == ['HTTP/1.1']
+                response, close = await self.read_and_handle(reader, method, path, headers)
+                status, content_type, content, extra = response
+                keep_alive = keep_alive and not close
+                head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}",
+                        f"Content-Length: {len(content)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+                head.extend(f"{name}: {value}" for name, value in extra.items())
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + content)
+                await writer.drain()
+                self.record(path.split('?', 1)[0], status, time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def read_and_handle(self, reader, method, path, headers):
+        """
+        Read the body of a request and handle it. Returns the response and
+        whether the connection must be closed afterwards.
+        """
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            return error_response(411, "Send the tracklist with a Content-Length."), True
+        length = int(headers.get('content-length', 0) or 0)
+        if length > MAX_BODY:
+            return error_response(413, f"Tracklists are limited to {MAX_BODY // (1024 * 1024)} MB."), True
+        body = await reader.readexactly(length) if length else b''
+        return await self.handle(method, path, body), False
+
+def answer_batch(batch, results):
+    """
+    Give each queued check of a batch its (status, result).
+    """
+    for (view, tracklist_data, future), result in zip(batch, results):
+        if not future.done():
+            future.set_result(result)
+
+def error_response(status, message, extra=None):
+    return status, 'application/json', json.dumps({'error': message}, ensure_ascii=False).encode('utf-8'), extra or {}
+
+async def serve(options, host=DEFAULT_HOST, port=DEFAULT_PORT, jobs=1, batch_size=BATCH_SIZE,
+                batch_delay=BATCH_DELAY, max_pending=MAX_PENDING):
+    """
+    Run the service until cancelled. options are the check_sources keyword
+    arguments from cli.load_check_options.
+    """
+    import signal
+    try:
+        # Stop cleanly on SIGTERM too, so the pool's workers do not outlive the service
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, AttributeError):
+        pass
+    service = CheckService(options, jobs, batch_size, batch_delay, max_pending)
+    service.start()
+    server = await asyncio.start_server(service.serve_connection, host, port, limit=1024 * 1024, backlog=1024)
+    address = server.sockets[0].getsockname()
+    print(f"Serving tracklist checks on http://{address[0]}:{address[1]} with {jobs} workers", file=sys.stderr,
+          flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
@@ -0,0 +1,11 @@
+"""
+Default settings of the checking service, kept apart from service.py so the
+command line can show them without importing asyncio.
+"""
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Shows sent to a worker at once, and how long to wait for a batch to fill
+BATCH_SIZE = 16
+BATCH_DELAY = 0.002
+# Checks waiting for a worker before new ones are turned away
+MAX_PENDING = 1024
@@ -0,0 +1,62 @@
+"""
+Splitting concatenated exports into shows and checking them in order.
+"""
+import pytest
+from bulk_ingest import check_export, find_show_ranges
+
+HEADER = "Start\tEnd\tArtists\tTrack Title\tId\tAlbums"
+
+def show(artist, tracks):
+    return "\n".join([HEADER] + [f"{i * 200}\t{i * 200 + 200}\t{artist}\tSong {i}\t{i}\tAlbum {i}"
+                                 for i in range(tracks)]) + "\n"
+
+def split(data):
+    return [data[start:end] for _, start, end in find_show_ranges(data)]
+
+def test_shows_start_at_headers():
+    first, second = show('Hank Thompson', 2).encode(), show('Patsy Cline', 1).encode()
+    data = first + second
+    assert list(find_show_ranges(data)) == [(0, 0, len(first)), (1, len(first), len(data))]
+
+def test_empty_file():
+    assert list(find_show_ranges(b'')) == []
+    assert list(find_show_ranges(b'\xef\xbb\xbf')) == []
+
+def test_byte_order_mark_is_skipped():
+    data = b'\xef\xbb\xbf' + show('Hank Thompson', 2).encode() + show('Patsy Cline', 1).encode()
+    ranges = list(find_show_ranges(data))
+    assert ranges[0][1] == 3
+    assert split(data) == [show('Hank Thompson', 2).encode(), show('Patsy Cline', 1).encode()]
+
+@pytest.mark.parametrize('prefix', [b'Exported 2024-05-01\n', b'\xef\xbb\xbfExported\r\n\r\n'])
+def test_text_before_first_header_is_a_show(prefix):
+    data = prefix + show('Hank Thompson', 2).encode()
+    shows = split(data)
+    assert len(shows) == 2
+    assert shows[0] == prefix.replace(b'\xef\xbb\xbf', b'')
+    assert shows[1] == show('Hank Thompson', 2).encode()
+
+def test_blank_lines_before_first_header_are_dropped():
+    assert split(b'\n\r\n' + show('Hank Thompson', 1).encode()) == [show('Hank Thompson', 1).encode()]
+
+def test_crlf_line_endings():
+    first = show('Hank Thompson', 2).replace('\n', '\r\n').encode()
+    second = show('Patsy Cline', 1).replace('\n', '\r\n').encode()
+    assert split(first + second) == [first, second]
+
+def test_header_text_inside_a_row_is_not_a_show():
+    data = show('Hank Thompson', 1).encode() + b'0\t30\tStart\tEnd\t1\tA\n'
+    assert len(split(data)) == 1
+
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_verdicts_in_input_order(tmp_path, jobs):
+    shows = [show(f"Artist {i}", i % 7) for i in range(40)]
+    path = tmp_path / 'export.tsv'
+    path.write_bytes(('\ufeffNot a tracklist\r\n' + ''.join(shows)).encode('utf-8'))
+    verdicts = list(check_export(str(path), jobs=jobs, chunksize=3, backend='python', cache_path=None,
+                                 catalog_path=None))
+    assert [verdict['show'] for verdict in verdicts] == list(range(41))
+    assert 'error' in verdicts[0]
+    assert [verdict['rows'] for verdict in verdicts[1:]] == [i % 7 for i in range(40)]
+    assert [verdict['restricted'] for verdict in verdicts[1:]] == [i % 7 > 3 for i in range(40)]
+    assert all('cached' not in verdict for verdict in verdicts)
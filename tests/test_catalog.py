@@ -0,0 +1,40 @@
+"""
+Loading shows with a TrackCatalog.
+"""
+import pytest
+from catalog import TrackCatalog
+from tracklist_combiner import (InternTable, NonNumericIdError, analyze_tracklist, load_compact_tracklist,
+                                load_tracklist, merge_consecutive_rows)
+
+HEADER = "Start\tEnd\tArtists\tTrack Title\tId\tAlbums"
+
+def show(*rows):
+    return "\n".join([HEADER] + ["\t".join(map(str, row)) for row in rows])
+
+def test_merges_by_id_and_keeps_first_metadata():
+    catalog = TrackCatalog(':memory:')
+    load_compact_tracklist(show((0, 30, 'Hank Thompson', 'Bubbles', 7, 'Six Pack')).splitlines(), catalog=catalog)
+    compact = load_compact_tracklist(show((0, 30, 'HANK THOMPSON', 'Bubbles (Live)', 7, 'Six Pack'),
+                                          (30, 60, 'Hank', 'Bubbles', 7, 'Other')).splitlines(), catalog=catalog)
+    assert compact.dict_rows() == [{'Start': '0', 'End': '60', 'Artists': 'Hank Thompson', 'Track Title': 'Bubbles',
+                                    'Id': '7', 'Albums': 'Six Pack'}]
+
+def test_id_keeps_its_spelling():
+    text = show((0, 30, 'A', 'T', '0012', 'X'), (30, 60, 'A', 'T', '0012', 'X'), (60, 90, 'B', 'U', '12', 'Y'))
+    compact = load_compact_tracklist(text.splitlines(), InternTable(), catalog=TrackCatalog(':memory:'))
+    assert [row['Id'] for row in compact.dict_rows()] == ['0012']
+    assert compact.raw_count == 3
+
+@pytest.mark.parametrize('track_id', ['', 'abc123', '3530145.0', '98765432109876543210', str(2 ** 63),
+                                      str(-2 ** 63 - 1)])
+def test_uncatalogued_ids_fall_back_to_strings(track_id):
+    text = show((0, 30, 'A', 'T', track_id, 'X'), (30, 60, 'A', 'T', track_id, 'X'), (60, 90, 'B', 'U', '5', 'Y'))
+    with pytest.raises(NonNumericIdError):
+        load_compact_tracklist(text.splitlines(), catalog=TrackCatalog(':memory:'))
+    analysis = analyze_tracklist(text, catalog=TrackCatalog(':memory:'))
+    assert analysis.merged_rows == merge_consecutive_rows(load_tracklist(text))
+
+def test_largest_ids_are_catalogued():
+    text = show((0, 30, 'A', 'T', 2 ** 63 - 1, 'X'), (30, 60, 'B', 'U', -2 ** 63, 'Y'))
+    compact = load_compact_tracklist(text.splitlines(), catalog=TrackCatalog(':memory:'))
+    assert [row['Id'] for row in compact.dict_rows()] == [str(2 ** 63 - 1), str(-2 ** 63)]
@@ -0,0 +1,47 @@
+"""
+Intern tables of CompactTracklists loaded alone and by chunk.
+"""
+import io
+from functools import partial
+from cli import check_sources
+from tracklist_combiner import InternTable, analyze_tracklist, load_compact_tracklist
+
+HEADER = "Start\tEnd\tArtists\tTrack Title\tId\tAlbums"
+
+def show(artist, *titles):
+    return "\n".join([HEADER] + [f"{i * 30}\t{i * 30 + 30}\t{artist}\t{title}\t{i}\tAlbum"
+                                 for i, title in enumerate(titles)])
+
+def test_each_show_gets_its_own_table():
+    first = load_compact_tracklist(show('Hank Thompson', 'Bubbles').splitlines())
+    second = load_compact_tracklist(show('Patsy Cline', 'Crazy').splitlines())
+    assert first.table is not second.table
+    assert 'Hank Thompson' not in second.table.ids
+    assert analyze_tracklist(show('Kitty Wells', 'Dust')).compact.table is not first.table
+
+def test_shared_table_stores_strings_once():
+    table = InternTable()
+    load_compact_tracklist(show('Hank Thompson', 'Bubbles').splitlines(), table)
+    compact = load_compact_tracklist(show('Hank Thompson', 'Crazy').splitlines(), table)
+    assert compact.table is table
+    assert table.strings.count('Hank Thompson') == 1
+    assert [row['Artists'] for row in compact.dict_rows()] == ['Hank Thompson']
+
+def test_check_sources_keeps_no_strings_between_chunks(monkeypatch):
+    import cli
+    tables = []
+    load_show = cli.load_show
+    def recording_load_show(*args):
+        compact = load_show(*args)
+        tables.append(compact.table)
+        return compact
+    monkeypatch.setattr(cli, 'load_show', recording_load_show)
+    texts = [show('Hank Thompson', 'Bubbles'), show('Patsy Cline', 'Crazy')]
+    for _ in range(2):
+        verdicts = check_sources([({'file': str(i)}, partial(io.StringIO, text)) for i, text in enumerate(texts)],
+                                 backend='python')
+        assert [verdict['rows'] for verdict in verdicts] == [1, 1]
+    assert tables[0] is tables[1]
+    assert tables[2] is tables[3]
+    assert tables[0] is not tables[2]
+    assert tables[2].strings.count('Hank Thompson') == 1
@@ -0,0 +1,88 @@
+"""
+IncrementalChecker fed row by row must agree with evaluate_rules on every prefix.
+"""
+import random
+import pytest
+from incremental import IncrementalChecker
+from rules import DEFAULT_RULES, compile_rules
+from tracklist_combiner import evaluate_rules, merge_consecutive_rows
+
+# The default rules plus an hourly window, with gaps and overlaps merged by policy
+WINDOW_RULES = compile_rules({
+    'version': 'window',
+    'rules': [rule.to_spec() for rule in DEFAULT_RULES.rules] + [
+        {'name': 'artist_per_hour', 'type': 'window', 'field': 'artist', 'max_tracks': 2, 'window_minutes': 60},
+        {'name': 'album_per_half_hour', 'type': 'window', 'field': 'album', 'max_tracks': 1, 'window_minutes': 30}],
+    'merge': {'gap_tolerance': 30, 'overlap': 'trim'},
+})
+
+def random_rows(seed):
+    """
+    Return fingerprint rows of a few tracks, often split over several rows,
+    with gaps and overlaps.
+    """
+    rng = random.Random(seed)
+    rows = []
+    start = 0
+    for _ in range(rng.randint(1, 150)):
+        artist = rng.randrange(4)
+        album = rng.randrange(2)
+        track = rng.randrange(3)
+        for _ in range(rng.choice((1, 1, 2, 3))):
+            end = start + rng.choice((30, 60, 200))
+            rows.append({'Start': str(start), 'End': str(end), 'Artists': f"Artist {artist}",
+                         'Track Title': f"Track {artist}-{album}-{track}", 'Id': str(artist * 100 + album * 10 + track),
+                         'Albums': f"Album {artist}-{album}"})
+            start = max(0, end + rng.choice((-20, 0, 0, 0, 10, 45, 600)))
+    return rows
+
+@pytest.mark.parametrize('rules', [DEFAULT_RULES, WINDOW_RULES], ids=['default', 'window_and_merge'])
+@pytest.mark.parametrize('seed', range(15))
+def test_prefixes_match_evaluate_rules(seed, rules):
+    rows = random_rows(seed)
+    callback_events = []
+    checker = IncrementalChecker(rules, callback=callback_events.append)
+    all_events = []
+    reported = {}
+    for fed in range(1, len(rows) + 1):
+        events = checker.feed(rows[fed - 1])
+        all_events.extend(events)
+        merged_rows = merge_consecutive_rows(rows[:fed], rules.merge)
+        expected = evaluate_rules(merged_rows, rules=rules)
+        snapshot = checker.snapshot()
+        assert snapshot.merged_rows == merged_rows
+        assert snapshot.verdicts == expected.verdicts
+        assert checker.is_restricted == expected.is_restricted
+        for event in events:
+            key = (event['rule'], event['key'])
+            assert event['new'] == (key not in reported)
+            assert event['count'] != reported.get(key)
+            assert event['row'] == len(merged_rows) - 1
+            reported[key] = event['count']
+        # Every key over a limit was announced, and nothing else
+        assert set(reported) == {(name, key) for name, verdict in expected.verdicts.items() for key in verdict}
+        for rule in rules.rules:
+            if rule.type == 'total':
+                for key, data in expected.verdicts[rule.name].items():
+                    assert reported[(rule.name, key)] == data['count']
+    assert callback_events == all_events
+    assert checker.row_count == len(rows)
+
+def test_events():
+    rows = [{'Start': str(i * 200), 'End': str(i * 200 + 200), 'Artists': 'Hank Thompson',
+             'Track Title': f"Song {i}", 'Id': str(i), 'Albums': f"Album {i}"} for i in range(6)]
+    checker = IncrementalChecker()
+    events = [checker.feed(row) for row in rows]
+    assert events[:3] == [[], [], []]
+    assert events[3] == [{'rule': 'max_consecutive_by_artist', 'key': 'Hank Thompson', 'count': 4, 'new': True,
+                          'row': 3}]
+    assert events[4] == [{'rule': 'max_tracks_by_artist', 'key': 'Hank Thompson', 'count': 5, 'new': True, 'row': 4},
+                         {'rule': 'max_consecutive_by_artist', 'key': 'Hank Thompson', 'count': 5, 'new': False,
+                          'row': 4}]
+    # A row of the same track only extends it
+    assert checker.feed(dict(rows[5], Start='1200', End='1300')) == []
+    assert checker.snapshot().merged_rows[-1]['End'] == '1300'
+    snapshot = checker.snapshot()
+    checker.feed(dict(rows[0], Start='1300', End='1500'))
+    assert snapshot.verdicts['max_tracks_by_artist']['Hank Thompson']['count'] == 6
+    assert checker.snapshot().verdicts['max_tracks_by_artist']['Hank Thompson']['count'] == 7
@@ -0,0 +1,94 @@
+"""
+Every loader and the IncrementalChecker must merge rows the same way under a MergePolicy.
+"""
+import random
+import pytest
+from catalog import TrackCatalog
+from incremental import IncrementalChecker
+from rules import DEFAULT_RULES, MergePolicy, RulePlan
+from tracklist_combiner import load_compact_tracklist, load_tracklist, merge_consecutive_rows
+
+HEADER = "Start\tEnd\tArtists\tTrack Title\tId\tAlbums"
+
+BUBBLES = ('Hank Thompson', 'Bubbles', 1, 'Six Pack')
+CRAZY = ('Patsy Cline', 'Crazy', 2, 'Showcase')
+
+def show(rows):
+    return "\n".join([HEADER] + [f"{start}\t{end}\t{artist}\t{title}\t{track_id}\t{album}"
+                                 for start, end, (artist, title, track_id, album) in rows])
+
+# A 40 second gap inside Bubbles, Crazy starting before Bubbles ends and a Crazy row inside Crazy
+ROWS = [(0, 30, BUBBLES), (30, 60, BUBBLES), (100, 130, BUBBLES), (120, 200, CRAZY), (150, 170, CRAZY),
+        (200, 230, BUBBLES)]
+
+def spans(rows):
+    return [(int(row['Start']), int(row['End']), row['Track Title']) for row in rows]
+
+def dict_spans(text, merge):
+    return spans(merge_consecutive_rows(load_tracklist(text), merge))
+
+def compact_spans(text, merge):
+    return spans(load_compact_tracklist(text.splitlines(), merge=merge).dict_rows())
+
+def catalog_spans(text, merge):
+    return spans(load_compact_tracklist(text.splitlines(), catalog=TrackCatalog(':memory:'), merge=merge).dict_rows())
+
+def incremental_spans(text, merge):
+    checker = IncrementalChecker(RulePlan(DEFAULT_RULES.rules, merge=merge))
+    checker.feed_many(load_tracklist(text))
+    return spans(checker.snapshot().merged_rows)
+
+LOADERS = [dict_spans, compact_spans, catalog_spans, incremental_spans]
+
+@pytest.mark.parametrize('loader', LOADERS)
+@pytest.mark.parametrize('merge, expected', [
+    (MergePolicy(), [(0, 130, 'Bubbles'), (120, 170, 'Crazy'), (200, 230, 'Bubbles')]),
+    (MergePolicy(gap_tolerance=30), [(0, 60, 'Bubbles'), (100, 130, 'Bubbles'), (120, 170, 'Crazy'),
+                                     (200, 230, 'Bubbles')]),
+    (MergePolicy(gap_tolerance=40), [(0, 130, 'Bubbles'), (120, 170, 'Crazy'), (200, 230, 'Bubbles')]),
+    (MergePolicy(overlap='trim'), [(0, 120, 'Bubbles'), (120, 200, 'Crazy'), (200, 230, 'Bubbles')]),
+    (MergePolicy(gap_tolerance=30, overlap='trim'), [(0, 60, 'Bubbles'), (100, 120, 'Bubbles'),
+                                                     (120, 200, 'Crazy'), (200, 230, 'Bubbles')]),
+], ids=['default', 'gap', 'gap_at_tolerance', 'trim', 'gap_and_trim'])
+def test_merge_policy(loader, merge, expected):
+    assert loader(show(ROWS), merge) == expected
+
+def random_rows(seed, backwards=True):
+    """
+    Return rows of a few tracks with gaps, overlaps and, if backwards, rows
+    starting before the previous one.
+    """
+    rng = random.Random(seed)
+    steps = (-40, -10, 0, 0, 0, 5, 30, 90) if backwards else (0, 0, 0, 5, 30, 90)
+    tracks = [BUBBLES, CRAZY, ('Kitty Wells', 'Dust', 3, 'Honky Tonk')]
+    rows = []
+    start = 0
+    for _ in range(rng.randint(1, 60)):
+        start = max(0, start + rng.choice(steps))
+        end = start + rng.choice((0, 10, 30, 30, 60))
+        if not backwards and rng.random() < 0.3:
+            end += rng.choice((20, 50))
+            rows.append((start, end, rng.choice(tracks)))
+            start = max(start, end - rng.choice((10, 50)))
+            continue
+        rows.append((start, end, rng.choice(tracks[:rng.randint(1, 3)])))
+        start = end
+    return rows
+
+@pytest.mark.parametrize('merge', [MergePolicy(), MergePolicy(gap_tolerance=0), MergePolicy(gap_tolerance=25),
+                                   MergePolicy(overlap='trim'), MergePolicy(gap_tolerance=25, overlap='trim')],
+                         ids=['default', 'no_gap', 'gap', 'trim', 'gap_and_trim'])
+@pytest.mark.parametrize('seed', range(20))
+def test_loaders_agree_on_random_shows(seed, merge):
+    text = show(random_rows(seed))
+    expected = dict_spans(text, merge)
+    for loader in LOADERS[1:]:
+        assert loader(text, merge) == expected, loader.__name__
+
+@pytest.mark.parametrize('seed', range(20))
+def test_trimmed_tracks_never_overlap(seed):
+    text = show(random_rows(seed, backwards=False))
+    for merge in (MergePolicy(overlap='trim'), MergePolicy(gap_tolerance=25, overlap='trim')):
+        tracks = compact_spans(text, merge)
+        assert tracks == dict_spans(text, merge) == incremental_spans(text, merge)
+        assert all(end <= next_start for (_, end, _), (next_start, _, _) in zip(tracks, tracks[1:]))
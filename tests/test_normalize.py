@@ -0,0 +1,125 @@
+"""
+Artist credit splitting, album edition stripping and alias tables.
+"""
+import json
+import os
+import pytest
+from normalize import (Normalizer, canonical_album, canonical_name, credit_pattern, current_normalizer,
+                       split_credits)
+from tracklist_combiner import evaluate_rules, load_tracklist, merge_consecutive_rows
+
+@pytest.mark.parametrize('credit, names', [
+    ("Hank Thompson", ["Hank Thompson"]),
+    ("Hank Thompson feat. Merle Travis", ["Hank Thompson", "Merle Travis"]),
+    ("Hank Thompson FT. Merle Travis", ["Hank Thompson", "Merle Travis"]),
+    ("Hank Thompson (feat. Merle Travis)", ["Hank Thompson", "Merle Travis"]),
+    ("A vs. B", ["A", "B"]),
+    ("Little Feat featuring Bonnie Raitt", ["Little Feat", "Bonnie Raitt"]),
+    ("Little Feat & Friends", ["Little Feat & Friends"]),
+    ("Little Feat", ["Little Feat"]),
+    ("Spy vs Spy Orchestra", ["Spy vs Spy Orchestra"]),
+    ("Mumford & Sons", ["Mumford & Sons"]),
+    ("Tyler, The Creator", ["Tyler, The Creator"]),
+    ("Earth, Wind & Fire", ["Earth, Wind & Fire"]),
+    ("Feat Lift (Remix)", ["Feat Lift (Remix)"]),
+])
+def test_split_credits(credit, names):
+    assert split_credits(credit) == names
+
+def test_extra_separators():
+    separators = credit_pattern(['&', ',', 'x'])
+    assert split_credits("Mumford & Sons", separators) == ["Mumford", "Sons"]
+    assert split_credits("A, B & C x D", separators) == ["A", "B", "C", "D"]
+    assert split_credits("R&B Band", separators) == ["R&B Band"]
+    assert split_credits("Xander", separators) == ["Xander"]
+
+def test_canonical_name():
+    assert canonical_name("  HANK   Thompson ") == canonical_name("hank thompson")
+    assert canonical_name("Ｈａｎｋ") == canonical_name("Hank")
+    assert canonical_name("Straße") == canonical_name("STRASSE")
+
+@pytest.mark.parametrize('title, canonical', [
+    ("Six Pack To Go (Deluxe Edition)", "six pack to go"),
+    ("Six Pack To Go [Remastered 2011]", "six pack to go"),
+    ("Six Pack To Go - 25th Anniversary Edition", "six pack to go"),
+    ("Six Pack To Go (Remastered) (Deluxe Edition)", "six pack to go"),
+    ("Six Pack To Go (Live)", "six pack to go (live)"),
+    ("Deluxe Edition", "deluxe edition"),
+    ("Greatest Hits - Vol. 2", "greatest hits - vol. 2"),
+])
+def test_canonical_album(title, canonical):
+    assert canonical_album(title) == canonical
+
+def test_variants_count_together_with_their_own_spelling():
+    normalizer = Normalizer()
+    assert normalizer.artist_ids("Hank Thompson") == normalizer.artist_ids("HANK  THOMPSON")
+    assert normalizer.artist_ids("Hank Thompson feat. Merle Travis") == (normalizer.artist_ids("Hank Thompson")
+                                                                          + normalizer.artist_ids("Merle Travis"))
+    assert normalizer.artist_names("HANK THOMPSON feat. Merle Travis") == ("HANK THOMPSON", "Merle Travis")
+    assert normalizer.album_id("Six Pack To Go") == normalizer.album_id("Six Pack To Go (Deluxe Edition)")
+    assert normalizer.album_name("Six Pack To Go (Deluxe Edition)") == "Six Pack To Go (Deluxe Edition)"
+
+def test_aliases(tmp_path):
+    path = tmp_path / 'aliases.json'
+    path.write_text(json.dumps({
+        'artists': {"Hank Thompson & His Brazos Valley Boys": "Hank Thompson",
+                    "Earth, Wind & Fire": "Earth, Wind & Fire",
+                    "The Duo": ["First", "Second"]},
+        'albums': {"Six Pack To Go (Live)": "Six Pack To Go"},
+        'credit_separators': ["&", ","],
+    }), encoding='utf-8')
+    normalizer = Normalizer(str(path))
+    assert normalizer.artist_ids("Hank Thompson & His Brazos Valley Boys") == normalizer.artist_ids("Hank Thompson")
+    assert normalizer.artist_names("Earth, Wind & Fire") == ("Earth, Wind & Fire",)
+    assert normalizer.artist_names("Mumford & Sons") == ("Mumford", "Sons")
+    assert normalizer.artist_names("The Duo") == ("First", "Second")
+    assert normalizer.album_id("Six Pack To Go (Live)") == normalizer.album_id("Six Pack To Go")
+
+    saved = tmp_path / 'saved.json'
+    normalizer.save_aliases(str(saved))
+    assert Normalizer(str(saved)).fingerprint == normalizer.fingerprint
+    assert Normalizer().fingerprint != normalizer.fingerprint
+
+def test_aliases_change_the_fingerprint():
+    normalizer = Normalizer()
+    before = normalizer.fingerprint
+    first = normalizer.artist_ids("Hank Thompson & His Brazos Valley Boys")
+    normalizer.add_alias('artists', "Hank Thompson & His Brazos Valley Boys", "Hank Thompson")
+    assert normalizer.fingerprint != before
+    assert normalizer.artist_ids("Hank Thompson & His Brazos Valley Boys") != first
+
+@pytest.mark.parametrize('table', [[], {'artists': {'A': 5}}, {'albums': {'A': ['B']}}, {'credit_separators': '&'},
+                                   {'credit_separators': [' ']}])
+def test_invalid_alias_tables(tmp_path, table):
+    path = tmp_path / 'aliases.json'
+    path.write_text(json.dumps(table), encoding='utf-8')
+    with pytest.raises(ValueError):
+        Normalizer(str(path))
+
+def test_verdicts_use_the_spelling_of_the_show():
+    lines = ["Start\tEnd\tArtists\tTrack Title\tId\tAlbums"]
+    lines += [f"{i * 30}\t{i * 30 + 30}\tHANK THOMPSON{' feat. Merle Travis' if i % 2 else ''}\tTrack {i}\t{i}\t"
+              f"Album {i}" for i in range(6)]
+    normalizer = Normalizer()
+    normalizer.artist_ids("Hank Thompson")
+    analysis = evaluate_rules(merge_consecutive_rows(load_tracklist("\n".join(lines))), normalizer=normalizer)
+    assert list(analysis.exceeding_artists) == ["HANK THOMPSON"]
+    assert analysis.exceeding_artists["HANK THOMPSON"]['count'] == 6
+
+def test_current_normalizer_follows_the_alias_file(tmp_path):
+    path = str(tmp_path / 'aliases.json')
+    normalizer = current_normalizer(path)
+    assert normalizer.artist_ids("HANK THOMPSON") == normalizer.artist_ids("Hank Thompson")
+    assert normalizer.artist_ids("Hank & Boys") != normalizer.artist_ids("Hank Thompson")
+    assert current_normalizer(path) is normalizer
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'artists': {"Hank & Boys": "Hank Thompson"}}, f)
+    normalizer = current_normalizer(path)
+    assert normalizer.artist_ids("Hank & Boys") == normalizer.artist_ids("Hank Thompson")
+    assert current_normalizer(path) is normalizer
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({}, f)
+    os.utime(path, ns=(0, 0))
+    assert current_normalizer(path).artist_ids("Hank & Boys") != current_normalizer(path).artist_ids("Hank Thompson")
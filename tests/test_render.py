@@ -0,0 +1,130 @@
+"""
+TracklistTable must lay tracklists out exactly like tabulate's fancy_grid.
+"""
+import io
+import random
+import pytest
+from tracklist_combiner import TracklistTable, format_tracklist, format_tracklist_tabulate, locate_tracklist_rows
+
+pytest.importorskip('tabulate')
+
+def make_row(start, artist, title, album, track_id='1234567'):
+    return {'Start': str(start), 'End': str(start + 210), 'Artists': artist, 'Track Title': title,
+            'Id': track_id, 'Albums': album}
+
+CASES = {
+    'short': [make_row(0, 'Hank Thompson', 'Bubbles', 'Six Pack To Go'),
+              make_row(210, 'Patsy Cline', 'Crazy', 'Showcase')],
+    'wide': [make_row(0, 'Hank Thompson & His Brazos Valley Boys', 'The Wild Side of Life (Remastered 2011)',
+                      'Hank Thompson & His Brazos Valley Boys: Greatest Hits, Vol. 2'),
+             make_row(3600, 'A', 'B', 'C', '98765432109876')],
+    'cjk': [make_row(0, '美空ひばり', '川の流れのように', '不死鳥コンサート'),
+            make_row(210, '山口百恵 and the Tokyo Orchestra', 'さよならの向う側 (ライブ)', 'Best'),
+            make_row(420, 'Ａｌｉｃｅ', '풀잎', '한국 가요 베스트 모음집 제1집')],
+    'empty': [make_row(0, '', '', ''),
+              make_row(210, 'Artist', '', 'Album'),
+              make_row(420, '', 'Title', '', '')],
+    'long_words': [make_row(0, 'Supercalifragilisticexpialidocious', 'x' * 45, 'Album'),
+                   make_row(210, 'Artist', 'Title', 'https://example.com/a/very/long/album/link')],
+}
+
+def random_rows(count, seed):
+    rng = random.Random(seed)
+    words = ['Hank', 'Thompson', '美空', 'ひばり', '', 'Vol.', 'Greatest', 'Hits', 'x' * 25, '&', 'ÄÖÜ', '한국']
+    rows = []
+    start = 0
+    for _ in range(count):
+        cell = lambda: ' '.join(rng.choice(words) for _ in range(rng.randint(0, 6))).strip()
+        rows.append(make_row(start, cell(), cell(), cell(), str(rng.randint(1, 10 ** 9))))
+        start += rng.randint(0, 40000)
+    return rows
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_matches_tabulate(name):
+    rows = CASES[name]
+    table = TracklistTable(rows)
+    assert table.plain
+    assert table.render() == format_tracklist_tabulate(rows)
+    assert format_tracklist(rows) == format_tracklist_tabulate(rows)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_random_rows_match_tabulate(seed):
+    rows = random_rows(30, seed)
+    assert TracklistTable(rows).render() == format_tracklist_tabulate(rows)
+
+def test_control_characters_fall_back_to_tabulate():
+    rows = [make_row(0, 'Artist\x1b[1m', 'Title', 'Album')]
+    assert not TracklistTable(rows).plain
+    assert format_tracklist(rows) == format_tracklist_tabulate(rows)
+
+@pytest.mark.parametrize('name', sorted(CASES))
+@pytest.mark.parametrize('chunk_lines', [1, 2, 3, 5, 4096])
+def test_write_matches_render(name, chunk_lines):
+    table = TracklistTable(CASES[name])
+    out = io.StringIO()
+    table.write(out, chunk_lines=chunk_lines)
+    assert out.getvalue() == table.render()
+
+def test_write_with_full_last_chunk():
+    table = TracklistTable(CASES['short'])
+    line_count = len(list(table.iter_lines()))
+    for chunk_lines in (1, line_count):
+        out = io.StringIO()
+        table.write(out, chunk_lines=chunk_lines)
+        assert out.getvalue() == table.render()
+        assert not out.getvalue().endswith('\n')
+
+def test_render_range():
+    rows = random_rows(12, 7)
+    table = TracklistTable(rows)
+    full = table.render().split('\n')
+    spans = table.row_spans()
+    head, bottom = full[:3], full[-1]
+    for start, stop in [(0, 12), (0, 1), (3, 7), (11, 12), (5, 40), (4, 4)]:
+        expected = list(head)
+        for i in range(start, min(stop, len(rows))):
+            if i > start:
+                expected.append(table.line_between_rows)
+            expected.extend(full[spans[i][0]:spans[i][1]])
+        expected.append(bottom)
+        assert table.render(start, stop) == '\n'.join(expected)
+        out = io.StringIO()
+        table.write(out, start, stop, chunk_lines=2)
+        assert out.getvalue() == table.render(start, stop)
+
+def styled(rows):
+    return [dict(row, Artists=f"\x1b[1m{row['Artists']}\x1b[0m", Albums=row['Albums'] + '\x07') for row in rows]
+
+def assert_spans_match_rows(rows, text, spans):
+    lines = text.split('\n')
+    assert len(spans) == len(rows)
+    assert spans[0][0] == 3
+    assert lines[spans[-1][1]].startswith('╘')
+    for (_, stop), (next_first, _) in zip(spans, spans[1:]):
+        assert lines[stop].startswith('├') and next_first == stop + 1
+    for row, (first, stop) in zip(rows, spans):
+        assert first < stop
+        if row['Track Title']:
+            assert row['Track Title'].split()[0][:10] in '\n'.join(lines[first:stop])
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_locate_rows(name):
+    rows = CASES[name]
+    text, spans = locate_tracklist_rows(rows)
+    assert (text, spans) == (TracklistTable(rows).render(), TracklistTable(rows).row_spans())
+    assert_spans_match_rows(rows, text, spans)
+
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_locate_rows_of_tabulate_fallback(name):
+    rows = styled(CASES[name])
+    assert not TracklistTable(rows).plain
+    text, spans = locate_tracklist_rows(rows)
+    assert text == format_tracklist_tabulate(rows)
+    assert_spans_match_rows(rows, text, spans)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_locate_random_rows_of_tabulate_fallback(seed):
+    rows = [dict(row, **{'Track Title': f"Row{i}. {row['Track Title']}"})
+            for i, row in enumerate(styled(random_rows(20, seed)))]
+    text, spans = locate_tracklist_rows(rows)
+    assert_spans_match_rows(rows, text, spans)
@@ -0,0 +1,124 @@
+"""
+Compiling rule specs and the sliding-window rule.
+"""
+import json
+import os
+import random
+import pytest
+from rules import DEFAULT_RULES, MergePolicy, compile_rules, load_rules
+
+EXAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'rules.example.toml')
+
+def spec(**settings):
+    rule = {'name': 'rule', 'type': 'total', 'field': 'artist', 'max_tracks': 2}
+    rule.update(settings)
+    return {'rules': [rule]}
+
+@pytest.mark.parametrize('bad_spec, message', [
+    ([], "needs a 'rules' list"),
+    ({'rules': {}}, "needs a 'rules' list"),
+    ({'rules': ['max_tracks_by_artist']}, "Rule 1 must be a table"),
+    (spec(type='daily'), "unknown type 'daily'"),
+    (spec(field='label'), "unknown field 'label'"),
+    (spec(max_tracks=True), "non-negative integer max_tracks"),
+    (spec(max_tracks=-1), "non-negative integer max_tracks"),
+    (spec(max_tracks=2.5), "non-negative integer max_tracks"),
+    (spec(max_tracks='4'), "non-negative integer max_tracks"),
+    (spec(type='window'), "positive window_minutes"),
+    (spec(type='window', window_minutes=0), "positive window_minutes"),
+    (spec(type='window', window_minutes=True), "positive window_minutes"),
+    (spec(reason=5), "needs text for its reason"),
+    (spec(macro=['x']), "needs text for its macro"),
+    (spec(limit=3), "Rule 'rule' is invalid"),
+    ({'rules': [{'type': 'total', 'field': 'artist'}]}, "Rule 'rule_1' is invalid"),
+    ({'rules': spec()['rules'] * 2}, "Duplicate rule names: rule"),
+    ({'rules': [], 'merge': 60}, "merge settings must be a table"),
+    ({'rules': [], 'merge': {'gap': 60}}, "merge settings are invalid"),
+    ({'rules': [], 'merge': {'gap_tolerance': -1}}, "non-negative number of seconds"),
+    ({'rules': [], 'merge': {'gap_tolerance': True}}, "non-negative number of seconds"),
+    ({'rules': [], 'merge': {'overlap': 'cut'}}, "Unknown merge overlap 'cut'"),
+])
+def test_invalid_specs(bad_spec, message):
+    with pytest.raises(ValueError, match=message.replace('(', r'\(')):
+        compile_rules(bad_spec)
+
+def test_defaults_and_wording():
+    plan = compile_rules({'version': 'v2', 'rules': [
+        {'type': 'window', 'field': 'album', 'max_tracks': 1, 'window_minutes': 90},
+        {'name': 'custom', 'type': 'consecutive', 'field': 'artist', 'max_tracks': 0, 'reason': 'Too Many'}]})
+    window, custom = plan.rules
+    assert window.name == 'rule_1'
+    assert window.reason == "Max Tracks From Album Within 90 Minutes"
+    assert custom.reason == 'Too Many'
+    assert custom.macro == "This exceeds the limit set for the number of consecutive tracks by one recording artist."
+    assert plan.merge.is_default
+    assert plan.legacy_names['consecutive_artist_tracks'] == 'custom'
+    assert plan.legacy_names['exceeding_artists'] is None
+    assert plan.extra_rules == [window]
+
+def test_fingerprint_follows_the_spec():
+    assert compile_rules({'version': 'default', 'rules': [rule.to_spec() for rule in DEFAULT_RULES.rules]}
+                         ).fingerprint == DEFAULT_RULES.fingerprint
+    assert compile_rules(spec()).fingerprint != compile_rules(spec(max_tracks=3)).fingerprint
+    assert compile_rules(spec()).fingerprint == compile_rules(dict(spec(), merge={})).fingerprint
+    assert compile_rules(spec()).fingerprint != compile_rules(dict(spec(), merge={'overlap': 'trim'})).fingerprint
+
+def test_load_example_rules():
+    plan = load_rules(EXAMPLE_PATH)
+    assert plan.version == 'example-1'
+    assert [rule.name for rule in plan.rules[:4]] == [rule.name for rule in DEFAULT_RULES.rules]
+    window = plan.rules[4]
+    assert (window.type, window.field, window.max_tracks, window.window_minutes) == ('window', 'artist', 3, 60)
+    assert window.reason == "Max Tracks By Artist Within An Hour"
+    assert plan.merge.to_spec() == MergePolicy(gap_tolerance=60, overlap='trim').to_spec()
+
+def test_load_json_rules(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps(spec(max_tracks=7)), encoding='utf-8')
+    assert load_rules(str(path)).rules[0].max_tracks == 7
+    path.write_text(json.dumps({'rules': 'none'}), encoding='utf-8')
+    with pytest.raises(ValueError):
+        load_rules(str(path))
+
+def window_by_scan(records, key_position, max_tracks, window_seconds):
+    """
+    The window verdict from counting, for every play, the plays of its key
+    that started less than window_seconds before it.
+    """
+    plays = {}
+    for artist, album, track, start, end in records:
+        plays.setdefault((artist, album)[key_position], []).append((int(start), track))
+    verdict = {}
+    for key, key_plays in plays.items():
+        best = None
+        for i, (start, _) in enumerate(key_plays):
+            first = min(j for j in range(i + 1) if start - key_plays[j][0] < window_seconds)
+            if best is None or i + 1 - first > best[0]:
+                best = (i + 1 - first, first)
+        count, first = best
+        if count > max_tracks:
+            verdict[key] = {'count': count, 'tracks': [track for _, track in key_plays[first:first + count]]}
+    return verdict
+
+def random_records(rng):
+    records = []
+    start = 0
+    for track in range(rng.randint(0, 120)):
+        start += rng.choice((0, 60, 180, 210, 240, 1800, 3600))
+        artist = f"Artist {rng.randrange(5)}"
+        records.append((artist, f"{artist} Album {rng.randrange(2)}", track, str(start), str(start + 200)))
+    return records
+
+@pytest.mark.parametrize('seed', range(40))
+def test_window_rule_matches_scan(seed):
+    rng = random.Random(seed)
+    records = random_records(rng)
+    field = rng.choice(('artist', 'album'))
+    max_tracks = rng.randint(0, 4)
+    window_minutes = rng.choice((1, 10, 30, 60, 90.5))
+    plan = compile_rules({'rules': [{'name': 'window', 'type': 'window', 'field': field, 'max_tracks': max_tracks,
+                                     'window_minutes': window_minutes}]})
+    count, verdicts = plan.evaluate(records)
+    assert count == len(records)
+    assert verdicts['window'] == window_by_scan(records, 0 if field == 'artist' else 1, max_tracks,
+                                                window_minutes * 60)
@@ -0,0 +1,65 @@
+"""
+TimeIndex lookups must match a scan over every row.
+"""
+import random
+import pytest
+from tracklist_combiner import TimeIndex, analyze_tracklist
+
+def playing(starts, ends, start, stop):
+    if stop <= start:
+        return [row for row in range(len(starts)) if starts[row] <= start < ends[row]]
+    return [row for row in range(len(starts)) if starts[row] < stop and ends[row] > start]
+
+def first_start(starts, seconds):
+    later = [(start, row) for row, start in enumerate(starts) if start >= seconds]
+    return min(later)[1] if later else None
+
+def test_lookups():
+    # Back to back tracks, a gap, an overlap and an empty row
+    starts = [0, 30, 100, 120, 200]
+    ends = [30, 60, 130, 150, 200]
+    index = TimeIndex(starts, ends)
+    assert len(index) == 5
+    assert index.at(0) == [0]
+    assert index.at(30) == [1]
+    assert index.at(60) == []
+    assert index.at(125) == [2, 3]
+    assert index.at(200) == []
+    assert index.between(50, 110) == [1, 2]
+    assert index.between(60, 100) == []
+    assert index.between(125, 125) == [2, 3]
+    assert index.next_start(31) == 2
+    assert index.next_start(120) == 3
+    assert index.next_start(201) is None
+
+def test_rows_out_of_order():
+    index = TimeIndex([100, 0, 50], [150, 60, 120])
+    assert index.at(55) == [1, 2]
+    assert index.between(110, 130) == [0, 2]
+    assert index.next_start(1) == 2
+
+@pytest.mark.parametrize('seed', range(30))
+def test_random_rows_match_scan(seed):
+    rng = random.Random(seed)
+    starts, ends = [], []
+    start = 0
+    for _ in range(rng.randint(0, 80)):
+        start = max(0, start + rng.choice((-200, -20, 0, 10, 30, 200)))
+        starts.append(start)
+        ends.append(start + rng.choice((0, 30, 30, 240, 3000)))
+    index = TimeIndex(starts, ends)
+    limit = max(ends, default=0) + 10
+    for _ in range(60):
+        a, b = rng.randint(-5, limit), rng.randint(-5, limit)
+        assert index.at(a) == playing(starts, ends, a, a)
+        assert index.between(a, b) == playing(starts, ends, a, b)
+        assert index.next_start(a) == first_start(starts, a)
+
+def test_analysis_time_index():
+    text = "\n".join(["Start\tEnd\tArtists\tTrack Title\tId\tAlbums",
+                      "0\t30\tHank Thompson\tBubbles\t1\tSix Pack",
+                      "30\t60\tHank Thompson\tBubbles\t1\tSix Pack",
+                      "60\t90\tPatsy Cline\tCrazy\t2\tShowcase"])
+    analysis = analyze_tracklist(text)
+    assert analysis.time_index.at(45) == [0]
+    assert analysis.time_index.between(59, 61) == [0, 1]
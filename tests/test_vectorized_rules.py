@@ -0,0 +1,72 @@
+"""
+The NumPy backend must give the same verdicts as the Python rules.
+"""
+import random
+import pytest
+from rules import DEFAULT_RULES, Rule, RulePlan
+from tracklist_combiner import InternTable, load_compact_tracklist
+from vectorized_rules import evaluate_batch
+
+pytest.importorskip('numpy')
+
+HEADER = "Start\tEnd\tArtists\tTrack Title\tId\tAlbums"
+
+# Limits other than the defaults, including ones every show exceeds
+CUSTOM_RULES = RulePlan([
+    Rule('max_tracks_by_artist', 'total', 'artist', 1),
+    Rule('max_consecutive_by_artist', 'consecutive', 'artist', 0),
+    Rule('max_tracks_from_album', 'total', 'album', 6),
+    Rule('max_consecutive_from_album', 'consecutive', 'album', 1),
+    Rule('albums_in_a_row', 'consecutive', 'album', 3),
+], version='custom')
+
+def make_show(rng, rows):
+    """
+    Return a tracklist of rows fingerprint windows drawn from a few artists
+    and albums, so runs and repeats are common.
+    """
+    lines = [HEADER]
+    start = 0
+    for _ in range(rows):
+        artist = rng.randrange(6)
+        album = rng.randrange(3)
+        track = rng.randrange(4)
+        end = start + rng.choice((30, 30, 60))
+        lines.append(f"{start}\t{end}\tArtist {artist}\tTrack {track}\t{artist * 100 + album * 10 + track}\t"
+                     f"Album {artist}-{album}")
+        start = end + rng.choice((0, 0, 30))
+    return "\n".join(lines)
+
+def make_batch(seed):
+    rng = random.Random(seed)
+    table = InternTable()
+    texts = [make_show(rng, rng.choice((0, 0, 1, 2, rng.randint(3, 40), rng.randint(40, 300))))
+             for _ in range(rng.randint(1, 12))]
+    return [load_compact_tracklist(text.splitlines(), table) for text in texts]
+
+def assert_same(numpy_analyses, python_analyses):
+    assert len(numpy_analyses) == len(python_analyses)
+    for show, (numpy_analysis, python_analysis) in enumerate(zip(numpy_analyses, python_analyses)):
+        assert numpy_analysis.merged_count == python_analysis.merged_count, show
+        assert numpy_analysis.verdicts == python_analysis.verdicts, show
+        assert numpy_analysis.is_restricted == python_analysis.is_restricted, show
+        assert numpy_analysis.reason_for_restriction() == python_analysis.reason_for_restriction(), show
+        assert numpy_analysis.macro_info() == python_analysis.macro_info(), show
+
+@pytest.mark.parametrize('rules', [DEFAULT_RULES, CUSTOM_RULES], ids=['default', 'custom'])
+@pytest.mark.parametrize('seed', range(25))
+def test_random_batches(seed, rules):
+    compacts = make_batch(seed)
+    assert_same(evaluate_batch(compacts, 'numpy', rules), evaluate_batch(compacts, 'python', rules))
+
+def test_batch_of_empty_shows():
+    compacts = [load_compact_tracklist([HEADER]) for _ in range(3)]
+    analyses = evaluate_batch(compacts, 'numpy', CUSTOM_RULES)
+    assert_same(analyses, evaluate_batch(compacts, 'python', CUSTOM_RULES))
+    assert not any(analysis.is_restricted for analysis in analyses)
+
+def test_order_of_shows_does_not_matter():
+    compacts = make_batch(99)
+    whole = evaluate_batch(compacts, 'numpy', CUSTOM_RULES)
+    for compact, analysis in zip(compacts, whole):
+        assert_same([analysis], evaluate_batch([compact], 'numpy', CUSTOM_RULES))
@@ -0,0 +1,78 @@
+"""
+VerdictCache eviction and the links from exact texts to entries.
+"""
+import time
+from tracklist_combiner import DEFAULT_RULES
+from verdict_cache import VerdictCache, check_tracklist, get_verdict_cache, text_key
+
+HEADER = "Start\tEnd\tArtists\tTrack Title\tId\tAlbums"
+
+def record(name):
+    return {'verdict': {'restricted': False, 'name': name}, 'repeated_tracks': [], 'overlapping_tracks': []}
+
+def set_accessed(cache, key, seconds_ago):
+    cache._connect().execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time() - seconds_ago, key))
+
+def keys(cache):
+    return sorted(key for key, in cache._connect().execute("SELECT key FROM entries"))
+
+def test_evicts_entries_past_max_age(tmp_path):
+    cache = VerdictCache(str(tmp_path / 'cache.sqlite3'), max_age_days=30)
+    for key in ('old', 'recent', 'new'):
+        cache.put(key, record(key), text_key=f'text-{key}')
+    set_accessed(cache, 'old', 31 * 86400)
+    set_accessed(cache, 'recent', 29 * 86400)
+    assert cache.evict() == 1
+    assert keys(cache) == ['new', 'recent']
+    assert cache.lookup_text('text-old') is None
+    assert cache.lookup_text('text-recent') == ('recent', 0)
+    assert cache.stats()['evictions'] == 1
+
+def test_evicts_least_recently_used_beyond_max_bytes(tmp_path):
+    cache = VerdictCache(str(tmp_path / 'cache.sqlite3'))
+    for key in ('a', 'b', 'c', 'd'):
+        cache.put(key, record(key), {'reason': 'x' * 1000})
+    for seconds_ago, key in enumerate(('c', 'a', 'd', 'b')):
+        set_accessed(cache, key, seconds_ago)
+    cache.max_bytes = cache.stats()['bytes'] // 2
+    assert cache.evict() == 2
+    assert keys(cache) == ['a', 'c']
+    assert cache.stats()['bytes'] <= cache.max_bytes
+    assert cache.evict() == 0
+
+def test_get_verdict_cache_evicts_on_open(tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    writer = VerdictCache(path)
+    writer.put('stale', record('stale'))
+    writer.put('fresh', record('fresh'))
+    set_accessed(writer, 'stale', 60 * 86400)
+    writer.close()
+    cache = get_verdict_cache(path)
+    assert keys(cache) == ['fresh']
+    assert get_verdict_cache(path) is cache
+
+def test_text_key_links_to_entry(tmp_path):
+    cache = VerdictCache(str(tmp_path / 'cache.sqlite3'))
+    cache.put('content', record('show'), {'reason': 'Reason'}, text_key='exact', raw_count=12)
+    assert cache.lookup_text('exact') == ('content', 12)
+    cache.link('reupload', 'content', 14)
+    assert cache.lookup_text('reupload') == ('content', 14)
+    assert cache.get(cache.lookup_text('reupload')[0], 'reason')['reason'] == 'Reason'
+    assert cache.lookup_text('unknown') is None
+
+def test_rechecks_are_answered_by_text_then_content(tmp_path):
+    cache = VerdictCache(str(tmp_path / 'cache.sqlite3'))
+    rows = [f"{i * 30}\t{i * 30 + 30}\tHank Thompson\tSong {i // 2}\t{i // 2}\tAlbum" for i in range(10)]
+    text = "\n".join([HEADER] + rows)
+    reupload = text + "\n"
+    first, analysis = check_tracklist(text, 'reason', cache=cache)
+    assert analysis.is_restricted
+    assert cache.lookup_text(text_key(text, DEFAULT_RULES)) is not None
+    hits = cache.hits
+    second, cached = check_tracklist(text, 'reason', cache=cache)
+    assert second == first and cached.is_restricted and cache.hits == hits + 1
+    assert cache.lookup_text(text_key(reupload, DEFAULT_RULES)) is None
+    third, _ = check_tracklist(reupload, 'reason', cache=cache)
+    assert third == first
+    assert cache.lookup_text(text_key(reupload, DEFAULT_RULES)) == cache.lookup_text(text_key(text, DEFAULT_RULES))
+    assert cache.stats()['entries'] == 1
@@ -0,0 +1,76 @@
+"""
+ViolationIndex and the warning the app shows for tracks it flags.
+"""
+from tracklist_combiner import analyze_tracklist, format_review_warning
+from verdict_cache import CachedVerdict, analysis_record
+
+HEADER = "Start\tEnd\tArtists\tTrack Title\tId\tAlbums"
+
+def show(*rows):
+    return "\n".join([HEADER] + ["\t".join(map(str, row)) for row in rows])
+
+def rule_names(violations):
+    return [(rule.name, key) for rule, key in violations]
+
+# Five Hank Thompson plays, four in a row, with Bubbles played twice
+HANK = show((0, 200, 'Hank Thompson', 'Bubbles', 1, 'Six Pack'),
+            (200, 400, 'Hank Thompson', 'Humpty Dumpty Heart', 2, 'Greatest Hits'),
+            (400, 600, 'Hank Thompson', 'Wild Side', 3, 'Songs'),
+            (600, 800, 'Hank Thompson', 'Squaws Along the Yukon', 4, 'Live'),
+            (800, 1000, 'Patsy Cline', 'Crazy', 99, 'Showcase'),
+            (1000, 1200, 'Hank Thompson', 'Bubbles', 1, 'Six Pack'))
+
+def test_track_counted_by_two_rules():
+    index = analyze_tracklist(HANK).index
+    assert rule_names(index.violations(0)) == [('max_tracks_by_artist', 'Hank Thompson'),
+                                               ('max_consecutive_by_artist', 'Hank Thompson')]
+    assert index.violations(4) == []
+    assert rule_names(index.violations(5)) == [('max_tracks_by_artist', 'Hank Thompson')]
+    assert index.is_overlapping(0)
+    assert not index.is_overlapping(4) and not index.is_overlapping(5)
+    assert index.overlapping_rows() == [0, 1, 2, 3]
+
+def test_violations_for_id():
+    index = analyze_tracklist(HANK).index
+    plays = index.violations_for_id('1')
+    assert sorted(plays) == [0, 5]
+    assert rule_names(plays[5]) == [('max_tracks_by_artist', 'Hank Thompson')]
+    assert index.violations_for_id('99') == {}
+    assert index.violations_for_id('12345') == {}
+
+def test_overlapping_and_repeated_tracks():
+    analysis = analyze_tracklist(HANK)
+    overlapping = analysis.overlapping_tracks()
+    assert [(row, title) for row, title, _ in overlapping] == [
+        (0, 'Bubbles'), (1, 'Humpty Dumpty Heart'), (2, 'Wild Side'), (3, 'Squaws Along the Yukon')]
+    assert overlapping[0][2] == [
+        ('max_tracks_by_artist', 'Max Tracks By Artist', 'artist', 'Hank Thompson'),
+        ('max_consecutive_by_artist', 'Max Consecutive Tracks By Artist', 'artist', 'Hank Thompson')]
+    assert analysis.repeated_tracks() == [('artist', 'Hank Thompson', ['Bubbles'])]
+
+def test_album_and_artist_labels():
+    text = show(*[(i * 200, i * 200 + 200, 'Hank Thompson', f'Song {i}', i + 1, 'Greatest Hits') for i in range(4)])
+    warning = format_review_warning(analyze_tracklist(text))
+    assert warning.startswith("The following track(s) are causing more than one restriction:\n\nSong 0:\n"
+                              "\t  - Max Consecutive Tracks By Artist (Artist) Hank Thompson\n"
+                              "\t  - Max Tracks From Album (Album) Greatest Hits\n"
+                              "\t  - Max Consecutive Tracks From Album (Album) Greatest Hits\n")
+    assert "counted more than once" not in warning
+    assert warning.endswith("\nPlease review manually.")
+
+def test_repeated_section():
+    warning = format_review_warning(analyze_tracklist(HANK))
+    assert ("The following track(s) are counted more than once by one restriction:\n\n"
+            "(Artist) Hank Thompson:\n\t  - Bubbles\n") in warning
+
+def test_no_warning_for_a_clean_show():
+    text = show((0, 200, 'Hank Thompson', 'Bubbles', 1, 'Six Pack'), (200, 400, 'Patsy Cline', 'Crazy', 2, 'Showcase'))
+    analysis = analyze_tracklist(text)
+    assert analysis.index.overlapping_rows() == []
+    assert format_review_warning(analysis) == ''
+
+def test_cached_verdict_gives_the_same_warning():
+    analysis = analyze_tracklist(HANK)
+    cached = CachedVerdict(analysis_record(analysis))
+    assert cached.overlapping_tracks() == analysis.overlapping_tracks()
+    assert format_review_warning(cached) == format_review_warning(analysis)
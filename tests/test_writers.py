@@ -0,0 +1,48 @@
+"""
+Outlines of the report texts and violation_at lookups.
+"""
+from tracklist_combiner import analyze_tracklist
+from writers import outline_reports, render_reports, violation_at
+
+HEADER = "Start\tEnd\tArtists\tTrack Title\tId\tAlbums"
+
+def show(*rows):
+    return "\n".join([HEADER] + ["\t".join(map(str, row)) for row in rows])
+
+# Hank Thompson breaks both artist rules and Greatest Hits both album rules
+TEXT = show(*[(i * 200, i * 200 + 200, 'Hank Thompson', f'Song {i}', i + 1, 'Greatest Hits') for i in range(5)],
+            (1000, 1200, 'Patsy Cline', 'Crazy', 99, 'Showcase'))
+
+def test_outline_covers_each_violation():
+    analysis = analyze_tracklist(TEXT)
+    outline = outline_reports(analysis)
+    texts = dict(zip(('reason', 'macro'), render_reports(analysis)))
+    for view in ('reason', 'macro'):
+        lines = texts[view].split('\n')
+        entries = outline[view]
+        assert sorted(entries) == entries
+        assert {(name, key) for _, _, name, key in entries} == {
+            (name, key) for name, verdict in analysis.verdicts.items() for key in verdict}
+        for first, stop, name, key in entries:
+            assert first < stop <= len(lines)
+            assert key in lines[first]
+            assert 'Song 0' in '\n'.join(lines[first:stop])
+        for (_, stop, _, _), (next_first, _, _, _) in zip(entries, entries[1:]):
+            assert stop <= next_first
+
+def test_violation_at():
+    analysis = analyze_tracklist(TEXT)
+    outline = outline_reports(analysis)['reason']
+    line_count = render_reports(analysis, macro=False)[0].count('\n') + 1
+    covered = {}
+    for first, stop, name, key in outline:
+        for line in range(first, stop):
+            covered[line] = (name, key)
+    assert covered
+    for line in range(-1, line_count + 2):
+        assert violation_at(outline, line) == covered.get(line)
+
+def test_clean_show_has_empty_outline():
+    analysis = analyze_tracklist(show((0, 200, 'Hank Thompson', 'Bubbles', 1, 'Six Pack')))
+    assert outline_reports(analysis) == {'reason': [], 'macro': []}
+    assert violation_at([], 0) is None
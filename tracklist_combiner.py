@@ -1,19 +1,66 @@
-from tabulate import tabulate
-import textwrap
+from array import array
+import bisect
+from collections import OrderedDict
+import io
+import itertools
+import threading
+from functools import lru_cache
+from instrumentation import count, stage
+from rules import DEFAULT_RULES
+
+# Number of analysed tracklists kept in memory by analyze_tracklist
+ANALYSIS_CACHE_SIZE = 16
+_analysis_cache = OrderedDict()
+# Guards the analysis cache and the shows it loads against worker threads
+_analysis_lock = threading.RLock()
+# Lines between progress callbacks in analyze_tracklist
+PROGRESS_INTERVAL = 5000
+
+# Columns every tracklist header must contain
+TRACKLIST_HEADERS = ['Start', 'End', 'Artists', 'Track Title', 'Id', 'Albums']
+# Columns wrapped to WRAP_WIDTH characters by format_tracklist
+WRAPPED_COLUMNS = ('Artists', 'Track Title', 'Albums')
+WRAP_WIDTH = 20
+# Rows with the same values for these keys are merged into one track
+MERGE_KEYS = ['Artists', 'Track Title', 'Id', 'Albums']
 
 def load_tracklist(tracklist_data):
     """
     Process the tracklist data and return a list of dictionaries representing rows of data.
     """
-    # Split the data into rows
-    rows = tracklist_data.strip().split('\n')
-    # Split each row into columns based on tabs
-    rows = [row.split('\t') for row in rows]
-    # Extract the headers
-    headers = rows[0]
-    # Create dictionaries for each row
-    dict_rows = [create_dict(row, headers) for row in rows[1:]]
-    return dict_rows
+    return list(iter_tracklist(tracklist_data))
+
+def iter_tracklist(lines):
+    """
+    Lazily parse a tracklist from a string, file object or iterator of lines,
+    yielding one dictionary per row. The header is checked once up front.
+    """
+    split_rows = iter_split_rows(lines)
+    headers = check_headers(next(split_rows, []))
+    for row in split_rows:
+        yield create_dict(row, headers)
+
+def iter_split_rows(lines):
+    """
+    Split non-blank lines into lists of tab-separated columns.
+    """
+    if isinstance(lines, str):
+        lines = io.StringIO(lines)
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line.strip():
+            yield line.split('\t')
+
+def check_headers(row):
+    """
+    Validate the header row and return the cleaned column names.
+    """
+    headers = [header.strip() for header in row]
+    missing = [header for header in TRACKLIST_HEADERS if header not in headers]
+    if missing:
+        raise ValueError(f"The tracklist header is missing: {', '.join(missing)}.\n"
+                         f"It must start with: {' / '.join(TRACKLIST_HEADERS)}")
+    return headers
 
 def create_dict(row, headers):
     """
@@ -21,26 +68,247 @@ def create_dict(row, headers):
     """
     return {header: value.strip() for header, value in zip(headers, row)}
 
-def merge_consecutive_rows(rows):
+def merge_consecutive_rows(rows, merge=None):
     """
     Merge consecutive rows with the same values for specified keys.
     """
-    merged_rows = []
-    i = 0
-    while i < len(rows):
-        current_row = rows[i].copy()
-        start = int(current_row.get('Start', 0))
-        end = int(current_row.get('End', 0))
-        # Find consecutive rows with the same values for specified keys
-        while i + 1 < len(rows) and \
-              all(rows[i + 1].get(key) == current_row.get(key) for key in ['Artists', 'Track', 'Id', 'Albums']):
-            end = int(rows[i + 1].get('End', 0))
-            i += 1
-        current_row['Start'] = str(start)
-        current_row['End'] = str(end)
-        merged_rows.append(current_row)
-        i += 1
-    return merged_rows
+    return list(iter_merged_rows(rows, merge))
+
+def iter_merged_rows(rows, merge=None):
+    """
+    Merge consecutive rows from any iterable of rows, yielding each merged row
+    as soon as the next different row is seen. merge is a MergePolicy for
+    gaps and overlaps; by default rows are merged regardless of time.
+    """
+    if merge is not None and merge.is_default:
+        merge = None
+    current_row = None
+    for row in rows:
+        if current_row is not None and all(row.get(key) == current_row.get(key) for key in MERGE_KEYS):
+            if merge is None:
+                current_row['End'] = str(int(row.get('End', 0)))
+                continue
+            if merge_row(current_row, row, merge):
+                continue
+        if current_row is not None:
+            if merge is not None:
+                trim_row(current_row, row, merge)
+            yield current_row
+        current_row = row.copy()
+        current_row['Start'] = str(int(current_row.get('Start', 0)))
+        current_row['End'] = str(int(current_row.get('End', 0)))
+    if current_row is not None:
+        yield current_row
+
+def merge_row(current_row, row, merge):
+    """
+    Merge a row of the same track into current_row if the MergePolicy
+    allows it, and return whether it did.
+    """
+    track_end = int(current_row['End'])
+    if not merge.continues(track_end, int(row.get('Start', 0))):
+        return False
+    current_row['End'] = str(merge.extended_end(track_end, int(row.get('End', 0))))
+    return True
+
+def trim_row(current_row, row, merge):
+    """
+    Cut current_row short where the MergePolicy says the next row's track
+    takes over.
+    """
+    current_row['End'] = str(merge.trimmed_end(int(current_row['Start']), int(current_row['End']),
+                                               int(row.get('Start', 0))))
+
+class InternTable:
+    """
+    Two-way mapping between strings and small integer IDs. One table can be
+    shared by a batch of shows so repeated artists and albums are stored
+    once; it keeps every string it is given, so use a new table per batch.
+    """
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def __len__(self):
+        return len(self.strings)
+
+    def intern(self, value):
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+class CompactTracklist:
+    """
+    Merged tracklist stored as integer columns. Start and End are seconds;
+    the other columns are IDs into an InternTable, a new one unless given.
+    """
+    __slots__ = ('table', 'raw_count', 'start', 'end', 'artist', 'title', 'track_id', 'album')
+
+    def __init__(self, table=None):
+        self.table = table if table is not None else InternTable()
+        self.raw_count = 0
+        self.start = array('q')
+        self.end = array('q')
+        self.artist = array('q')
+        self.title = array('q')
+        self.track_id = array('q')
+        self.album = array('q')
+
+    def __len__(self):
+        return len(self.start)
+
+    def row(self, i):
+        """
+        Return row i as a dictionary like the ones from merge_consecutive_rows.
+        """
+        strings = self.table.strings
+        return {'Start': str(self.start[i]), 'End': str(self.end[i]),
+                'Artists': strings[self.artist[i]], 'Track Title': strings[self.title[i]],
+                'Id': strings[self.track_id[i]], 'Albums': strings[self.album[i]]}
+
+    def dict_rows(self):
+        return [self.row(i) for i in range(len(self))]
+
+    @property
+    def nbytes(self):
+        """
+        Memory held by the columns, not counting the intern table.
+        """
+        return sum(column.itemsize * len(column)
+                   for column in (self.start, self.end, self.artist, self.title, self.track_id, self.album))
+
+def load_compact_tracklist(lines, table=None, catalog=None, merge=None):
+    """
+    Parse and merge a tracklist straight into a CompactTracklist. Rows are
+    merged by comparing the interned IDs of the MERGE_KEYS columns. With a
+    TrackCatalog, rows are merged by their integer Id alone and every track
+    takes its artist, title and album from the catalog, which learns the
+    Ids it has not seen from this show; a show with an Id that is not an
+    integer raises NonNumericIdError, and can be loaded again without the
+    catalog. merge is a MergePolicy for gaps and overlaps, like
+    iter_merged_rows takes.
+    """
+    if merge is not None and merge.is_default:
+        merge = None
+    if catalog is not None:
+        return _load_catalog_tracklist(lines, table, catalog, merge)
+    compact = CompactTracklist(table)
+    intern = compact.table.intern
+    split_rows = iter_split_rows(lines)
+    headers = check_headers(next(split_rows, []))
+    columns = [headers.index(header) for header in TRACKLIST_HEADERS]
+    width = max(columns) + 1
+    start_col, end_col, artist_col, title_col, id_col, album_col = columns
+    start, end, artist, title, track_id, album = (compact.start, compact.end, compact.artist,
+                                                  compact.title, compact.track_id, compact.album)
+    last = None
+    for row in split_rows:
+        compact.raw_count += 1
+        if len(row) < width:
+            raise ValueError(f"Row {compact.raw_count} has {len(row)} columns, expected {len(headers)}.")
+        key = (intern(row[artist_col].strip()), intern(row[title_col].strip()), intern(row[id_col].strip()),
+               intern(row[album_col].strip()))
+        if key == last:
+            if merge is None:
+                end[-1] = int(row[end_col])
+                continue
+            if _merge_compact_row(end, row[start_col], row[end_col], merge):
+                continue
+        elif merge is not None and end:
+            end[-1] = merge.trimmed_end(start[-1], end[-1], int(row[start_col]))
+        last = key
+        start.append(int(row[start_col]))
+        end.append(int(row[end_col]))
+        artist.append(key[0])
+        title.append(key[1])
+        track_id.append(key[2])
+        album.append(key[3])
+    return compact
+
+def _merge_compact_row(end, row_start, row_end, merge):
+    """
+    Extend the last track of an end column with a row of the same track if
+    the MergePolicy allows it, and return whether it did.
+    """
+    if not merge.continues(end[-1], int(row_start)):
+        return False
+    end[-1] = merge.extended_end(end[-1], int(row_end))
+    return True
+
+class NonNumericIdError(ValueError):
+    """
+    Raised when a show loaded with a TrackCatalog has an Id that is not an
+    integer the catalog can store, so it cannot be merged by Id.
+    """
+
+# Ids the catalog can store, as signed 64-bit integers like SQLite and array('q')
+MIN_TRACK_ID = -2 ** 63
+MAX_TRACK_ID = 2 ** 63 - 1
+
+def _load_catalog_tracklist(lines, table, catalog, merge=None):
+    compact = CompactTracklist(table)
+    split_rows = iter_split_rows(lines)
+    headers = check_headers(next(split_rows, []))
+    columns = [headers.index(header) for header in TRACKLIST_HEADERS]
+    width = max(columns) + 1
+    start_col, end_col, artist_col, title_col, id_col, album_col = columns
+    start, end = compact.start, compact.end
+    # Merged track Ids in order, then the strings each Id first had in this show
+    ids = array('q')
+    seen = {}
+    id_texts = {}
+    last = None
+    last_text = last_end = None
+    for row in split_rows:
+        compact.raw_count += 1
+        if len(row) < width:
+            raise ValueError(f"Row {compact.raw_count} has {len(row)} columns, expected {len(headers)}.")
+        # Most rows repeat the previous window's Id, so compare the text before converting it
+        if row[id_col] == last_text:
+            track = last
+        else:
+            try:
+                track = int(row[id_col])
+            except ValueError:
+                raise NonNumericIdError(f"Row {compact.raw_count} has a non-numeric Id: "
+                                        f"{row[id_col].strip()!r}.") from None
+            if not MIN_TRACK_ID <= track <= MAX_TRACK_ID:
+                raise NonNumericIdError(f"Row {compact.raw_count} has an Id too large for the catalog: "
+                                        f"{row[id_col].strip()!r}.")
+            last_text = row[id_col]
+        if track == last:
+            # Without a merge policy the end is only converted once the track is over
+            if merge is None:
+                last_end = row[end_col]
+                continue
+            if _merge_compact_row(end, row[start_col], row[end_col], merge):
+                continue
+        elif merge is not None and end:
+            end[-1] = merge.trimmed_end(start[-1], end[-1], int(row[start_col]))
+        if last_end is not None:
+            end[-1] = int(last_end)
+        last = track
+        last_end = None
+        start.append(int(row[start_col]))
+        end.append(int(row[end_col]))
+        ids.append(track)
+        if track not in seen:
+            seen[track] = (row[artist_col].strip(), row[title_col].strip(), row[album_col].strip())
+            id_texts[track] = row[id_col].strip()
+    if last_end is not None:
+        end[-1] = int(last_end)
+
+    intern = compact.table.intern
+    with stage('catalog'):
+        resolved = catalog.resolve(seen)
+    # The Id keeps the text this show spells it with, like '0012'
+    columns_by_id = {track: (intern(artist), intern(title), intern(id_texts[track]), intern(album))
+                     for track, (artist, title, album) in resolved.items()}
+    for column, position in ((compact.artist, 0), (compact.title, 1), (compact.track_id, 2), (compact.album, 3)):
+        column.extend(columns_by_id[track][position] for track in ids)
+    return compact
 
 # Define the seconds_to_time function
 def seconds_to_time(seconds):
@@ -48,22 +316,232 @@ def seconds_to_time(seconds):
     hours, minutes = divmod(minutes, 60)
     return "{:02}:{:02}:{:02}".format(hours, minutes, seconds)
 
+def time_to_seconds(text):
+    """
+    Parse a time like "01:23:45", "23:45" or "5025" into seconds.
+    """
+    parts = text.strip().split(':')
+    try:
+        if len(parts) > 3 or not all(parts):
+            raise ValueError()
+        numbers = [int(part) for part in parts]
+    except ValueError:
+        raise ValueError(f"Not a time: {text!r}. Use hh:mm:ss, mm:ss or seconds.") from None
+    if any(number < 0 for number in numbers) or any(number >= 60 for number in numbers[1:]):
+        raise ValueError(f"Not a time: {text!r}. Use hh:mm:ss, mm:ss or seconds.")
+    seconds = 0
+    for number in numbers:
+        seconds = seconds * 60 + number
+    return seconds
+
 def format_tracklist(merged_rows):
     """
     Format the tracklist for display.
     """
-    headers = merged_rows[0].keys()
-    for row_dict in merged_rows:
-        row_dict['Start'] = seconds_to_time(int(row_dict['Start']))
-        row_dict['End'] = seconds_to_time(int(row_dict['End']))
-        # Wrap the text for long cells
-        for key in ['Artists', 'Track Title', 'Albums']:
-            row_dict[key] = '\n'.join(textwrap.wrap(row_dict[key], width=20))
+    table = TracklistTable(merged_rows)
+    if table.plain:
+        return table.render()
+    return format_tracklist_tabulate(merged_rows)
 
-    table_data = [[row[key] for key in headers] for row in merged_rows]
+def format_tracklist_tabulate(merged_rows):
+    """
+    Format the tracklist for display with tabulate. TracklistTable gives the
+    same output faster; this is used for text it does not handle.
+    """
+    # Imported here so the checking core loads without tabulate
+    from tabulate import tabulate
+    headers = merged_rows[0].keys()
+    table_data = [[format_cell(key, row[key]) for key in headers] for row in merged_rows]
 
     return tabulate(table_data, headers=headers, tablefmt="fancy_grid", colalign=("left",), disable_numparse=True)
 
+def locate_tracklist_rows(merged_rows):
+    """
+    Return the text of format_tracklist and, for each merged row, the
+    (first, stop) line numbers of its lines in that text, so a view of the
+    table can jump straight to a row.
+    """
+    table = TracklistTable(merged_rows)
+    if table.plain:
+        return table.render(), table.row_spans()
+    text = format_tracklist_tabulate(merged_rows)
+    # Rows of tabulate's table are only found by their borders
+    spans = []
+    first = 3
+    for number, line in enumerate(text.split('\n')):
+        if number > first and line[:1] in ('├', '╘'):
+            spans.append((first, number))
+            first = number + 1
+    return text, spans
+
+def format_cell(key, value):
+    """
+    Format one cell of the displayed tracklist.
+    """
+    if key in ('Start', 'End'):
+        return seconds_to_time(int(value))
+    if key in WRAPPED_COLUMNS:
+        return wrap_cell(value)
+    return value
+
+@lru_cache(maxsize=65536)
+def wrap_cell(text):
+    import textwrap
+    # Wrap the text for long cells
+    return '\n'.join(textwrap.wrap(text, width=WRAP_WIDTH))
+
+def text_width(line):
+    """
+    Display width of one line of text, measured the way tabulate does.
+    """
+    if line.isascii():
+        return len(line)
+    wcswidth = load_wcswidth()
+    return len(line) if wcswidth is None else wcswidth(line)
+
+@lru_cache(maxsize=None)
+def load_wcswidth():
+    """
+    Return wcwidth.wcswidth, or None when wcwidth is not installed.
+    """
+    try:
+        from wcwidth import wcswidth
+    except ImportError:
+        return None
+    return wcswidth
+
+class TracklistTable:
+    """
+    A merged tracklist laid out like tabulate's fancy_grid, as used by
+    format_tracklist. Column widths are measured in one pass when the table
+    is built and padded cells are cached per distinct string, so any range of
+    rows can then be rendered on its own or streamed to a file in chunks.
+
+    plain is False when a cell holds control characters or escape codes;
+    those tables should go through format_tracklist_tabulate instead.
+    """
+    def __init__(self, merged_rows):
+        self.headers = list(merged_rows[0].keys()) if merged_rows else list(TRACKLIST_HEADERS)
+        self.rows = merged_rows
+        self.plain = True
+        # Cells split into lines, per row
+        self.cell_lines = []
+        columns = range(len(self.headers))
+        line_cache = [{} for _ in columns]
+        widths = [text_width(header) + 2 for header in self.headers]
+        multiline = any('\n' in header for header in self.headers)
+        for header in self.headers:
+            self.plain = self.plain and header.isprintable()
+
+        for row in merged_rows:
+            row_lines = []
+            for column, key in zip(columns, self.headers):
+                value = row[key]
+                cache = line_cache[column]
+                lines = cache.get(value)
+                if lines is None:
+                    cell = format_cell(key, value)
+                    multiline = multiline or '\n' in cell
+                    cell = cell.strip()
+                    lines = cache[value] = cell.split('\n') if cell else []
+                    for line in lines:
+                        if not line.isprintable():
+                            self.plain = False
+                        width = text_width(line)
+                        if width > widths[column]:
+                            widths[column] = width
+                row_lines.append(lines)
+            self.cell_lines.append(row_lines)
+
+        self.widths = widths
+        # tabulate drops rows whose cells are all empty in multiline tables
+        self.multiline = multiline
+        self._padded = [{} for _ in columns]
+        self._blanks = [' ' * (width + 2) for width in widths]
+        self.line_above = '╒' + '╤'.join('═' * (width + 2) for width in widths) + '╕'
+        self.line_below_header = '╞' + '╪'.join('═' * (width + 2) for width in widths) + '╡'
+        self.line_between_rows = '├' + '┼'.join('─' * (width + 2) for width in widths) + '┤'
+        self.line_below = '╘' + '╧'.join('═' * (width + 2) for width in widths) + '╛'
+        self.header_row = '│' + '│'.join(self._pad(header, column) for column, header in enumerate(self.headers)) + '│'
+
+    def __len__(self):
+        return len(self.cell_lines)
+
+    def _pad(self, line, column):
+        padded = self._padded[column].get(line)
+        if padded is None:
+            padded = self._padded[column][line] = ' ' + line + ' ' * (self.widths[column] - text_width(line) + 1)
+        return padded
+
+    def row_lines(self, i):
+        """
+        Return the text lines of row i, without the lines around it.
+        """
+        cells = self.cell_lines[i]
+        line_count = max(map(len, cells))
+        if not line_count:
+            return [] if self.multiline else ['│' + '│'.join(self._blanks) + '│']
+        lines = []
+        for line_index in range(line_count):
+            padded = [self._pad(lines[line_index], column) if line_index < len(lines) else self._blanks[column]
+                      for column, lines in enumerate(cells)]
+            lines.append('│' + '│'.join(padded) + '│')
+        return lines
+
+    def row_spans(self):
+        """
+        Return (first, stop) line numbers of each row in render().
+        """
+        spans = []
+        # Below the top border, the header and the line under it
+        line = 3
+        for i, cells in enumerate(self.cell_lines):
+            if i:
+                line += 1
+            height = max(map(len, cells)) or (0 if self.multiline else 1)
+            spans.append((line, line + height))
+            line += height
+        return spans
+
+    def iter_lines(self, start=0, stop=None):
+        """
+        Yield the lines of a complete table, header included, holding rows
+        start to stop. The column widths are those of the whole tracklist.
+        """
+        stop = len(self) if stop is None else min(stop, len(self))
+        yield self.line_above
+        yield self.header_row
+        yield self.line_below_header
+        for i in range(start, stop):
+            if i > start:
+                yield self.line_between_rows
+            yield from self.row_lines(i)
+        yield self.line_below
+
+    def render(self, start=0, stop=None):
+        """
+        Return rows start to stop as a table. render() gives the same text
+        as tabulate's fancy_grid.
+        """
+        return '\n'.join(self.iter_lines(start, stop))
+
+    def write(self, out, start=0, stop=None, chunk_lines=4096):
+        """
+        Write rows start to stop as a table to a text stream, chunk_lines
+        lines at a time. Like render(), there is no newline after the last line.
+        """
+        chunk = []
+        separator = ''
+        for line in self.iter_lines(start, stop):
+            chunk.append(line)
+            if len(chunk) >= chunk_lines:
+                # The newline between chunks is written before the next one
+                out.write(separator + '\n'.join(chunk))
+                separator = '\n'
+                chunk = []
+        if chunk:
+            out.write(separator + '\n'.join(chunk))
+
 def get_track_counts(rows):
     """
     Calculate track counts for each artist and album.
@@ -181,72 +659,466 @@ def check_all_for_repeated_tracks(consecutive_album_tracks, consecutive_artist_t
     
     return all_repeated_tracks
 
+def field_label(field):
+    return 'Album' if field == 'album' else 'Artist'
+
+def format_review_warning(analysis):
+    """
+    Format the warning the app shows about tracks counted by more than one
+    restriction, or more than once by one, or return '' if there are none.
+    analysis is a TracklistAnalysis or a CachedVerdict.
+    """
+    sections = []
+    overlapping_tracks = analysis.overlapping_tracks()
+    if overlapping_tracks:
+        section = "The following track(s) are causing more than one restriction:\n"
+        for row, title, restrictions in overlapping_tracks:
+            section += f"\n{title}:\n"
+            for rule_name, reason, field, key in restrictions:
+                section += f"\t  - {reason} ({field_label(field)}) {key}\n"
+        sections.append(section)
+    repeated_tracks = analysis.repeated_tracks()
+    if repeated_tracks:
+        section = "The following track(s) are counted more than once by one restriction:\n"
+        for field, key, tracks in repeated_tracks:
+            section += f"\n({field_label(field)}) {key}:\n"
+            for track in tracks:
+                section += f"\t  - {track}\n"
+        sections.append(section)
+    if not sections:
+        return ''
+    return "\n".join(sections) + "\nPlease review manually."
+
+class ViolationIndex:
+    """
+    Inverted index from merged tracks to the rule violations they count
+    towards. Tracks are identified by their position in the merged rows and
+    by their Id, so questions like "which tracks trigger more than one
+    restriction" are dictionary lookups instead of another pass over every
+    verdict. The index is built from the evaluated verdicts on first use.
+
+    positions maps each rule name to {key: [row position, ...]};
+    track_titles and track_ids turn a list of row positions into titles and Ids.
+    """
+    def __init__(self, rules=None, positions=None, track_titles=None, track_ids=None):
+        self.rules = rules
+        self.positions = positions or {}
+        self.track_titles = track_titles
+        self.track_ids = track_ids
+        self._by_row = None
+        self._rows_by_id = None
+        self._repeated = None
+        self._overlapping = None
+
+    def _build(self):
+        # Row position -> [(rule, key), ...]
+        by_row = {}
+        # Track Id -> [row position, ...]
+        rows_by_id = {}
+        # (field, key) -> titles counted more than once by one violation
+        repeated = {}
+        for rule in (self.rules.rules if self.rules is not None else []):
+            for key, rows in self.positions.get(rule.name, {}).items():
+                violation = (rule, key)
+                seen_ids = set()
+                for row, track_id in zip(rows, self.track_ids(rows)):
+                    violations = by_row.get(row)
+                    if violations is None:
+                        by_row[row] = [violation]
+                        rows_by_id.setdefault(track_id, []).append(row)
+                    else:
+                        violations.append(violation)
+                    if track_id not in seen_ids:
+                        seen_ids.add(track_id)
+                        continue
+                    titles = repeated.setdefault((rule.field, key), [])
+                    title = self.track_titles([row])[0]
+                    if title not in titles:
+                        titles.append(title)
+        self._by_row, self._rows_by_id, self._repeated = by_row, rows_by_id, repeated
+
+    @property
+    def by_row(self):
+        if self._by_row is None:
+            self._build()
+        return self._by_row
+
+    @property
+    def rows_by_id(self):
+        if self._rows_by_id is None:
+            self._build()
+        return self._rows_by_id
+
+    def violations(self, row):
+        """
+        Return the (rule, key) violations the track at a row position counts towards.
+        """
+        return self.by_row.get(row, [])
+
+    def violations_for_id(self, track_id):
+        """
+        Return {row position: [(rule, key), ...]} for every play of a track Id.
+        """
+        by_row = self.by_row
+        return {row: by_row[row] for row in self.rows_by_id.get(track_id, [])}
+
+    def is_overlapping(self, row):
+        return len(self.by_row.get(row, ())) > 1
+
+    def overlapping_rows(self):
+        """
+        Return the row positions of tracks counted by more than one restriction, in order.
+        """
+        if self._overlapping is None:
+            self._overlapping = sorted(row for row, violations in self.by_row.items() if len(violations) > 1)
+        return self._overlapping
+
+    def overlapping_tracks(self):
+        """
+        Return [(row position, title, [(rule name, reason, field, key), ...]), ...]
+        for the tracks counted by more than one restriction, in order.
+        """
+        rows = self.overlapping_rows()
+        titles = self.track_titles(rows) if rows else []
+        return [(row, title, [(rule.name, rule.reason, rule.field, key) for rule, key in self.by_row[row]])
+                for row, title in zip(rows, titles)]
+
+    def repeated_tracks(self):
+        """
+        Return [(field, key, titles), ...] for violations that count the same
+        track more than once, attributed to the artist or album they belong to.
+        """
+        if self._repeated is None:
+            self._build()
+        return [(field, key, titles) for (field, key), titles in self._repeated.items()]
+
+class TimeIndex:
+    """
+    Sorted interval index over the merged rows of a tracklist, for what was
+    playing at a time or within a span. Rows are kept sorted by start with
+    the running maximum of their ends, so a lookup is a bisect and a walk
+    back over the rows that can still be playing: O(log n) plus the rows
+    found when tracks do not overlap (see MergePolicy's overlap 'trim').
+    A row plays from its start up to, not including, its end.
+    """
+    def __init__(self, starts, ends):
+        order = range(len(starts))
+        if any(starts[i] > starts[i + 1] for i in range(len(starts) - 1)):
+            order = sorted(order, key=starts.__getitem__)
+        self.order = list(order)
+        self.starts = [starts[i] for i in self.order]
+        self.ends = [ends[i] for i in self.order]
+        self.max_ends = list(itertools.accumulate(self.ends, max))
+
+    def __len__(self):
+        return len(self.order)
+
+    def _walk_back(self, stop, after):
+        # Sorted positions among the first stop rows that end after the time
+        found = []
+        ends, max_ends, order = self.ends, self.max_ends, self.order
+        i = stop - 1
+        while i >= 0 and max_ends[i] > after:
+            if ends[i] > after:
+                found.append(order[i])
+            i -= 1
+        found.sort()
+        return found
+
+    def at(self, seconds):
+        """
+        Return the row positions playing at a time, in order.
+        """
+        return self._walk_back(bisect.bisect_right(self.starts, seconds), seconds)
+
+    def between(self, start, stop):
+        """
+        Return the row positions playing at any time from start up to stop, in order.
+        """
+        if stop <= start:
+            return self.at(start)
+        return self._walk_back(bisect.bisect_left(self.starts, stop), start)
+
+    def next_start(self, seconds):
+        """
+        Return the position of the first row starting at or after a time, or None.
+        """
+        i = bisect.bisect_left(self.starts, seconds)
+        return self.order[i] if i < len(self.order) else None
+
+class TracklistAnalysis:
+    """
+    Merged rows and every rule verdict for one tracklist. verdicts maps each
+    rule name in the RulePlan to its result; the four classic verdicts are
+    also available as attributes for the formatters. index is the
+    ViolationIndex of the verdicts and time_index a TimeIndex of the merged
+    rows, built on first use.
+    """
+    def __init__(self, merged_rows, merged_count, verdicts, rules=None, compact=None, index=None):
+        self._merged_rows = merged_rows
+        self.merged_count = merged_count
+        self.verdicts = verdicts
+        self.rules = rules if rules is not None else DEFAULT_RULES
+        self.compact = compact
+        self.index = index if index is not None else ViolationIndex()
+        self._time_index = None
+        for attribute, verdict in self.rules.legacy_verdicts(verdicts).items():
+            setattr(self, attribute, verdict)
+
+    @property
+    def merged_rows(self):
+        # Compact results only build the dictionary rows when a formatter needs them
+        if self._merged_rows is None and self.compact is not None:
+            self._merged_rows = self.compact.dict_rows()
+        return self._merged_rows
+
+    @property
+    def is_restricted(self):
+        return any(self.verdicts.values())
+
+    def extra_verdicts(self):
+        """
+        Return (rule, verdict) pairs for rules beyond the classic four.
+        """
+        return [(rule, self.verdicts[rule.name]) for rule in self.rules.extra_rules]
+
+    def repeated_tracks(self):
+        return self.index.repeated_tracks()
+
+    def overlapping_tracks(self):
+        return self.index.overlapping_tracks()
+
+    @property
+    def time_index(self):
+        if self._time_index is None:
+            if self.compact is not None:
+                self._time_index = TimeIndex(self.compact.start, self.compact.end)
+            else:
+                rows = self.merged_rows or []
+                self._time_index = TimeIndex([int(row['Start']) for row in rows], [int(row['End']) for row in rows])
+        return self._time_index
+
+    def rows_at(self, seconds):
+        """
+        Return the merged row positions playing at a time in seconds.
+        """
+        return self.time_index.at(seconds)
+
+    def rows_between(self, start, stop):
+        return self.time_index.between(start, stop)
+
+    def violation_rows(self, rule_name, key):
+        """
+        Return the merged row positions of the tracks behind one violation.
+        """
+        return list(self.index.positions.get(rule_name, {}).get(key, []))
+
+    def row(self, position):
+        """
+        Return a merged row as a dictionary.
+        """
+        if self.compact is not None:
+            return self.compact.row(position)
+        return self.merged_rows[position]
+
+    def reason_for_restriction(self, template=None):
+        from writers import render_reports
+        return render_reports(self, template, macro=False)[0]
+
+    def macro_info(self, template=None):
+        from writers import render_reports
+        return render_reports(self, template, reason=False)[1]
+
+def evaluate_rules(merged_rows, keep_rows=True, rules=None, normalizer=None):
+    """
+    Compute all rule verdicts in a single pass over the merged rows. With the
+    default rules this gives the same results as the individual get_*
+    functions. merged_rows can be any iterable; with keep_rows=False the rows
+    are not kept in the result. With a Normalizer, rules count canonical
+    artists and albums instead of the raw strings, and verdicts name them
+    as they are first spelled in these rows.
+    """
+    rules = rules if rules is not None else DEFAULT_RULES
+    kept_rows = [] if keep_rows else None
+    titles = []
+    track_ids = []
+    # Canonical ID -> spelling in this show
+    show_names = {}
+
+    # Rules see each track as its row position; build_analysis turns positions back into titles
+    def records(rows):
+        for position, row in enumerate(rows):
+            if keep_rows:
+                kept_rows.append(row)
+            titles.append(row['Track Title'])
+            track_ids.append(row['Id'])
+            yield row['Artists'], row['Albums'], position, row['Start'], row['End']
+
+    def normalized_records(rows):
+        artist_entries, album_entry = normalizer.artist_entries, normalizer.album_entry
+        add_name = show_names.setdefault
+        for artist, album, position, start, end in records(rows):
+            entries = artist_entries(artist)
+            for key_id, name in entries:
+                add_name(key_id, name)
+            album_id, album_name = album_entry(album)
+            add_name(album_id, album_name)
+            yield tuple(key_id for key_id, name in entries), album_id, position, start, end
+
+    if normalizer is None:
+        merged_count, verdicts = rules.evaluate(records(merged_rows))
+        key_names = None
+    else:
+        merged_count, verdicts = rules.evaluate(normalized_records(merged_rows), multi_fields=('artist',))
+        key_names = show_names
+    return build_analysis(merged_count, verdicts, rules, lambda rows: [titles[row] for row in rows],
+                          lambda rows: [track_ids[row] for row in rows], key_names, merged_rows=kept_rows)
+
+def evaluate_compact_rules(compact, rules=None, normalizer=None):
+    """
+    Compute all rule verdicts for a CompactTracklist, comparing integer IDs
+    and only turning the offending entries back into strings. With a
+    Normalizer, each distinct artist and album string in the show is mapped
+    to its canonical IDs once and rules count those; verdicts name them as
+    they are first spelled in the show.
+    """
+    rules = rules if rules is not None else DEFAULT_RULES
+    positions = range(len(compact))
+    if normalizer is None:
+        merged_count, verdicts = rules.evaluate(zip(compact.artist, compact.album, positions,
+                                                    compact.start, compact.end))
+        key_names = compact.table.strings
+    else:
+        strings = compact.table.strings
+        # Distinct strings in order of appearance, so the first spelling in the show names each ID
+        show_names = {}
+        artists = {}
+        for string_id in dict.fromkeys(compact.artist):
+            entries = normalizer.artist_entries(strings[string_id])
+            artists[string_id] = tuple(key_id for key_id, name in entries)
+            for key_id, name in entries:
+                show_names.setdefault(key_id, name)
+        albums = {}
+        for string_id in dict.fromkeys(compact.album):
+            albums[string_id], name = normalizer.album_entry(strings[string_id])
+            show_names.setdefault(albums[string_id], name)
+        merged_count, verdicts = rules.evaluate(zip(map(artists.__getitem__, compact.artist),
+                                                    map(albums.__getitem__, compact.album),
+                                                    positions, compact.start, compact.end),
+                                                multi_fields=('artist',))
+        key_names = show_names
+    return build_compact_analysis(compact, merged_count, verdicts, rules, key_names)
+
+def build_compact_analysis(compact, merged_count, verdicts, rules, key_names=None):
+    """
+    build_analysis for verdicts over a CompactTracklist. Keys are looked up
+    in key_names, the intern table's strings by default.
+    """
+    strings = compact.table.strings
+    title, track_id = compact.title, compact.track_id
+    return build_analysis(merged_count, verdicts, rules, lambda rows: [strings[title[row]] for row in rows],
+                          lambda rows: [strings[track_id[row]] for row in rows],
+                          key_names if key_names is not None else strings, compact=compact)
+
+def build_analysis(merged_count, verdicts, rules, track_titles, track_ids, key_names=None, merged_rows=None,
+                   compact=None):
+    """
+    Turn rule verdicts whose tracks are merged row positions into a
+    TracklistAnalysis with track titles and a ViolationIndex of the
+    positions. track_titles and track_ids map a list of row positions to
+    titles and Ids; verdict keys are looked up in key_names when given.
+    """
+    named_verdicts = {}
+    positions = {}
+    for name, verdict in verdicts.items():
+        named_verdict = named_verdicts[name] = {}
+        rule_positions = positions[name] = {}
+        for key, data in verdict.items():
+            if key_names is not None:
+                key = key_names[key]
+            named_verdict[key] = {'count': data['count'], 'tracks': track_titles(data['tracks'])}
+            rule_positions[key] = data['tracks']
+    index = ViolationIndex(rules, positions, track_titles, track_ids)
+    return TracklistAnalysis(merged_rows, merged_count, named_verdicts, rules, compact=compact, index=index)
+
+def analyze_tracklist(tracklist_data, rules=None, progress=None, normalizer=None, catalog=None):
+    """
+    Load, merge and check a pasted tracklist, returning a TracklistAnalysis.
+    Results are memoized on a hash of the text, the rule set, the
+    normalizer's aliases and whether a TrackCatalog is used, so repeated
+    checks of the same show only parse and analyse it once. If given,
+    progress is called with the number of lines read every
+    PROGRESS_INTERVAL lines and may raise to abort the analysis.
+    Safe to call from worker threads.
+    """
+    import hashlib
+    rules = rules if rules is not None else DEFAULT_RULES
+    key = hashlib.sha256(tracklist_data.encode('utf-8')).hexdigest() + rules.fingerprint
+    if normalizer is not None:
+        key += normalizer.fingerprint
+    if catalog is not None:
+        key += ':' + catalog.path
+    with _analysis_lock:
+        analysis = _analysis_cache.get(key)
+        if analysis is not None:
+            _analysis_cache.move_to_end(key)
+            count('analysis_memo_hits')
+            return analysis
+
+        lines = io.StringIO(tracklist_data)
+        if progress is not None:
+            lines = _report_progress(lines, progress)
+        with stage('load') as timing:
+            try:
+                compact = load_compact_tracklist(lines, catalog=catalog, merge=rules.merge)
+            except NonNumericIdError:
+                # Ids that are not integers cannot be catalogued, so this show is merged by its strings
+                count('uncatalogued_shows')
+                compact = load_compact_tracklist(io.StringIO(tracklist_data), merge=rules.merge)
+            timing.produced(compact.nbytes)
+        count('raw_rows', compact.raw_count)
+        count('merged_rows', len(compact))
+        with stage('rules'):
+            analysis = evaluate_compact_rules(compact, rules, normalizer)
+
+        _analysis_cache[key] = analysis
+        if len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+            _analysis_cache.popitem(last=False)
+    return analysis
+
+def _report_progress(lines, progress):
+    for count, line in enumerate(lines, 1):
+        if count % PROGRESS_INTERVAL == 0:
+            progress(count)
+        yield line
+
 def format_reason_for_restriction(exceeding_artists, exceeding_albums, consecutive_artist_tracks, consecutive_album_tracks):
     """
     Format the reasons for restriction for display.
     """
-    result_text = ""
-    if exceeding_artists:
-        result_text += "Max Tracks By Artist:\n"
-        for artist, data in exceeding_artists.items():
-            result_text += f"{artist}: {data['count']} tracks\n"
-            for track in data['tracks']:
-                result_text += f"\t- {track}\n"
-        result_text += f"\n"
-
-    if consecutive_artist_tracks:
-        result_text += "Max Consecutive Tracks By Artist:\n"
-        for artist, data in consecutive_artist_tracks.items():
-            result_text += f"{artist}: {data['count']} tracks\n"
-            for track in data['tracks']:
-                result_text += f"\t- {track}\n"
-        result_text += f"\n"
-
-    if exceeding_albums:
-        result_text += "Max Tracks From Album:\n"
-        for album, data in exceeding_albums.items():
-            result_text += f"{album}: {data['count']} tracks\n"
-            for track in data['tracks']:
-                result_text += f"\t- {track}\n"
-        result_text += f"\n"
-
-    if consecutive_album_tracks:
-        result_text += "Max Consecutive Tracks From Album:\n"
-        for album, data in consecutive_album_tracks.items():
-            result_text += f"{album}: {data['count']} tracks\n"
-            for track in data['tracks']:
-                result_text += f"\t- {track}\n"
-        result_text += f"\n"
-
-    return result_text
+    from writers import render_reported
+    return render_reported(classic_reported(exceeding_artists, exceeding_albums, consecutive_artist_tracks,
+                                            consecutive_album_tracks), 'reason')
 
 def format_macro_info(exceeding_artists, consecutive_artist_tracks, exceeding_albums, consecutive_album_tracks):
     """
     Format macro info for display.
     """
-    macro_info = f"Our audio fingerprinter has detected that this show contains:\n\n"
-    if exceeding_artists:
-        for artist, data in exceeding_artists.items():
-            macro_info += f"\t\t- {data['count']} tracks by {artist}:\n"
-            for track in data['tracks']:
-                macro_info += f"\t\t\t\t- {track}\n"
-        macro_info += f"\t\tThis exceeds the limit set for the number of total tracks by one recording artist.\n\n"
-    if consecutive_artist_tracks:
-        for artist, data in consecutive_artist_tracks.items():
-            macro_info += f"\t\t - {data['count']} consecutive tracks by {artist}:\n"
-            for track in data['tracks']:
-                macro_info += f"\t\t\t\t- {track}\n"
-        macro_info += f"\t\tThis exceeds the limit set for the number of consecutive tracks by one recording artist.\n\n"
-    if exceeding_albums:
-        for album, data in exceeding_albums.items():
-            macro_info += f"\t\t- {data['count']} tracks from the album \"{album}\":\n"
-            for track in data['tracks']:
-                macro_info += f"\t\t\t\t- {track}\n"
-        macro_info += f"\t\tThis exceeds the limit set for the number of total tracks from the same album.\n\n"
-    if consecutive_album_tracks:
-        for album, data in consecutive_album_tracks.items():
-            macro_info += f"\t\t- {data['count']} consecutive tracks from the album \"{album}\":\n"
-            for track in data['tracks']:
-                macro_info += f"\t\t\t\t- {track}\n"
-        macro_info += f"\t\tThis exceeds the limit set for the number of consecutive tracks from the same album.\n\n"
-    return macro_info
+    from writers import render_reported
+    return render_reported(classic_reported(exceeding_artists, exceeding_albums, consecutive_artist_tracks,
+                                            consecutive_album_tracks), 'macro')
+
+def classic_reported(exceeding_artists, exceeding_albums, consecutive_artist_tracks, consecutive_album_tracks):
+    """
+    Pair the four classic verdicts with the default rules, in report order.
+    """
+    from writers import report_verdicts
+    verdicts = dict(zip([DEFAULT_RULES.legacy_names[attribute] for attribute in ('exceeding_artists',
+                         'exceeding_albums', 'consecutive_artist_tracks', 'consecutive_album_tracks')],
+                        (exceeding_artists, exceeding_albums, consecutive_artist_tracks, consecutive_album_tracks)))
+    return report_verdicts(DEFAULT_RULES, verdicts)
+
+if __name__ == "__main__":
+    import sys
+    from cli import main
+    sys.exit(main())
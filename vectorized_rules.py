@@ -0,0 +1,120 @@
+from importlib.util import find_spec
+from rules import DEFAULT_RULES
+from tracklist_combiner import build_compact_analysis, evaluate_compact_rules
+
+# NumPy is only imported once a batch is evaluated with it, keeping worker startup fast
+HAVE_NUMPY = find_spec('numpy') is not None
+
+# Rule types the NumPy backend can evaluate
+VECTORIZED_RULE_TYPES = ('total', 'consecutive')
+
+def evaluate_batch(compacts, backend='auto', rules=None, normalizer=None):
+    """
+    Evaluate the rules for a list of CompactTracklists, returning one
+    TracklistAnalysis per show in the same order. backend is 'auto',
+    'numpy' or 'python'; 'auto' uses NumPy when it is installed and every
+    rule is a total or consecutive rule. Both backends give the same verdicts.
+    Normalized names (a Normalizer) are only supported by the Python backend.
+    """
+    rules = rules if rules is not None else DEFAULT_RULES
+    vectorizable = all(rule.type in VECTORIZED_RULE_TYPES for rule in rules.rules)
+    if backend == 'numpy' and not HAVE_NUMPY:
+        raise ValueError("The numpy backend needs NumPy to be installed.")
+    if backend == 'numpy' and not vectorizable:
+        raise ValueError(f"The numpy backend only supports {' and '.join(VECTORIZED_RULE_TYPES)} rules.")
+    if backend == 'numpy' and normalizer is not None:
+        raise ValueError("The numpy backend cannot count normalized artist credits.")
+    if backend == 'python' or not HAVE_NUMPY or not vectorizable or normalizer is not None:
+        return [evaluate_compact_rules(compact, rules, normalizer) for compact in compacts]
+    return evaluate_batch_numpy(compacts, rules)
+
+def pack_shows(compacts):
+    """
+    Concatenate the artist, album and title columns of several shows and
+    return them with the row offsets where each show starts (plus the end).
+    """
+    import numpy as np
+    lengths = np.array([len(compact) for compact in compacts], dtype=np.int64)
+    offsets = np.zeros(len(compacts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    def column(name):
+        parts = [np.frombuffer(getattr(compact, name), dtype=np.int64) for compact in compacts if len(compact)]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    return column('artist'), column('album'), column('title'), offsets
+
+def evaluate_batch_numpy(compacts, rules):
+    import numpy as np
+    artists, albums, _, offsets = pack_shows(compacts)
+    show_ids = np.repeat(np.arange(len(compacts), dtype=np.int64), np.diff(offsets))
+    # Verdicts list each track by its row position within its show, like the Python rules
+    positions = np.arange(len(show_ids), dtype=np.int64) - offsets[show_ids]
+    columns = {'artist': artists, 'album': albums}
+
+    rule_verdicts = {}
+    for rule in rules.rules:
+        if rule.type == 'total':
+            rule_verdicts[rule.name] = _exceeding(columns[rule.field], positions, show_ids, len(compacts),
+                                                  rule.max_tracks + 1)
+        else:
+            rule_verdicts[rule.name] = _consecutive(columns[rule.field], positions, offsets, rule.max_tracks)
+
+    results = []
+    for show, compact in enumerate(compacts):
+        verdicts = {name: _with_counts(verdict[show]) for name, verdict in rule_verdicts.items()}
+        results.append(build_compact_analysis(compact, len(compact), verdicts, rules))
+    return results
+
+def _exceeding(codes, tracks, show_ids, show_count, limit):
+    """
+    Total-count rule: every (show, code) with at least limit rows, in order
+    of first appearance within its show. Returns one {code: tracks} per show.
+    """
+    import numpy as np
+    results = [{} for _ in range(show_count)]
+    if not len(codes):
+        return results
+    keys = show_ids * (int(codes.max()) + 1) + codes
+    unique_keys, first_index, inverse, counts = np.unique(keys, return_index=True, return_inverse=True,
+                                                          return_counts=True)
+    offending = np.nonzero(counts >= limit)[0]
+    if not len(offending):
+        return results
+    # Rows of the offending keys grouped by key, keeping row order within each key
+    rows = np.nonzero(np.isin(inverse, offending))[0]
+    rows = rows[np.argsort(inverse[rows], kind='stable')]
+    row_groups = np.split(rows, np.cumsum(counts[offending])[:-1])
+    for key_index in np.argsort(first_index[offending], kind='stable'):
+        group = row_groups[key_index]
+        first_row = group[0]
+        results[show_ids[first_row]][int(codes[first_row])] = tracks[group].tolist()
+    return results
+
+def _consecutive(codes, tracks, offsets, limit):
+    """
+    Consecutive rule: runs of equal codes longer than limit, found by
+    run-length encoding that also breaks runs at show boundaries. A later run
+    with the same code replaces an earlier one, as in the pure-Python rules.
+    """
+    import numpy as np
+    results = [{} for _ in range(len(offsets) - 1)]
+    if not len(codes):
+        return results
+    changes = np.empty(len(codes), dtype=bool)
+    changes[0] = True
+    np.not_equal(codes[1:], codes[:-1], out=changes[1:])
+    changes[offsets[1:-1][offsets[1:-1] < len(codes)]] = True
+    run_starts = np.nonzero(changes)[0]
+    run_lengths = np.diff(np.append(run_starts, len(codes)))
+    offending = np.nonzero(run_lengths > limit)[0]
+    if not len(offending):
+        return results
+    shows = np.searchsorted(offsets, run_starts[offending], side='right') - 1
+    for show, run_start, run_length in zip(shows.tolist(), run_starts[offending].tolist(),
+                                           run_lengths[offending].tolist()):
+        results[show][int(codes[run_start])] = tracks[run_start:run_start + run_length].tolist()
+    return results
+
+def _with_counts(verdict):
+    return {code: {'count': len(tracks), 'tracks': tracks} for code, tracks in verdict.items()}
@@ -0,0 +1,361 @@
+"""
+Persistent verdict cache shared by the GUI and batch workers, so re-uploaded
+or re-checked shows skip the pipeline.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from instrumentation import count, stage
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'tracklist_checker', 'verdicts.sqlite3')
+# Limits enforced by VerdictCache.evict()
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_MAX_AGE_DAYS = 30
+# Stores between automatic evictions
+EVICT_INTERVAL = 200
+# Bump when the stored verdict or rendered text changes shape
+CACHE_FORMAT = 2
+# Rendered outputs the cache keeps next to each verdict
+VIEWS = ('tracklist', 'reason', 'macro')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    verdict TEXT NOT NULL,
+    tracklist TEXT,
+    reason TEXT,
+    macro TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS text_keys (
+    text_key TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    raw_count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS text_keys_key ON text_keys (key);
+"""
+
+def analysis_to_verdict(analysis):
+    """
+    Convert a TracklistAnalysis into a JSON-serializable verdict.
+    """
+    verdict = {
+        'restricted': analysis.is_restricted,
+        'merged_rows': analysis.merged_count,
+        'exceeding_artists': analysis.exceeding_artists,
+        'exceeding_albums': analysis.exceeding_albums,
+        'consecutive_artist_tracks': analysis.consecutive_artist_tracks,
+        'consecutive_album_tracks': analysis.consecutive_album_tracks,
+    }
+    for rule, rule_verdict in analysis.extra_verdicts():
+        verdict[rule.name] = rule_verdict
+    if analysis.rules.version is not None:
+        verdict['rules_version'] = analysis.rules.version
+    return verdict
+
+def render_view(analysis, view):
+    """
+    Return the text the formatters give for one view of an analysis.
+    """
+    if view not in VIEWS:
+        raise ValueError(f"Unknown view: {view}")
+    with stage(f"render_{view}") as timing:
+        if view == 'tracklist':
+            from tracklist_combiner import format_tracklist
+            text = format_tracklist(analysis.merged_rows)
+        elif view == 'reason':
+            text = analysis.reason_for_restriction()
+        else:
+            text = analysis.macro_info()
+        timing.produced(len(text))
+    return text
+
+def settings_fingerprint(rules, normalizer=None, catalog=None):
+    return (f"{CACHE_FORMAT}:{rules.fingerprint}:{normalizer.fingerprint if normalizer is not None else 'raw'}:"
+            f"{'catalog' if catalog is not None else 'strings'}")
+
+def text_key(tracklist_data, rules, normalizer=None, catalog=None):
+    """
+    Key of a tracklist exactly as pasted or exported.
+    """
+    digest = text_digest(rules, normalizer, catalog)
+    digest.update(tracklist_data.encode('utf-8'))
+    return digest.hexdigest()
+
+def text_digest(rules, normalizer=None, catalog=None):
+    """
+    Return the hash text_key() feeds the text to, for text that is hashed
+    piece by piece as it is read.
+    """
+    import hashlib
+    return hashlib.sha256(settings_fingerprint(rules, normalizer, catalog).encode('utf-8'))
+
+def content_key(compact, rules, normalizer=None, catalog=None):
+    """
+    Key of a merged CompactTracklist. Shows that merge to the same tracks
+    share a key even if their fingerprint windows, whitespace or line endings
+    differ.
+    """
+    import hashlib
+    digest = hashlib.sha256(settings_fingerprint(rules, normalizer, catalog).encode('utf-8'))
+    strings = compact.table.strings
+    for start, end, artist, title, track_id, album in zip(compact.start, compact.end, compact.artist,
+                                                          compact.title, compact.track_id, compact.album):
+        digest.update(f"{start}\t{end}\t{strings[artist]}\t{strings[title]}\t{strings[track_id]}\t"
+                      f"{strings[album]}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+class CachedVerdict:
+    """
+    A verdict read back from the cache, with the parts of TracklistAnalysis
+    the GUI and the CLI use.
+    """
+    def __init__(self, record):
+        self.verdict = record['verdict']
+        self._repeated_tracks = [tuple(entry) for entry in record['repeated_tracks']]
+        self._overlapping_tracks = [(row, title, [tuple(restriction) for restriction in restrictions])
+                                    for row, title, restrictions in record['overlapping_tracks']]
+
+    @property
+    def is_restricted(self):
+        return self.verdict['restricted']
+
+    @property
+    def merged_count(self):
+        return self.verdict['merged_rows']
+
+    def repeated_tracks(self):
+        return self._repeated_tracks
+
+    def overlapping_tracks(self):
+        return self._overlapping_tracks
+
+class VerdictCache:
+    """
+    Content-addressed store of verdicts and rendered outputs in SQLite.
+    Entries are keyed on content_key(); text_keys remember which exact
+    texts led to an entry so identical re-checks skip parsing too.
+
+    Several processes can share one file: the database runs in WAL mode with
+    a busy timeout, every write is its own transaction, and each process
+    (and each fork of it) opens its own connection. Entries older than
+    max_age_days or beyond max_bytes, least recently used first, are
+    removed by evict(), which also runs every EVICT_INTERVAL stores and
+    when get_verdict_cache() first opens the file.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=CACHE_MAX_BYTES, max_age_days=CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._connection = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Connections must not cross a fork, so worker processes reconnect
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+    def lookup_text(self, text_key):
+        """
+        Return (key, raw_count) for a text seen before, or None.
+        """
+        with self._lock:
+            row = self._connect().execute("SELECT key, raw_count FROM text_keys WHERE text_key = ?",
+                                          (text_key,)).fetchone()
+        return row
+
+    def get(self, key, view=None):
+        """
+        Return {'verdict': ..., 'repeated_tracks': [...], view: text} for a key,
+        or None. With a view, an entry without that rendered text counts as a
+        miss but is still returned with the text set to None.
+        """
+        columns = f", {view}" if view is not None else ""
+        if view is not None and view not in VIEWS:
+            raise ValueError(f"Unknown view: {view}")
+        with self._lock:
+            connection = self._connect()
+            row = connection.execute(f"SELECT verdict{columns} FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or (view is not None and row[1] is None):
+                self.misses += 1
+            else:
+                self.hits += 1
+            if row is not None:
+                connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        if view is not None:
+            record[view] = row[1]
+        return record
+
+    def put(self, key, record, texts=None, text_key=None, raw_count=0):
+        """
+        Store a verdict record and any rendered texts ({view: text}) under
+        key, and link text_key to it.
+        """
+        texts = texts or {}
+        verdict = json.dumps(record, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                existing = connection.execute(f"SELECT created, {', '.join(VIEWS)} FROM entries WHERE key = ?",
+                                              (key,)).fetchone()
+                created = now
+                if existing is not None:
+                    # Keep the views rendered earlier, possibly by another process
+                    created = existing[0]
+                    texts = {**{view: text for view, text in zip(VIEWS, existing[1:]) if text is not None}, **texts}
+                size = len(verdict) + sum(len(text) for text in texts.values())
+                connection.execute(
+                    f"INSERT OR REPLACE INTO entries (key, verdict, {', '.join(VIEWS)}, size, created, accessed) "
+                    f"VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, verdict, *(texts.get(view) for view in VIEWS), size, created, now))
+                if text_key is not None:
+                    connection.execute("INSERT OR REPLACE INTO text_keys (text_key, key, raw_count) VALUES (?, ?, ?)",
+                                       (text_key, key, raw_count))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            self.stores += 1
+            evict = self.stores % EVICT_INTERVAL == 0
+        if evict:
+            self.evict()
+
+    def link(self, text_key, key, raw_count):
+        """
+        Remember that a text merges to an already cached entry.
+        """
+        with self._lock:
+            self._connect().execute("INSERT OR REPLACE INTO text_keys (text_key, key, raw_count) VALUES (?, ?, ?)",
+                                    (text_key, key, raw_count))
+
+    def evict(self):
+        """
+        Remove entries past max_age_days, then the least recently used ones
+        until the cache fits in max_bytes. Returns the number removed.
+        """
+        cutoff = time.time() - self.max_age_days * 86400
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                removed = connection.execute("DELETE FROM entries WHERE accessed < ?", (cutoff,)).rowcount
+                total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+                if total > self.max_bytes:
+                    stale = []
+                    for key, size in connection.execute("SELECT key, size FROM entries ORDER BY accessed"):
+                        if total <= self.max_bytes:
+                            break
+                        stale.append((key,))
+                        total -= size
+                    connection.executemany("DELETE FROM entries WHERE key = ?", stale)
+                    removed += len(stale)
+                if removed:
+                    connection.execute("DELETE FROM text_keys WHERE key NOT IN (SELECT key FROM entries)")
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            self.evictions += removed
+        return removed
+
+    def stats(self):
+        """
+        Return this process's hit/miss counters and the size of the cache.
+        """
+        with self._lock:
+            entries, size = self._connect().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'stores': self.stores, 'evictions': self.evictions, 'entries': entries, 'bytes': size}
+
+def analysis_record(analysis):
+    """
+    The verdict record the cache stores for a TracklistAnalysis.
+    """
+    return {'verdict': analysis_to_verdict(analysis),
+            'repeated_tracks': [list(entry) for entry in analysis.repeated_tracks()],
+            'overlapping_tracks': [[row, title, [list(restriction) for restriction in restrictions]]
+                                   for row, title, restrictions in analysis.overlapping_tracks()]}
+
+def check_tracklist(tracklist_data, view, rules=None, normalizer=None, cache=None, progress=None, catalog=None):
+    """
+    Return (text, result) for one view of a pasted tracklist, where result is
+    a TracklistAnalysis or a CachedVerdict. The cache is tried by the exact
+    text first, then by the merged content, before anything is evaluated.
+    """
+    from tracklist_combiner import DEFAULT_RULES, analyze_tracklist
+    rules = rules if rules is not None else DEFAULT_RULES
+    if cache is None:
+        analysis = analyze_tracklist(tracklist_data, rules, progress, normalizer, catalog)
+        return render_view(analysis, view), analysis
+
+    with stage('cache_lookup'):
+        exact_key = text_key(tracklist_data, rules, normalizer, catalog)
+        linked = cache.lookup_text(exact_key)
+        record = cache.get(linked[0], view) if linked is not None else None
+    if record is not None and record[view] is not None:
+        count('cache_hits')
+        return record[view], CachedVerdict(record)
+
+    # Parsing is needed for the content key anyway and evaluating is cheap next to it
+    analysis = analyze_tracklist(tracklist_data, rules, progress, normalizer, catalog)
+    compact = analysis.compact
+    with stage('cache_lookup'):
+        key = content_key(compact, rules, normalizer, catalog)
+        record = cache.get(key, view) if linked is None else None
+    if record is not None and record[view] is not None:
+        count('cache_hits')
+        cache.link(exact_key, key, compact.raw_count)
+        return record[view], CachedVerdict(record)
+    count('cache_misses')
+    text = render_view(analysis, view)
+    with stage('cache_store'):
+        cache.put(key, analysis_record(analysis), {view: text}, exact_key, compact.raw_count)
+    return text, analysis
+
+_shared_caches = {}
+_shared_caches_lock = threading.Lock()
+
+def get_verdict_cache(path=DEFAULT_CACHE_PATH):
+    """
+    Return the VerdictCache this process uses for a file. Opening it evicts
+    stale entries, so processes that store little, like the app, still keep
+    the cache within its limits.
+    """
+    with _shared_caches_lock:
+        cache = _shared_caches.get(path)
+        if cache is None:
+            cache = _shared_caches[path] = VerdictCache(path)
+            cache.evict()
+    return cache
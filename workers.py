@@ -0,0 +1,165 @@
+import threading
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+class AnalysisCancelled(Exception):
+    pass
+
+class JobSignals(QObject):
+    # job id, lines read, total lines
+    progress = Signal(int, int, int)
+    # job id, view, rendered text, TracklistAnalysis
+    finished = Signal(int, str, str, object)
+    # job id, error message
+    failed = Signal(int, str)
+    # job id, tracklist text (empty to keep the current view), [(first line, stop line), ...], description
+    jumped = Signal(int, str, object, str)
+
+class AnalysisJob(QRunnable):
+    """
+    Analyse a tracklist and render one view of it on a QThreadPool thread.
+    cancel() makes the job stop at its next checkpoint without emitting a
+    result; the widget also ignores results from jobs it no longer wants.
+    """
+    def __init__(self, job_id, view, tracklist_data, rules=None, normalize=False):
+        super().__init__()
+        self.job_id = job_id
+        self.view = view
+        self.tracklist_data = tracklist_data
+        self.rules = rules
+        # Count name variants together, with the user's alias table if there is one
+        self.normalize = normalize
+        self.total_lines = tracklist_data.count('\n') + 1
+        self.signals = JobSignals()
+        # Stage timings of the check, for the status bar
+        self.profile = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def checkpoint(self, lines_read=None):
+        if self._cancelled.is_set():
+            raise AnalysisCancelled()
+        if lines_read is not None:
+            self.signals.progress.emit(self.job_id, lines_read, self.total_lines)
+
+    def run(self):
+        # The checking core is imported on first use so the window can show first
+        import sqlite3
+        from catalog import get_catalog
+        from instrumentation import recording
+        from verdict_cache import check_tracklist, get_verdict_cache
+        try:
+            self.checkpoint()
+            normalizer = load_normalizer(self.normalize)
+            try:
+                with recording() as self.profile:
+                    text, analysis = check_tracklist(self.tracklist_data, self.view, self.rules, normalizer,
+                                                     get_verdict_cache(), progress=self.checkpoint,
+                                                     catalog=get_catalog())
+            except (OSError, sqlite3.Error):
+                # An unusable cache or catalog file must not stop the check
+                with recording() as self.profile:
+                    text, analysis = check_tracklist(self.tracklist_data, self.view, self.rules, normalizer,
+                                                     progress=self.checkpoint)
+            self.checkpoint(self.total_lines)
+            text = self.with_placeholder(text)
+            self.checkpoint()
+            self.signals.finished.emit(self.job_id, self.view, text, analysis)
+        except AnalysisCancelled:
+            pass
+        except Exception as e:
+            if not self.is_cancelled():
+                self.signals.failed.emit(self.job_id, str(e))
+
+    def with_placeholder(self, text):
+        from writers import DEFAULT_TEMPLATE
+        if self.view == 'reason':
+            return text or DEFAULT_TEMPLATE.no_restrictions
+        if self.view == 'macro':
+            return text or DEFAULT_TEMPLATE.not_restricted
+        return text
+
+class JumpJob(AnalysisJob):
+    """
+    Find merged rows by time, or the rows behind the restriction on a line
+    of the reason or macro view, and render the tracklist with the lines of
+    those rows. target is ('time', "hh:mm:ss") or (view, line number).
+    """
+    def __init__(self, job_id, target, tracklist_data, rules=None, normalize=False):
+        super().__init__(job_id, 'tracklist', tracklist_data, rules, normalize)
+        self.target = target
+
+    def run(self):
+        import sqlite3
+        from catalog import get_catalog
+        from tracklist_combiner import analyze_tracklist, locate_tracklist_rows
+        try:
+            self.checkpoint()
+            normalizer = load_normalizer(self.normalize)
+            try:
+                analysis = analyze_tracklist(self.tracklist_data, self.rules, self.checkpoint, normalizer,
+                                             get_catalog())
+            except (OSError, sqlite3.Error):
+                analysis = analyze_tracklist(self.tracklist_data, self.rules, self.checkpoint, normalizer)
+            self.checkpoint(self.total_lines)
+            rows, description = self.find_rows(analysis)
+            if not rows:
+                self.signals.jumped.emit(self.job_id, '', [], description)
+                return
+            text, spans = locate_tracklist_rows(analysis.merged_rows)
+            self.checkpoint()
+            self.signals.jumped.emit(self.job_id, text, [spans[row] for row in rows], description)
+        except AnalysisCancelled:
+            pass
+        except Exception as e:
+            if not self.is_cancelled():
+                self.signals.failed.emit(self.job_id, str(e))
+
+    def find_rows(self, analysis):
+        """
+        Return the row positions of the target and a line for the status bar.
+        """
+        from tracklist_combiner import seconds_to_time, time_to_seconds
+        kind, value = self.target
+        if kind == 'time':
+            seconds = time_to_seconds(value)
+            rows = analysis.rows_at(seconds)
+            if rows:
+                return rows, f"Playing at {seconds_to_time(seconds)}: " + ", ".join(
+                    f"{analysis.row(row)['Artists']} – {analysis.row(row)['Track Title']}" for row in rows)
+            following = analysis.time_index.next_start(seconds)
+            if following is None:
+                return [], f"Nothing was playing at {seconds_to_time(seconds)}."
+            return [following], (f"Nothing was playing at {seconds_to_time(seconds)}; the next track starts at "
+                                 f"{seconds_to_time(int(analysis.row(following)['Start']))}.")
+        from writers import outline_reports, violation_at
+        found = violation_at(outline_reports(analysis)[kind], value)
+        if found is None:
+            return [], "Double-click the tracks of a restriction to find them in the tracklist."
+        rule_name, key = found
+        rule = next(rule for rule in analysis.rules.rules if rule.name == rule_name)
+        rows = analysis.violation_rows(rule_name, key)
+        return rows, f"{rule.reason}: {key} · {len(rows)} tracks highlighted"
+
+def load_normalizer(normalize):
+    """
+    Return the Normalizer for the user's alias table, reloaded when the file
+    changes, or None to count raw names.
+    """
+    if not normalize:
+        return None
+    from normalize import DEFAULT_ALIASES_PATH, current_normalizer
+    return current_normalizer(DEFAULT_ALIASES_PATH)
+
+class PreloadJob(QRunnable):
+    """
+    Import the checking core in the background once the window is up.
+    """
+    def run(self):
+        import tracklist_combiner
+        import verdict_cache
+        import catalog
@@ -0,0 +1,321 @@
+"""
+Streaming report writers. One walk over the verdicts of a check writes the
+reason for restriction, the macro info and CSV rows to any text sinks
+(io.StringIO, files, sockets wrapped with makefile()), using a template
+that can be swapped per territory or language.
+"""
+import bisect
+import os
+
+# Rules whose verdicts come first in reports, in this order, like the app has always shown them
+REPORT_ORDER = ('exceeding_artists', 'consecutive_artist_tracks', 'exceeding_albums', 'consecutive_album_tracks')
+# Columns of the CSV report, one row per track behind a restriction
+CSV_COLUMNS = ['rule', 'type', 'field', 'key', 'count', 'track']
+
+# The wording the app has always used. Format fields: {reason}, {macro},
+# {key}, {count}, {track}, {consecutive}, {within} and {minutes}.
+DEFAULT_TEMPLATE_SPEC = {
+    'name': 'en',
+    'reason_heading': "{reason}:\n",
+    'reason_entry': "{key}: {count} tracks\n",
+    'reason_track': "\t- {track}\n",
+    'reason_end': "\n",
+    'macro_intro': "Our audio fingerprinter has detected that this show contains:\n\n",
+    'macro_entries': {
+        'artist': "\t\t- {count} {consecutive}tracks by {key}{within}:\n",
+        'album': "\t\t- {count} {consecutive}tracks from the album \"{key}\"{within}:\n",
+    },
+    # Lines of the classic four rules that differ from macro_entries; this one has always had an extra space
+    'classic_macro_entries': {
+        'consecutive artist': "\t\t - {count} consecutive tracks by {key}:\n",
+    },
+    'consecutive': "consecutive ",
+    'within': " within {minutes:g} minutes",
+    'macro_track': "\t\t\t\t- {track}\n",
+    'macro_end': "\t\t{macro}\n\n",
+    # Wording of rules whose spec does not set its own reason or macro, by "type field"
+    'reasons': {
+        'total artist': "Max Tracks By Artist",
+        'consecutive artist': "Max Consecutive Tracks By Artist",
+        'window artist': "Max Tracks By Artist Within {minutes:g} Minutes",
+        'total album': "Max Tracks From Album",
+        'consecutive album': "Max Consecutive Tracks From Album",
+        'window album': "Max Tracks From Album Within {minutes:g} Minutes",
+    },
+    'macros': {
+        'total artist': "This exceeds the limit set for the number of total tracks by one recording artist.",
+        'consecutive artist': "This exceeds the limit set for the number of consecutive tracks by one recording "
+                              "artist.",
+        'window artist': "This exceeds the limit set for the number of tracks by one recording artist within "
+                         "{minutes:g} minutes.",
+        'total album': "This exceeds the limit set for the number of total tracks from the same album.",
+        'consecutive album': "This exceeds the limit set for the number of consecutive tracks from the same album.",
+        'window album': "This exceeds the limit set for the number of tracks from the same album within "
+                        "{minutes:g} minutes.",
+    },
+    # Shown by the app instead of an empty output
+    'no_restrictions': "No restrictions found.",
+    'not_restricted': "The show is not being restricted.",
+}
+
+SAMPLE_FIELDS = {'reason': '', 'macro': '', 'key': '', 'count': 0, 'track': '', 'consecutive': '', 'within': '',
+                 'minutes': 1}
+
+class ReportTemplate:
+    """
+    The wording of reports. Templates are specs like DEFAULT_TEMPLATE_SPEC;
+    a spec only needs the entries it changes.
+    """
+    def __init__(self, spec):
+        self.spec = merge_spec(DEFAULT_TEMPLATE_SPEC, spec)
+        self.name = self.spec['name']
+        for name, value in self.spec.items():
+            for text in (value.values() if isinstance(value, dict) else [value]):
+                if not isinstance(text, str):
+                    raise ValueError(f"Template entry {name!r} must be text.")
+                try:
+                    text.format(**SAMPLE_FIELDS)
+                except (KeyError, IndexError, ValueError) as e:
+                    raise ValueError(f"Template entry {name!r} is invalid: {text!r} ({e})") from None
+        for name, value in self.spec.items():
+            if isinstance(value, str):
+                setattr(self, name, value)
+        # Track lines are the hot path, so they are split around {track} once
+        self.reason_track_parts = split_track(self.reason_track)
+        self.macro_track_parts = split_track(self.macro_track)
+
+    def reason(self, rule):
+        if rule.reason != rule.default_reason():
+            return rule.reason
+        return self.spec['reasons'][f"{rule.type} {rule.field}"].format(minutes=rule.window_minutes)
+
+    def macro(self, rule):
+        if rule.macro != rule.default_macro():
+            return rule.macro
+        return self.spec['macros'][f"{rule.type} {rule.field}"].format(minutes=rule.window_minutes)
+
+    def macro_entry(self, rule, classic):
+        """
+        Return the format string of a rule's macro entries and its
+        consecutive and within fields.
+        """
+        entry = self.spec['classic_macro_entries'].get(f"{rule.type} {rule.field}") if classic else None
+        if entry is None:
+            entry = self.spec['macro_entries'][rule.field]
+        return entry, {'consecutive': self.consecutive if rule.type == 'consecutive' else "",
+                       'within': self.within.format(minutes=rule.window_minutes) if rule.type == 'window' else ""}
+
+def merge_spec(base, spec):
+    merged = dict(base)
+    for name, value in spec.items():
+        if name not in base:
+            raise ValueError(f"Unknown template entry {name!r}.")
+        merged[name] = dict(base[name], **value) if isinstance(base[name], dict) and isinstance(value, dict) \
+            else value
+    return merged
+
+def split_track(text):
+    """
+    Return (before, after) for a line whose only field is {track}, else None.
+    """
+    before, found, after = text.partition('{track}')
+    if found and '{' not in before + after and '}' not in before + after:
+        return before, after
+    return None
+
+def load_template(path):
+    """
+    Load a ReportTemplate from a .toml or .json file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ValueError("Reading TOML templates needs Python 3.11 or the tomli package.") from None
+        with open(path, 'rb') as f:
+            spec = tomllib.load(f)
+    else:
+        import json
+        with open(path, encoding='utf-8') as f:
+            spec = json.load(f)
+    if not isinstance(spec, dict):
+        raise ValueError(f"{path} must contain a table of template entries.")
+    return ReportTemplate(spec)
+
+DEFAULT_TEMPLATE = ReportTemplate({})
+
+def report_verdicts(rules, verdicts):
+    """
+    Return (rule, verdict, classic) in report order for verdicts keyed by
+    rule name, like TracklistAnalysis.verdicts.
+    """
+    classic_names = [rules.legacy_names[attribute] for attribute in REPORT_ORDER if rules.legacy_names[attribute]]
+    by_name = {rule.name: rule for rule in rules.rules}
+    reported = [(by_name[name], verdicts.get(name, {}), True) for name in classic_names]
+    reported.extend((rule, verdicts.get(rule.name, {}), False) for rule in rules.extra_rules)
+    return reported
+
+def stored_verdicts(rules, verdict):
+    """
+    Return verdicts keyed by rule name from a stored verdict (see
+    analysis_to_verdict), where the classic four are keyed by their
+    attribute names.
+    """
+    verdicts = {rule.name: verdict.get(rule.name, {}) for rule in rules.extra_rules}
+    for attribute, name in rules.legacy_names.items():
+        if name:
+            verdicts[name] = verdict.get(attribute, {})
+    return verdicts
+
+class ReportWriter:
+    """
+    Writes the reports of checks to the sinks it was given; any of reason,
+    macro and csv may be left out. write() walks the verdicts once and
+    streams every report as it goes, so nothing is built up in memory.
+
+    With outline, the writer also records where each violation is in the
+    reason and macro texts: outline[view] lists (first line, stop line,
+    rule name, key) in order, for violation_at().
+    """
+    def __init__(self, template=None, reason=None, macro=None, csv=None, outline=False):
+        self.template = template if template is not None else DEFAULT_TEMPLATE
+        self.reason = reason
+        self.macro = macro
+        self.outline = {'reason': [], 'macro': []} if outline else None
+        self.line_counts = {'reason': 0, 'macro': 0}
+        self.csv = None
+        if csv is not None:
+            import csv as csv_module
+            self.csv = csv_module.writer(csv)
+
+    def write_csv_header(self, extra_columns=()):
+        self.csv.writerow(list(extra_columns) + CSV_COLUMNS)
+
+    def write(self, analysis, extra_fields=None):
+        """
+        Write the reports of a TracklistAnalysis. extra_fields (e.g. the
+        file) are added, in order, to the start of each CSV row.
+        """
+        self.write_verdicts(analysis.rules, analysis.verdicts, extra_fields)
+
+    def write_verdicts(self, rules, verdicts, extra_fields=None):
+        """
+        Write the reports of verdicts keyed by rule name.
+        """
+        self.write_reported(report_verdicts(rules, verdicts), extra_fields)
+
+    def write_reported(self, reported, extra_fields=None, intro=True):
+        """
+        Write the reports of (rule, verdict, classic) in the given order.
+        With intro=False the macro info starts straight with the first rule.
+        """
+        template = self.template
+        reason = self.reason.write if self.reason is not None else None
+        macro = self.macro.write if self.macro is not None else None
+        outline = self.outline
+        if outline is not None:
+            reason = self.counting('reason', reason)
+            macro = self.counting('macro', macro)
+        line_counts = self.line_counts
+        csv_row = self.csv.writerow if self.csv is not None else None
+        csv_prefix = list(extra_fields.values()) if extra_fields else []
+        if macro is not None and intro:
+            macro(template.macro_intro)
+        for rule, verdict, classic in reported:
+            if not verdict:
+                continue
+            if reason is not None:
+                reason(template.reason_heading.format(reason=template.reason(rule)))
+                reason_entry = template.reason_entry
+                reason_track = template.reason_track_parts
+            if macro is not None:
+                macro_entry, macro_fields = template.macro_entry(rule, classic)
+                macro_track = template.macro_track_parts
+            for key, data in verdict.items():
+                count, tracks = data['count'], data['tracks']
+                if reason is not None:
+                    first = line_counts['reason']
+                    reason(reason_entry.format(key=key, count=count))
+                    write_tracks(reason, template.reason_track, reason_track, tracks)
+                    if outline is not None:
+                        outline['reason'].append((first, line_counts['reason'], rule.name, key))
+                if macro is not None:
+                    first = line_counts['macro']
+                    macro(macro_entry.format(key=key, count=count, **macro_fields))
+                    write_tracks(macro, template.macro_track, macro_track, tracks)
+                    if outline is not None:
+                        outline['macro'].append((first, line_counts['macro'], rule.name, key))
+                if csv_row is not None:
+                    for track in tracks:
+                        csv_row(csv_prefix + [rule.name, rule.type, rule.field, key, count, track])
+            if reason is not None:
+                reason(template.reason_end)
+            if macro is not None:
+                macro(template.macro_end.format(macro=template.macro(rule)))
+
+    def counting(self, view, write):
+        """
+        Wrap the write function of a view so its lines are counted.
+        """
+        if write is None:
+            return None
+        line_counts = self.line_counts
+
+        def counted_write(text):
+            line_counts[view] += text.count('\n')
+            write(text)
+        return counted_write
+
+def violation_at(outline, line):
+    """
+    Return (rule name, key) of the violation written on a line of a text,
+    given the writer's outline of that text, or None.
+    """
+    i = bisect.bisect_right(outline, (line, float('inf'))) - 1
+    if i >= 0 and outline[i][0] <= line < outline[i][1]:
+        return outline[i][2], outline[i][3]
+    return None
+
+def write_tracks(write, line, parts, tracks):
+    if parts is None:
+        for track in tracks:
+            write(line.format(track=track))
+        return
+    before, after = parts
+    # One write per entry instead of per track
+    write(''.join([before + track + after for track in tracks]))
+
+def render_reported(reported, view, template=None, intro=True):
+    """
+    Return the 'reason' or 'macro' text of (rule, verdict, classic) triples.
+    """
+    import io
+    sink = io.StringIO()
+    writer = ReportWriter(template, **{view: sink})
+    writer.write_reported(reported, intro=intro)
+    return sink.getvalue()
+
+def outline_reports(analysis, template=None):
+    """
+    Return the outline of the reason and macro texts of an analysis, as
+    recorded by ReportWriter.
+    """
+    import io
+    writer = ReportWriter(template, io.StringIO(), io.StringIO(), outline=True)
+    writer.write(analysis)
+    return writer.outline
+
+def render_reports(analysis, template=None, reason=True, macro=True):
+    """
+    Return (reason text, macro text) of an analysis from one walk; a report
+    not asked for is None.
+    """
+    import io
+    reason_sink = io.StringIO() if reason else None
+    macro_sink = io.StringIO() if macro else None
+    ReportWriter(template, reason_sink, macro_sink).write(analysis)
+    return (reason_sink.getvalue() if reason else None), (macro_sink.getvalue() if macro else None)